@@ -40,7 +40,31 @@ def template_default_parameters(sites):
     
     from_config['statistics_polling'] = 50000
     
-    wl_config = sfctss.workload.SyntheticWorkloadGenerator.get_default_config()
+    # one of sfctss.events.EventList.backends: 'sorted', 'heap', 'calendar'
+    from_config['event_list_backend'] = 'sorted'
+    
+    # 'synthetic', or 'vectorized' to draw the same workload model as numpy arrays (faster for large workloads), or
+    # 'trace' to replay the workload trace in the directory 'workload_trace'. The vectorized generator takes the models
+    # of 'workload_flow_arrival_model' and 'workload_flow_size_model' (see sfctss.workload_models), if they are set
+    from_config['workload_generator'] = 'synthetic'
+    from_config['workload_trace'] = None
+    
+    # directory of a cache of prepared workloads, e.g., shared by all runs of a sweep with the same workload
+    from_config['workload_cache'] = None
+    from_config['workload_cache_max_bytes'] = 1 << 30
+    
+    # if set, the lookahead of the workload is sized by this memory budget (in bytes) and the observed packet rate,
+    # instead of taking fixed slices of 800k packets
+    from_config['workload_memory_budget'] = None
+    
+    # run the workload generator in a separate process ahead of the simulation
+    from_config['workload_background_producer'] = False
+    
+    # if set, a setup whose expected offered load exceeds this utilization of any sf type (or of all servers) is not
+    # simulated, see sfctss.sanity.check_offered_load
+    from_config['max_offered_load'] = None
+    
+    wl_config = sfctss.workload.VectorizedSyntheticWorkloadGenerator.get_default_config()
     from_config = {**from_config, **wl_config}
     
     return from_config
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 # coding=utf-8
 import argparse
+import json
 
 import config
-from topology import run
+from topology import run, run_partitioned, run_forked
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -53,26 +54,85 @@ if __name__ == '__main__':
     parser.add_argument("--dump-full-workload", action='store_true', default=False,
                         help="dumps full workload (full packet dump)")
     
+    parser.add_argument("--event-list-backend", type=str, dest="event_list_backend",
+                        help="overwrite the event list backend of the config, e.g., heap or calendar")
+    parser.add_argument("--profile", type=str, dest="profile_filename",
+                        help="if filename is set, measure the time per event class and per scheduler and write it "
+                             "as json to this file")
+    parser.add_argument("--workload-generator", type=str, dest="workload_generator",
+                        help="overwrite the workload generator of the config, i.e., synthetic or vectorized")
+    parser.add_argument("--workload-trace", type=str, dest="workload_trace",
+                        help="replay the workload trace of this directory instead of generating a workload")
+    parser.add_argument("--workload-cache", type=str, dest="workload_cache",
+                        help="reuse prepared workloads of this cache directory, and store new ones")
+    parser.add_argument("--workload-memory-budget", type=int, dest="workload_memory_budget",
+                        help="size the lookahead of the workload by this memory budget (in MB) and the packet rate")
+    parser.add_argument("--background-workload", action='store_true', default=False, dest="background_workload",
+                        help="run the workload generator in a separate process ahead of the simulation")
+    parser.add_argument("--record-workload-trace", type=str, dest="record_workload_trace",
+                        help="record the ingress packets as workload trace into this directory")
+    parser.add_argument("--max-offered-load", type=float, dest="max_offered_load",
+                        help="do not simulate a setup whose expected offered load exceeds this utilization, e.g., 1")
+    parser.add_argument("--partitioned", action='store_true', default=False,
+                        help="run each site in its own process (statistics, ui, and interactive mode are not supported)")
+    parser.add_argument("--fork", type=str,
+                        help="json list of scheduler parameters, e.g., '[{\"admission_control_threshold_high\": 1.5}]'; "
+                             "runs the warm up once and then one continuation for each entry")
+    parser.add_argument("--warm-up", default=1000000, type=int, dest="warm_up",
+                        help="simulation time (in ns) of the warm up shared by all forks")
+    parser.add_argument("--workers", default=1, type=int,
+                        help="number of processes for running the forks")
+    
     args = parser.parse_args()
     
-    run(config=config.template_default_parameters(sites=3),
-        stop_simulation_after=args.sim_time,
-        debug=args.verbose,
-        show_ui=args.show_ui,
-        show_ui_full=args.show_ui,
-        show_progress=args.show_progress,
-        run_interactive=args.interactive,
-        no_workload_reloading=args.no_workload_reloading,
-        dry_run=args.dry,
-        statistics_packet_cdfs=args.statistics_packets_cdf_buckets,
-        statistics_filename=None if args.statistics_filename is None else args.statistics_filename,
-        statistics_overview=args.statistics_overview,
-        statistics_packets=args.statistics_packets,
-        statistics_server=args.statistics_server,
-        statistics_workload=args.dump_full_workload,
-        statistics_polling=args.statistics_polling_interval,
-        statistics_polling_sfi=args.statistics_polling_sfi,
-        statistics_polling_sff=args.statistics_polling_sff,
-        statistics_polling_server=args.statistics_polling_server,
-        statistics_polling_overview=args.statistics_polling_overview,
-        )
+    sim_config = config.template_default_parameters(sites=3)
+    if args.event_list_backend is not None:
+        sim_config['event_list_backend'] = args.event_list_backend
+    if args.workload_generator is not None:
+        sim_config['workload_generator'] = args.workload_generator
+    if args.workload_memory_budget is not None:
+        sim_config['workload_memory_budget'] = args.workload_memory_budget << 20
+    if args.background_workload:
+        sim_config['workload_background_producer'] = True
+    if args.workload_cache is not None:
+        sim_config['workload_cache'] = args.workload_cache
+    if args.workload_trace is not None:
+        sim_config['workload_generator'] = 'trace'
+        sim_config['workload_trace'] = args.workload_trace
+    if args.max_offered_load is not None:
+        sim_config['max_offered_load'] = args.max_offered_load
+    
+    if args.partitioned:
+        run_partitioned(config=sim_config,
+                        stop_simulation_after=args.sim_time,
+                        show_progress=args.show_progress)
+    elif args.fork is not None:
+        run_forked(config=sim_config,
+                   warm_up_time=args.warm_up,
+                   variants=json.loads(args.fork),
+                   stop_simulation_after=args.sim_time,
+                   workers=args.workers)
+    else:
+        run(config=sim_config,
+            stop_simulation_after=args.sim_time,
+            debug=args.verbose,
+            show_ui=args.show_ui,
+            show_ui_full=args.show_ui,
+            show_progress=args.show_progress,
+            run_interactive=args.interactive,
+            no_workload_reloading=args.no_workload_reloading,
+            dry_run=args.dry,
+            statistics_packet_cdfs=args.statistics_packets_cdf_buckets,
+            statistics_filename=None if args.statistics_filename is None else args.statistics_filename,
+            statistics_overview=args.statistics_overview,
+            statistics_packets=args.statistics_packets,
+            statistics_server=args.statistics_server,
+            statistics_workload=args.dump_full_workload,
+            statistics_polling=args.statistics_polling_interval,
+            statistics_polling_sfi=args.statistics_polling_sfi,
+            statistics_polling_sff=args.statistics_polling_sff,
+            statistics_polling_server=args.statistics_polling_server,
+            statistics_polling_overview=args.statistics_polling_overview,
+            profile_filename=args.profile_filename,
+            record_workload_trace=args.record_workload_trace,
+            )
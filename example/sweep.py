@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import argparse
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import config
+import sfctss
+from topology import run
+
+RESULT_FILE = "results.csv"
+
+
+def expand_grid(grid: Dict[str, list]) -> List[Dict]:
+    # cartesian product of all values, e.g., {'seed': [0, 1], 'scheduler': ['greedy', 'static']} -> 4 runs
+    keys = sorted(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[grid[k] for k in keys])]
+
+
+def get_run_key(overrides: Dict, sim_time: int) -> str:
+    description = json.dumps({'overrides': overrides, 'sim_time': sim_time}, sort_keys=True)
+    return hashlib.sha1(description.encode()).hexdigest()[:16]
+
+
+def read_results(output_directory: str) -> List[Dict]:
+    path = os.path.join(output_directory, RESULT_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def write_results(output_directory: str, rows: List[Dict]):
+    columns = []
+    for row in rows:
+        columns += [c for c in row if c not in columns]
+    # write to a temporary file first, so that a crash never leaves a broken result table behind
+    path = os.path.join(output_directory, RESULT_FILE)
+    with open(path + ".tmp", "w", newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(path + ".tmp", path)
+
+
+def read_final_overview_statistics(filepath: str) -> Dict:
+    # the overview statistics are key value pairs over time, we take the last value of each key
+    values = {}
+    with open(filepath, newline='') as f:
+        for row in csv.DictReader(f):
+            values[f"overview_{row['key']}"] = row['value']
+    return values
+
+
+def run_configuration(run_key: str, overrides: Dict, sim_time: int, output_directory: str,
+                      statistics: bool, workload_cache: str = None, max_offered_load: float = None) -> Dict:
+    sim_config = config.template_default_parameters(sites=overrides.get('sites', 3))
+    sim_config.update(overrides)
+    # runs with the same workload config and seed share the prepared workload
+    sim_config['workload_cache'] = workload_cache
+    if max_offered_load is not None:
+        sim_config['max_offered_load'] = max_offered_load
+    
+    # the statistic writers use the current working directory
+    os.chdir(output_directory)
+    exp_id = f"run-{run_key}"
+    start = time.time()
+    with open(f"{exp_id}.log", "w") as log, contextlib.redirect_stdout(log):
+        try:
+            sim = run(config=sim_config,
+                      stop_simulation_after=sim_time,
+                      statistics_filename=exp_id if statistics else None,
+                      statistics_overview=statistics,
+                      statistics_polling=None)
+        except sfctss.sanity.OfferedLoadTooHigh as e:
+            # the run is kept in the result table, so that it is not started again
+            print(e)
+            return {'run_key': run_key, **overrides,
+                    'skipped': 'overloaded',
+                    'overloaded_sf': ' '.join(str(sf) for sf in e.offered_load['overloaded_sf']),
+                    'expected_utilization_of_servers': round(float(e.offered_load['utilization_of_servers']), 3),
+                    'runtime': round(time.time() - start, 1)}
+    
+    result = {'run_key': run_key, **overrides, **sim.stats, 'runtime': round(time.time() - start, 1)}
+    if statistics:
+        result['statistics_files'] = ' '.join(sorted(f for f in os.listdir('.') if f.startswith(f"stats_{exp_id}")))
+        result.update(read_final_overview_statistics(f"stats_{exp_id}_overview.csv"))
+    return result
+
+
+def run_sweep(runs: List[Dict], output_directory: str, sim_time: int, workers: int = None,
+              statistics: bool = False, workload_cache: str = None, max_offered_load: float = None) -> List[Dict]:
+    output_directory = os.path.abspath(output_directory)
+    if workload_cache is not None:
+        workload_cache = os.path.abspath(workload_cache)
+    os.makedirs(output_directory, exist_ok=True)
+    
+    # resume: skip all runs which are already in the result table
+    results = read_results(output_directory)
+    finished = set(r['run_key'] for r in results)
+    pending = {}
+    for overrides in runs:
+        run_key = get_run_key(overrides, sim_time)
+        if run_key not in finished:
+            pending[run_key] = overrides
+    print(f"{len(runs)} runs, {len(runs) - len(pending)} already done, start {len(pending)} runs")
+    
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_configuration, run_key, overrides, sim_time, output_directory, statistics,
+                                   workload_cache, max_offered_load):
+                       run_key for run_key, overrides in pending.items()}
+        for future in as_completed(futures):
+            run_key = futures[future]
+            try:
+                results.append(future.result())
+                write_results(output_directory, results)
+                print(f"done {run_key} {pending[run_key]} ({len(results)}/{len(runs)})")
+            except Exception as e:
+                failed += 1
+                print(f"run {run_key} {pending[run_key]} failed: {e}\n{traceback.format_exc()}")
+    
+    if failed > 0:
+        print(f"{failed} runs failed, run the sweep again to retry them")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument("--grid", type=str,
+                        help="json dict of config overrides, each key has a list of values, e.g., "
+                             "'{\"seed\": [0, 1], \"scheduler\": [\"greedy\", \"static\"], \"sites\": [3, 4]}'")
+    parser.add_argument("--runs", type=str,
+                        help="json file with a list of config overrides, one dict per run")
+    parser.add_argument("--output", type=str, default="sweep",
+                        help="directory for the result table, logs, and statistics")
+    parser.add_argument("--sim-time", default=10000000, type=int, dest="sim_time",
+                        help="set simulation time (in ns)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes, default is the number of cpus")
+    parser.add_argument("--statistics", action='store_true', default=False,
+                        help="write the statistics files of each run and add the overview statistics to the results")
+    parser.add_argument("--workload-cache", type=str, dest="workload_cache",
+                        help="directory of prepared workloads shared by the runs, e.g., runs of different schedulers")
+    parser.add_argument("--max-offered-load", type=float, dest="max_offered_load",
+                        help="skip runs whose expected offered load exceeds this utilization of any sf type, e.g., 1")
+    
+    args = parser.parse_args()
+    
+    if (args.grid is None) == (args.runs is None):
+        raise NameError("either set --grid or --runs")
+    if args.grid is not None:
+        sweep_runs = expand_grid(json.loads(args.grid))
+    else:
+        with open(args.runs) as f:
+            sweep_runs = json.load(f)
+    
+    run_sweep(sweep_runs, output_directory=args.output, sim_time=args.sim_time, workers=args.workers,
+              statistics=args.statistics, workload_cache=args.workload_cache, max_offered_load=args.max_offered_load)
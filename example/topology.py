@@ -3,7 +3,7 @@
 import json
 import random
 from random import Random
-from typing import Dict
+from typing import Dict, List
 
 import numpy as np
 
@@ -11,38 +11,9 @@ import sfctss
 from sfctss.scheduler.examples import GreedyShortestDeadlineFirstScheduler, LoadUnawareRoundRobinScheduler
 
 
-def run(config: Dict,
-        show_progress: bool = False,
-        show_ui: bool = False,
-        show_ui_full: bool = False,
-        statistics_filename: str = None,
-        statistics_overview: bool = True,
-        statistics_packets: bool = False,
-        statistics_server: bool = False,
-        statistics_polling: int = None,
-        statistics_polling_sfi: bool = False,
-        statistics_polling_sff: bool = False,
-        statistics_polling_server: bool = False,
-        statistics_polling_overview: bool = False,
-        statistics_workload: bool = False,
-        statistics_packet_cdfs: int = None,
-        debug: bool = False,
-        stop_simulation_after: int = -1,
-        stop_simulation_when_workload_is_over: bool = False,
-        run_interactive: bool = False,
-        no_workload_reloading: bool = False,
-        dry_run: bool = False):
+def build(sim: sfctss.simulator.Sim, config: Dict, no_workload_reloading: bool = False) -> Dict[int, list]:
+    # sets up sffs, links, servers, sfis, and the workload; returns the sffs of each site
     seed = config['seed']
-    sim = sfctss.simulator.Sim(seed=seed)
-    sim.DEBUG = debug
-    sim.PACKET_ID_TO_DEBUG = None
-    
-    sim.props.sim_stats.FLUSH_ENTRIES = 500
-    
-    if stop_simulation_after > 0:
-        config["workload_start_new_flows_till"] = stop_simulation_after
-    
-    print(f"run with configuration: {json.dumps(config, indent=1)}")
     sites = config['sites']
     
     cpu_policy = None
@@ -196,10 +167,30 @@ def run(config: Dict,
     
     sfctss.sanity.print_infrastructure(sim)
     
-    wl_gen = sfctss.workload.SyntheticWorkloadGenerator(sim=sim,
-                                                        workload_rand=rand,
-                                                        config=config)
-    wl_gen.prepare_before_simulation_starts()
+    if config['workload_generator'] == 'synthetic':
+        wl_gen = sfctss.workload.SyntheticWorkloadGenerator(sim=sim,
+                                                            workload_rand=rand,
+                                                            config=config)
+    elif config['workload_generator'] == 'vectorized':
+        wl_gen = sfctss.workload.VectorizedSyntheticWorkloadGenerator(sim=sim,
+                                                                      workload_rand=rand,
+                                                                      config=config)
+    elif config['workload_generator'] == 'trace':
+        wl_gen = sfctss.trace.TraceWorkloadGenerator(sim=sim,
+                                                     workload_rand=rand,
+                                                     config=config)
+    else:
+        raise NameError(f"unknown workload generator: {config['workload_generator']}")
+    if config['max_offered_load'] is not None:
+        # before the workload is prepared, so that an infeasible setup fails fast
+        offered_load = sfctss.sanity.check_offered_load(sim, wl_gen, max_utilization=config['max_offered_load'])
+        print(f"expected utilization per sf type {offered_load['utilization_per_sf'].round(2).tolist()}, "
+              f"of all servers {round(float(offered_load['utilization_of_servers']), 2)}")
+    if config['workload_cache'] is not None:
+        sfctss.workload.WorkloadCache(config['workload_cache'],
+                                      max_bytes=config['workload_cache_max_bytes']).prepare_before_simulation_starts(wl_gen)
+    else:
+        wl_gen.prepare_before_simulation_starts()
     
     per_sf_demand = wl_gen.get_workload_statistics()
     
@@ -209,10 +200,89 @@ def run(config: Dict,
               f"{round(per_sf_demand[sf][1] / sites, 1)} /s, "
               f"{round(per_sf_demand[sf][2] / sites, 1)} cap. required")
     
+    if config['workload_memory_budget'] is not None:
+        sim.refill_policy = sfctss.events.AdaptiveRefillPolicy(memory_budget=config['workload_memory_budget'])
+    
+    if config['workload_background_producer']:
+        wl_gen = sfctss.producer.BackgroundWorkloadProducer(sim, wl_gen)
+    
     print(f"Register packet generator")
     sim.register_packet_generator(packet_generator=wl_gen,
                                   fetch_all=no_workload_reloading)
     
+    return sff_of_site
+
+
+class SitePartitioning(object):
+    # builder of sfctss.pdes.PartitionedSimulation, each site becomes a partition
+    def __init__(self, config: Dict):
+        self.config = config
+    
+    def __call__(self, sim: sfctss.simulator.Sim) -> Dict[int, int]:
+        sim.RECYCLE_EVENTS = True
+        sff_of_site = build(sim, self.config)
+        return {sff.id: site for site in sff_of_site for sff in sff_of_site[site]}
+
+
+def run_partitioned(config: Dict,
+                    show_progress: bool = False,
+                    stop_simulation_after: int = -1) -> sfctss.pdes.PartitionedSimulation:
+    if stop_simulation_after > 0:
+        config["workload_start_new_flows_till"] = stop_simulation_after
+    
+    print(f"run partitioned with configuration: {json.dumps(config, indent=1)}")
+    partitioned_sim = sfctss.pdes.PartitionedSimulation(builder=SitePartitioning(config),
+                                                        number_of_partitions=config['sites'],
+                                                        seed=config['seed'],
+                                                        event_list_backend=config['event_list_backend'])
+    partitioned_sim.run_sim(max_sim_time=stop_simulation_after, show_progress=show_progress)
+    print("*" * 30)
+    
+    return partitioned_sim
+
+
+def run(config: Dict,
+        show_progress: bool = False,
+        show_ui: bool = False,
+        show_ui_full: bool = False,
+        statistics_filename: str = None,
+        statistics_overview: bool = True,
+        statistics_packets: bool = False,
+        statistics_server: bool = False,
+        statistics_polling: int = None,
+        statistics_polling_sfi: bool = False,
+        statistics_polling_sff: bool = False,
+        statistics_polling_server: bool = False,
+        statistics_polling_overview: bool = False,
+        statistics_workload: bool = False,
+        statistics_packet_cdfs: int = None,
+        debug: bool = False,
+        stop_simulation_after: int = -1,
+        stop_simulation_when_workload_is_over: bool = False,
+        run_interactive: bool = False,
+        no_workload_reloading: bool = False,
+        dry_run: bool = False,
+        profile_filename: str = None,
+        record_workload_trace: str = None):
+    seed = config['seed']
+    sim = sfctss.simulator.Sim(seed=seed, event_list_backend=config['event_list_backend'])
+    sim.DEBUG = debug
+    sim.RECYCLE_EVENTS = True
+    sim.PROFILE_EVENTS = profile_filename is not None
+    sim.PACKET_ID_TO_DEBUG = None
+    
+    sim.props.sim_stats.FLUSH_ENTRIES = 500
+    
+    if stop_simulation_after > 0:
+        config["workload_start_new_flows_till"] = stop_simulation_after
+    
+    print(f"run with configuration: {json.dumps(config, indent=1)}")
+    
+    build(sim, config, no_workload_reloading=no_workload_reloading)
+    
+    if record_workload_trace is not None:
+        sfctss.measurement.SimStats.activate_workload_trace(sim, record_workload_trace)
+    
     if statistics_filename is not None:
         store_config = {k: str(v) for k, v in config.items()}
         
@@ -244,7 +314,7 @@ def run(config: Dict,
     
     if dry_run:
         print("Dry run, simply test configuration, do not run simulation. Exit")
-        return
+        return sim
     
     sim.ui_shows_full_state = show_ui_full
     sim.run_sim(show_progress=show_progress,
@@ -253,5 +323,24 @@ def run(config: Dict,
                 ui=show_ui,
                 stop_simulation_when_workload_is_over=stop_simulation_when_workload_is_over)
     
+    if profile_filename is not None:
+        sim.profiler.write_json(profile_filename)
+    
     sfctss.sanity.print_simple_stats(sim)
     print("*" * 30)
+    
+    return sim
+
+
+def run_forked(config: Dict,
+               warm_up_time: int,
+               variants: List[Dict],
+               stop_simulation_after: int = -1,
+               workers: int = 1) -> List[Dict]:
+    # runs the warm up once, and then a continuation for each variant of scheduler parameters
+    sim = run(config=config, stop_simulation_after=stop_simulation_after, dry_run=True)
+    sim.run_warm_up(warm_up_time)
+    results = sim.fork(variants, sfctss.simulator.apply_scheduler_parameters, max_sim_time=stop_simulation_after, workers=workers)
+    for variant, stats in zip(variants, results):
+        print(f"{variant}: {stats}")
+    return results
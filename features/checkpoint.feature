@@ -0,0 +1,66 @@
+Feature: Simulation Checkpoints
+
+  Background: a valid simulator setup
+    Given an empty simulator setup
+
+  Scenario Outline: a simulation using <scheduler> continues from a checkpoint as if it was never stopped
+    Given we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we run the simulation till "<warm_up>" and store a checkpoint
+    And we load the checkpoint
+    And we let the simulation run till all processing is done
+    Then no packet is still in the simulator
+    Then the statistics of the simulation are equal to the kept statistics
+
+    Examples: schedulers
+      | scheduler   | warm_up |
+      | GreedyLocal | 0       |
+      | GreedyLocal | 1500    |
+      | MPP         | 1500    |
+      | Static      | 3000    |
+
+  Scenario Outline: forks of a warm simulation run with different scheduler parameters using <workers> workers
+    Given we have "3" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "4" SFIs of type "1" running on "4" servers and "do" share the server
+    And we have "4" SFIs of type "2" running on "4" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Given an empty simulator setup
+    And we have "3" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "4" SFIs of type "1" running on "4" servers and "do" share the server
+    And we have "4" SFIs of type "2" running on "4" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we run the simulation till "1500" and fork it with admission threshold high of "1.2, 0.9, 1.2" using "<workers>" workers
+    Then there are "3" forks and the statistics of fork "0" and "2" are equal to the kept statistics
+    Then the statistics of fork "1" differ from the kept statistics
+
+    Examples: workers
+      | workers |
+      | 1       |
+      | 2       |
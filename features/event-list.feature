@@ -0,0 +1,58 @@
+Feature: Event List Backends
+
+  Background: a valid simulator setup
+    Given an empty simulator setup
+
+  Scenario Outline: the <backend> event list returns events ordered by time, and by scheduling order for equal times
+    Given we use the event list backend "<backend>"
+    When we schedule "<events>" events with random delays of up to "<max_delay>" and pop them while scheduling new ones
+    Then all events were popped in order of time and in order of scheduling for equal times
+    Then the event list is empty
+
+    Examples: backends
+      | backend  | events | max_delay |
+      | sorted   | 2000   | 5000      |
+      | heap     | 2000   | 5000      |
+      | calendar | 2000   | 5000      |
+      | calendar | 2000   | 3         |
+      | calendar | 50     | 10000000  |
+
+  Scenario Outline: the <backend> event list merges the workload events with the scheduled events
+    Given we use the event list backend "<backend>"
+    And we add "5000" workload events in slices of "<slice>" with random times of up to "100000"
+    When we schedule "1000" events with random delays of up to "50" and pop them while scheduling new ones
+    Then all events were popped in order of time and in order of scheduling for equal times
+    Then the event list is empty
+
+    Examples: backends
+      | backend  | slice |
+      | sorted   | 5000  |
+      | sorted   | 70    |
+      | heap     | 70    |
+      | calendar | 70    |
+
+  Scenario Outline: very simple setup using the <backend> event list, single sff with <scheduler>, 3 SFIs, 2 SFIs for each SF type, and we <recycle> recycle events
+    Given we use the event list backend "<backend>"
+    And we "<recycle>" recycle processed events
+    And we have "1" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do not" share the server
+    And we have a traffic class "0" with latency "1000000000" ns
+    And we have a traffic class "0-1-2" with latency "1000000000" ns
+    And we have for each traffic class "2" flows each with "10" packets
+    When we let the simulation run till all processing is done
+    Then no packet is still in the simulator
+    Then success rate is in the range of "1" allow delta 0.1
+    Then reject rate is in the range of "0" allow delta 0.03
+
+    Examples: backends
+      | backend  | scheduler   | recycle |
+      | heap     | GreedyLocal | do not  |
+      | heap     | MPP         | do not  |
+      | calendar | GreedyLocal | do not  |
+      | calendar | MPP         | do not  |
+      | sorted   | GreedyLocal | do      |
+      | sorted   | MPP         | do      |
@@ -0,0 +1,16 @@
+Feature: Partitioned Simulation
+
+  Scenario Outline: a simulation of <sites> sites partitioned by site using <scheduler> accounts for all packets
+    Given a setup of "<sites>" sites with "2" SFIs per site and SF type using scheduler "<scheduler>" and "20" flows per site
+    When we run the setup in a single simulation
+    And we run the setup partitioned by site
+    Then the partitioned simulation uses a lookahead of "1000"
+    Then the partitioned simulation has the same number of packets as the single simulation
+    Then no packet is still in the partitioned simulation
+    Then the success rate of the partitioned simulation is in the range of the single simulation allow delta 0.05
+
+    Examples: schedulers
+      | sites | scheduler   |
+      | 2     | Static      |
+      | 2     | GreedyLocal |
+      | 3     | GreedyLocal |
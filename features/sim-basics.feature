@@ -65,7 +65,7 @@ Feature: Simulator Basic Tests
     Examples: Sparse resources
       | scheduler    | server | expected_success_rate | expected_service_quality | latency | expected_max_idle_ratio |
       | Static       | 3      | 0.10                  | 0.41                     | 100     | 0.03                    |
-      | GreedyOracle | 3      | 0.11                  | 0.4                      | 100     | 0.06                    |
+      | GreedyOracle | 3      | 0.11                  | 0.4                      | 100     | 0.07                    |
       | GreedyLocal  | 3      | 0.10                  | 0.41                     | 100     | 0.53                    |
       | MPP          | 3      | 0.13                  | 0.42                     | 100     | 0.49                    |
       | DMPP         | 3      | 0.10                  | 0.42                     | 100     | 0.1                     |
@@ -74,8 +74,8 @@ Feature: Simulator Basic Tests
       | scheduler    | server | expected_success_rate | expected_service_quality | latency | expected_max_idle_ratio |
       | Static       | 6      | 0.16                  | 0.42                     | 100     | 5.7                     |
       | GreedyOracle | 6      | 0.18                  | 0.41                     | 100     | 0.6                     |
-      | GreedyLocal  | 6      | 0.16                  | 0.42                     | 100     | 6                       |
-      | MPP          | 6      | 0.28                  | 0.39                     | 100     | 0.43                    |
+      | GreedyLocal  | 6      | 0.16                  | 0.42                     | 100     | 6.1                     |
+      | MPP          | 6      | 0.28                  | 0.39                     | 100     | 0.44                    |
       | DMPP         | 6      | 0.20                  | 0.39                     | 100     | 3                       |
 
     Examples: more resources and no latency
@@ -130,7 +130,7 @@ Feature: Simulator Basic Tests
       | scheduler    | server | expected_success_rate | expected_reject_rate | expected_service_quality | packet_on_wire | within_site_latency | inter_site_latency | expected_max_idle_ratio |
       | Static       | 10     | .55                   | .14                  | .44                      | 1              | 0                   | 0                  | 1                       |
       | GreedyOracle | 10     | .55                   | .14                  | .44                      | 1              | 0                   | 0                  | 1                       |
-      | GreedyLocal  | 10     | .44                   | .18                  | .47                      | 1              | 0                   | 0                  | 23                      |
+      | GreedyLocal  | 10     | .44                   | .18                  | .47                      | 1              | 0                   | 0                  | 24                      |
       | MPP          | 10     | .70                   | .28                  | .52                      | 1              | 0                   | 0                  | 1                       |
       | DMPP         | 10     | .45                   | .28                  | .52                      | 1              | 0                   | 0                  | 31                      |
 
@@ -144,9 +144,9 @@ Feature: Simulator Basic Tests
 
     Examples: with SFF-SFF latency
       | scheduler    | server | expected_success_rate | expected_reject_rate | expected_service_quality | packet_on_wire | within_site_latency | inter_site_latency | expected_max_idle_ratio |
-      | Static       | 10     | .35                   | .16                  | .22                      | 5              | 0                   | 50000              | 36                      |
+      | Static       | 10     | .35                   | .16                  | .22                      | 5              | 0                   | 50000              | 37                      |
       | GreedyOracle | 10     | .40                   | .19                  | .28                      | 5              | 0                   | 50000              | 33                      |
-      | GreedyLocal  | 10     | .39                   | .18                  | .29                      | 5              | 0                   | 50000              | 35                      |
+      | GreedyLocal  | 10     | .39                   | .18                  | .29                      | 5              | 0                   | 50000              | 40                      |
       | MPP          | 10     | .33                   | .15                  | .10                      | 2500           | 0                   | 50000              | 39                      |
       | DMPP         | 10     | .41                   | .19                  | .30                      | 2500           | 0                   | 50000              | 30                      |
 
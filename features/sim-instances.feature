@@ -0,0 +1,230 @@
+Feature: Simulator Instances
+
+  Background: a valid simulator setup
+    Given an empty simulator setup
+
+  Scenario: hooks registered at a simulator instance only apply to this simulation
+    Given we register counting hooks at the simulator
+    And we have "1" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do not" share the server
+    And we have a traffic class "0" with latency "1000000000" ns
+    And we have a traffic class "0-1-2" with latency "1000000000" ns
+    And we have for each traffic class "2" flows each with "10" packets
+    When we let the simulation run till all processing is done
+    Then the counting hooks were called "1" times when the simulation is done and "40" times for tear down packets
+    Then each torn down packet scheduled all sf types of its flow, and packets and flows have no instance dict
+    Then a new simulator does not use the hooks of the previous simulator
+
+  Scenario Outline: two simulations with the same setup using <scheduler> give the same results in one process
+    Given we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    When we let the simulation run till all processing is done
+    Then the statistics of the simulation are equal to the kept statistics
+
+    Examples: schedulers
+      | scheduler    |
+      | GreedyOracle |
+      | MPP          |
+
+  Scenario: the profiler counts each processed event and attributes scheduler time to the SFFs
+    Given we have "2" SFFs using scheduler "MPP"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    And we activate the event profiler
+    When we let the simulation run till all processing is done
+    Then the profile counts all ticks and has a scheduler entry for each of the "2" SFFs
+    And the profile written as json has the same content
+
+  Scenario: a simulation with debug output and packet tracing gives the same results as without
+    Given we have "2" SFFs using scheduler "GreedyOracle"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we have for each traffic class "2" flows each with "10" packets
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Then the simulator uses the handlers "without" tracing
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyOracle"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "50000" ns
+    And we trace the path of all packets
+    And we have for each traffic class "2" flows each with "10" packets
+    And we activate debug mode
+    And we debug the packet with id "5"
+    When we let the simulation run till all processing is done
+    Then the statistics of the simulation are equal to the kept statistics
+    And the simulator uses the handlers "with" tracing
+
+  Scenario Outline: the packets scheduled by <scheduler> have valid paths, and packets with the same path share it
+    Given we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "10000000" ns
+    And we have for each traffic class "20" flows each with "50" packets
+    And we record the paths of the packets which are done
+    When we let the simulation run till all processing is done
+    Then the recorded paths are valid paths from the ingress, and packets with the same path share it
+
+    Examples: schedulers
+      | scheduler    |
+      | GreedyOracle |
+      | GreedyLocal  |
+      | MPP          |
+      | Static       |
+
+  Scenario: the packet statistics hold the statistics of each packet which left the network
+    Given we register counting hooks at the simulator
+    And we write the packet statistics of experiment "packets" into a temporary directory
+    And we have "1" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do not" share the server
+    And we have a traffic class "0" with latency "1000000000" ns
+    And we have a traffic class "0-1-2" with latency "1000000000" ns
+    And we have for each traffic class "20" flows each with "100" packets
+    When we let the simulation run till all processing is done
+    Then the counting hooks were called "1" times when the simulation is done and "4000" times for tear down packets
+    And the packet statistics hold a row for each torn down packet, and the csv file "stats_packets_packets.csv" has the same rows
+
+  Scenario Outline: a simulation using <scheduler> which stops at the end of the workload gives the same results with a registry of the packets
+    Given we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "1000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    When we let the simulation run till all workload is sent
+    And we keep the statistics of the simulation
+    And we keep the packet counters of the simulation
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "1000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    And we keep a registry of the packets in the network
+    When we let the simulation run till all workload is sent
+    Then the registry of the packets is empty
+    Then the statistics of the simulation are equal to the kept statistics
+    Then the packet counters of the simulation are equal to the kept packet counters
+
+    Examples: schedulers
+      | scheduler    |
+      | GreedyLocal  |
+      | MPP          |
+
+  Scenario: a simulation with a registry of the packets ends without packets in the network
+    Given we keep a registry of the packets in the network
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "1000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    When we let the simulation run till all processing is done
+    Then no packet is still in the simulator
+
+  Scenario Outline: the registry of the packets locates the packets of a simulation using <scheduler>
+    Given we keep a registry of the packets in the network
+    And we have "2" SFFs using scheduler "<scheduler>"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "1000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    When we run the simulation till "<time>"
+    Then the registry locates the packets in the queues of the SFFs and SFIs, and by their flow
+
+    Examples: schedulers
+      | scheduler    | time   |
+      | GreedyLocal  | 100000 |
+      | MPP          | 100000 |
+
+  Scenario Outline: the SFC registry gives each SFC <per egress> an id and the packets carry their class
+    Given we keep a registry of the packets in the network
+    And the SFC classes "<depend>" depend on the egress
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "1000000" ns
+    And we have a traffic class "2" with latency "1000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    When we run the simulation till "100000"
+    Then the SFC registry has "<sfcs>" SFCs, and its class tables match the classes of the packets in the network
+
+    Examples: classes
+      | per egress           | depend | sfcs |
+      | and egress           | do     | 4    |
+      | regardless of egress | do not | 2    |
+
+  Scenario: the MPP scheduler does its sanity checks with the reverse index of the packet classes
+    Given we have "2" SFFs using scheduler "MPP"
+    And the MPP scheduler does sanity checks
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "3" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "1" running on "2" servers and "do" share the server
+    And we have "2" SFIs of type "2" running on "2" servers and "do" share the server
+    And we have a traffic class "1-2" with latency "10000000" ns
+    And we have a traffic class "2" with latency "10000000" ns
+    And we have for each traffic class "40" flows each with "100" packets
+    When we let the simulation run till all processing is done
+    Then each packet class maps back to its SFC and position
+    Then no packet is still in the simulator
+
+  Scenario: the random stream of a component does not depend on the other streams of the simulation
+    When we draw "2000" random numbers from the stream "server-1" of the simulator
+    Given an empty simulator setup
+    And we draw "500" random numbers from the stream "scheduler-1" of the simulator
+    Then the stream "server-1" of the simulator gives the same "2000" random numbers
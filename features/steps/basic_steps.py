@@ -261,6 +261,9 @@ def step_impl(context):
     for p in p_finder:
         sfctss.sanity.print_sim_snapshot(context.sim)
         raise NameError(f'we found a packet in the simulation, but there shouldn\'t be any packet {p}')
+    
+    if context.sim.KEEP_LIST_OF_ALL_PACKETS:
+        sure.expect(list(context.sim.props.packet.live)).to.be.empty
 
 
 @then('success rate is in the range of "{expected_success_rate}" allow delta {delta}')
@@ -0,0 +1,44 @@
+# coding=utf-8
+import os
+import tempfile
+
+import sure
+from behave import when, then
+
+import sfctss
+
+
+@when('we run the simulation till "{warm_up:d}" and store a checkpoint')
+def step_impl(context, warm_up):
+    context.sim.run_warm_up(warm_up)
+    handle, context.checkpoint_path = tempfile.mkstemp(suffix='.checkpoint')
+    os.close(handle)
+    context.sim.save_checkpoint(context.checkpoint_path)
+    context.add_cleanup(os.remove, context.checkpoint_path)
+
+
+@when('we load the checkpoint')
+def step_impl(context):
+    sim = sfctss.simulator.Sim.load_checkpoint(context.checkpoint_path)
+    sure.expect(sim).to_not.be(context.sim)
+    context.sim = sim
+
+
+@when('we run the simulation till "{warm_up:d}" and fork it with admission threshold high of "{thresholds}" '
+      'using "{workers:d}" workers')
+def step_impl(context, warm_up, thresholds, workers):
+    context.sim.run_warm_up(warm_up)
+    variants = [{'admission_control_threshold_high': float(t)} for t in thresholds.split(',')]
+    context.fork_statistics = context.sim.fork(variants, sfctss.simulator.apply_scheduler_parameters, workers=workers)
+
+
+@then('there are "{forks:d}" forks and the statistics of fork "{a:d}" and "{b:d}" are equal to the kept statistics')
+def step_impl(context, forks, a, b):
+    sure.expect(len(context.fork_statistics)).equal(forks)
+    sure.expect(context.fork_statistics[a]).equal(context.kept_statistics)
+    sure.expect(context.fork_statistics[b]).equal(context.kept_statistics)
+
+
+@then('the statistics of fork "{a:d}" differ from the kept statistics')
+def step_impl(context, a):
+    sure.expect(context.fork_statistics[a]).to_not.equal(context.kept_statistics)
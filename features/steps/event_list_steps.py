@@ -0,0 +1,70 @@
+# coding=utf-8
+import sure
+from behave import given, when, then
+
+import sfctss
+
+
+@given('we use the event list backend "{backend}"')
+def step_impl(context, backend):
+    context.sim = sfctss.simulator.Sim(context.sim_conf['seed'], event_list_backend=backend)
+
+
+@given('we add "{number:d}" workload events in slices of "{slice_size:d}" with random times of up to "{max_time:d}"')
+def step_impl(context, number, slice_size, max_time):
+    context.scheduled_events = []
+    # the workload is almost sorted, but slices overlap each other
+    for start in range(0, number, slice_size):
+        for _ in range(min(slice_size, number - start)):
+            e = sfctss.events.BaseEvent(start * max_time // number + context.random.randint(0, 3 * max_time // number))
+            context.scheduled_events.append(e)
+            context.sim.event_list.add_event_from_the_back(e)
+        # accessing the list merges the slice with the previous ones
+        context.sim.event_list.peek_last()
+
+
+@given('we "{recycle:DoDoNot}" recycle processed events')
+def step_impl(context, recycle):
+    context.sim.RECYCLE_EVENTS = recycle == 'do'
+
+
+@when('we schedule "{number:d}" events with random delays of up to "{max_delay:d}" and pop them while scheduling new ones')
+def step_impl(context, number, max_delay):
+    # no workload generator is attached to the event list
+    context.sim.packed_generator_is_done = True
+    if 'scheduled_events' not in context:
+        context.scheduled_events = []
+    context.popped_events = []
+    
+    def schedule(at_time):
+        e = sfctss.events.BaseEvent(at_time)
+        context.scheduled_events.append(e)
+        context.sim.schedule_event(e)
+    
+    for _ in range(number):
+        schedule(context.random.randint(0, max_delay))
+    
+    # each popped event schedules up to two new events, often at the current time, but never in the past
+    for _ in range(number):
+        e = context.sim.event_list.pop_next()
+        context.popped_events.append(e)
+        for _ in range(context.random.choice([0, 1, 1, 2])):
+            schedule(e.time if context.random.random() < 0.3 else e.time + context.random.randint(0, max_delay))
+    
+    while context.sim.event_list.len() > 0:
+        context.popped_events.append(context.sim.event_list.pop_next())
+
+
+@then('all events were popped in order of time and in order of scheduling for equal times')
+def step_impl(context):
+    position = {id(e): i for i, e in enumerate(context.scheduled_events)}
+    expected = sorted(context.scheduled_events, key=lambda e: (e.time, position[id(e)]))
+    sure.expect(len(context.popped_events)).equal(len(expected))
+    for popped, e in zip(context.popped_events, expected):
+        sure.expect(popped).to.be(e)
+
+
+@then('the event list is empty')
+def step_impl(context):
+    sure.expect(context.sim.event_list.len()).equal(0)
+    sure.expect(context.sim.event_list.get_number_of_relevant_events()).equal(0)
@@ -0,0 +1,109 @@
+# coding=utf-8
+import random
+
+import sure
+from behave import given, when, then
+
+import sfctss
+from sfctss.scheduler.examples import GreedyShortestDeadlineFirstScheduler, LoadUnawareRoundRobinScheduler
+
+
+class SiteSetup(object):
+    # builds the same simulation for each partition, and returns the site of each sff as its partition
+    def __init__(self, sites: int, sfis_per_site: int, scheduler: str, flows_per_site: int, seed: int = 0):
+        self.sites = sites
+        self.sfis_per_site = sfis_per_site
+        self.scheduler = scheduler
+        self.flows_per_site = flows_per_site
+        self.seed = seed
+    
+    def __call__(self, sim: sfctss.simulator.Sim):
+        rand = random.Random(self.seed)
+        if self.scheduler == 'Static':
+            sched = lambda: LoadUnawareRoundRobinScheduler(sim=sim, incremental=True, oracle=True)
+        elif self.scheduler == 'GreedyLocal':
+            sched = lambda: GreedyShortestDeadlineFirstScheduler(sim=sim, incremental=True, oracle=False,
+                                                                 admission_control_threshold_low=0.8,
+                                                                 admission_control_threshold_high=1.2)
+        else:
+            raise NameError(f'unsupported scheduler {self.scheduler}')
+        
+        sffs = [sfctss.model.SFF(sim, sched()) for _ in range(self.sites)]
+        sfctss.model.SFF.setup_latency_distribution(sim, id=0, values=[10])
+        sfctss.model.SFF.setup_latency_distribution(sim, id=1, values=[1000, 1200, 1100])
+        for i, sff_a in enumerate(sffs):
+            for sff_b in sffs[i + 1:]:
+                sfctss.model.SFF.setup_connection(sim, sff_a.id, sff_b.id, 1000, 1, bidirectional=True)
+        
+        sfctss.model.SFI.init_data_structure(sim=sim, number_of_sf_types=2, latency_provider_sff_sfi=0)
+        for sf in range(2):
+            sfctss.model.SFI.setup_sf_processing_rate_per_1s(sim, sf, 15)
+        for sff in sffs:
+            for sf in range(2):
+                for _ in range(self.sfis_per_site):
+                    server = sfctss.server.Server(sim, 100, sfctss.server.ServerCpuPolicy.one_at_a_time)
+                    server.add_sfi(of_type=sf, with_sff_id=sff.id)
+        
+        for sff in sffs:
+            for _ in range(self.flows_per_site):
+                flow = sfctss.model.Flow(sim=sim, sf_type_chain=[0, 1], qos_max_delay=50000000,
+                                         desired_egress_ssf_id=rand.choice(sffs).id,
+                                         ingress_sff_id=sff.id,
+                                         start_time=rand.randint(0, 200000))
+                for i in range(10):
+                    sim.schedule_event(sfctss.model.Packet.create_wrap_in_event(
+                        time_ingress=flow.start_time + i * rand.randint(1000, 2000),
+                        flow=flow,
+                        transmission_size=1))
+        
+        return {sff.id: sff.id for sff in sffs}
+
+
+@given('a setup of "{sites:d}" sites with "{sfis:d}" SFIs per site and SF type using scheduler "{scheduler}" '
+       'and "{flows:d}" flows per site')
+def step_impl(context, sites, sfis, scheduler, flows):
+    context.site_setup = SiteSetup(sites, sfis, scheduler, flows)
+
+
+@when('we run the setup in a single simulation')
+def step_impl(context):
+    sim = sfctss.simulator.Sim(seed=0)
+    context.site_setup(sim)
+    sim.run_sim(show_progress=False)
+    context.single_counters = sim.get_statistics_counters()
+    context.single_stats = sim.stats
+
+
+@when('we run the setup partitioned by site')
+def step_impl(context):
+    context.partitioned_sim = sfctss.pdes.PartitionedSimulation(builder=context.site_setup,
+                                                                number_of_partitions=context.site_setup.sites,
+                                                                seed=0, start_method='fork')
+    context.partitioned_sim.run_sim(show_progress=False)
+
+
+@then('the partitioned simulation uses a lookahead of "{lookahead:d}"')
+def step_impl(context, lookahead):
+    sure.expect(context.partitioned_sim.lookahead).equal(lookahead)
+
+
+@then('the partitioned simulation has the same number of packets as the single simulation')
+def step_impl(context):
+    counters = context.partitioned_sim.counters
+    sure.expect(counters['packets_total']).equal(context.single_counters['packets_total'])
+    sure.expect(counters['exported_packets']).equal(counters['imported_packets'])
+    sure.expect(counters['exported_packets']).greater_than(0)
+
+
+@then('no packet is still in the partitioned simulation')
+def step_impl(context):
+    counters = context.partitioned_sim.counters
+    sure.expect(counters['packets_in_system']).equal(0)
+    sure.expect(counters['packets_successful'] + counters['packets_rejected_schedule'] +
+                counters['packets_timeout']).equal(counters['packets_total'])
+
+
+@then('the success rate of the partitioned simulation is in the range of the single simulation allow delta {delta}')
+def step_impl(context, delta):
+    sure.expect(context.partitioned_sim.stats['success_rate']).equal(context.single_stats['success_rate'],
+                                                                      epsilon=float(delta))
@@ -0,0 +1,288 @@
+# coding=utf-8
+import json
+import os
+import tempfile
+
+import sure
+from behave import given, when, then, step
+
+import sfctss
+
+
+@given('we register counting hooks at the simulator')
+def step_impl(context):
+    context.hook_calls = {'done': 0, 'tear_down': 0}
+    context.torn_down_packets = []
+    
+    def count_done(sim):
+        context.hook_calls['done'] += 1
+    
+    def count_tear_down(packet):
+        context.hook_calls['tear_down'] += 1
+        context.torn_down_packets.append((packet.has_sf_to_schedule(), hasattr(packet, '__dict__'),
+                                          hasattr(packet.flow, '__dict__')))
+    
+    context.sim.register_simulation_done_hook(count_done)
+    sfctss.model.Packet.register_tear_down(count_tear_down, sim=context.sim)
+    context.hooks = [count_done, count_tear_down]
+
+
+@then('the counting hooks were called "{done:d}" times when the simulation is done and "{tear_down:d}" times for tear down packets')
+def step_impl(context, done, tear_down):
+    sure.expect(context.hook_calls['done']).equal(done)
+    sure.expect(context.hook_calls['tear_down']).equal(tear_down)
+
+
+@then('each torn down packet scheduled all sf types of its flow, and packets and flows have no instance dict')
+def step_impl(context):
+    sure.expect(context.torn_down_packets).to_not.be.empty
+    for state in context.torn_down_packets:
+        sure.expect(state).equal((False, False, False))
+
+
+@then('a new simulator does not use the hooks of the previous simulator')
+def step_impl(context):
+    sim = sfctss.simulator.Sim(context.sim_conf['seed'])
+    for hook in context.hooks:
+        sure.expect(sim.simulation_done_hooks).to_not.contain(hook)
+        sure.expect(sim.props.packet.teardown_hooks).to_not.contain(hook)
+        sure.expect(sfctss.simulator.Sim.simulation_done_hooks).to_not.contain(hook)
+        sure.expect(sfctss.model.Packet.teardown_hooks).to_not.contain(hook)
+
+
+@when('we keep the statistics of the simulation')
+def step_impl(context):
+    context.sim.calculate_simple_statistics()
+    context.kept_statistics = dict(context.sim.stats)
+
+
+@then('the statistics of the simulation are equal to the kept statistics')
+def step_impl(context):
+    context.sim.calculate_simple_statistics()
+    sure.expect(context.sim.stats).equal(context.kept_statistics)
+
+
+@given('we activate the event profiler')
+def step_impl(context):
+    context.sim.PROFILE_EVENTS = True
+
+
+@then('the profile counts all ticks and has a scheduler entry for each of the "{sffs:d}" SFFs')
+def step_impl(context, sffs):
+    report = context.sim.profiler.get_report()
+    sure.expect(report['ticks']).to.be.greater_than(0)
+    sure.expect(sum(e['count'] for e in report['events'].values())).equal(report['ticks'])
+    sure.expect(report['events']).to.contain('IngressEvent')
+    sure.expect(report['event_list_size'][0]['tick']).equal(0)
+    sure.expect([s['sff'] for s in report['schedulers']]).equal(list(range(sffs)))
+    for s in report['schedulers']:
+        sure.expect(s['calls']).to.be.greater_than(0)
+        sure.expect(s['time_ns']).to.be.lower_than(report['event_time_ns'])
+    # the scheduler methods are not wrapped anymore after the simulation
+    for sff in context.sim.props.sff.allSFFs.values():
+        sure.expect(vars(sff.scheduler)).to_not.contain('handle_packet_arrival')
+
+
+@then('the profile written as json has the same content')
+def step_impl(context):
+    path = os.path.join(tempfile.mkdtemp(), 'profile.json')
+    context.sim.profiler.write_json(path)
+    with open(path) as f:
+        sure.expect(json.load(f)).equal(context.sim.profiler.get_report())
+
+
+@given('we record the paths of the packets which are done')
+def step_impl(context):
+    context.done_paths = []
+    
+    def record_path(packet):
+        if packet.final_state == 'done':
+            context.done_paths.append((packet.fullPath, packet.ingress_sff_id))
+    
+    sfctss.model.Packet.register_tear_down(record_path, sim=context.sim)
+
+
+@then('the recorded paths are valid paths from the ingress, and packets with the same path share it')
+def step_impl(context):
+    sure.expect(context.done_paths).to_not.be.empty
+    shared_paths = {}
+    for path, ingress_sff_id in context.done_paths:
+        sure.expect(path).to.be.a(tuple)
+        sfctss.sanity.validate_path(path, context.sim.props.sff.allSFFs[ingress_sff_id])
+        sure.expect(shared_paths.setdefault(path, path)).to.be(path)
+    sure.expect(len(shared_paths)).lower_than(len(context.done_paths))
+
+
+@given('we write the packet statistics of experiment "{exp_id}" into a temporary directory')
+def step_impl(context, exp_id):
+    context.add_cleanup(os.chdir, os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    sfctss.measurement.SimStats.activate(context.sim, exp_id)
+    sfctss.measurement.SimStats.activate_packet_statistics(context.sim)
+
+
+@then('the packet statistics hold a row for each torn down packet, and the csv file "{filename}" has the same rows')
+def step_impl(context, filename):
+    columns = context.sim.props.sim_stats.packetStats.get_columns()
+    sure.expect(len(columns['id'])).equal(context.hook_calls['tear_down'])
+    sure.expect(set(columns['status'])).equal({'done'})
+    sure.expect(list(columns['time_total'])).equal(list(columns['time_processing'] + columns['time_network'] +
+                                                       columns['time_queue_scheduling'] +
+                                                       columns['time_processing_queue'] +
+                                                       columns['time_network_queue']))
+    with open(filename) as f:
+        header = f.readline().strip().split(',')
+        rows = [line.strip().split(',') for line in f]
+    sure.expect(header[0]).equal('id')
+    sure.expect([int(row[0]) for row in rows]).equal(list(columns['id']))
+    sure.expect([row[header.index('status')] for row in rows]).equal(list(columns['status']))
+
+
+@given('we keep a registry of the packets in the network')
+def step_impl(context):
+    context.sim.KEEP_LIST_OF_ALL_PACKETS = True
+
+
+def get_packet_counters(sim: sfctss.simulator.Sim) -> dict:
+    packet_props = sim.props.packet
+    return {'in_system': packet_props.counter_packet_in_system,
+            'in_system_after_workload': packet_props.counter_packet_after_workload_end_in_system_no_timeout,
+            'successful': packet_props.statsPacketsSuccessfulProcessed,
+            'timeout': packet_props.statsPacketsRejectedProcessingDelay,
+            'rejected': packet_props.statsPacketsRejectedSchedule,
+            'sum_delay': packet_props.statsSumDelay}
+
+
+@then('the registry of the packets is empty')
+def step_impl(context):
+    sure.expect(context.sim.KEEP_LIST_OF_ALL_PACKETS).equal(True)
+    sure.expect(list(context.sim.props.packet.live)).to.be.empty
+
+
+@when('we keep the packet counters of the simulation')
+def step_impl(context):
+    context.kept_packet_counters = get_packet_counters(context.sim)
+
+
+@then('the packet counters of the simulation are equal to the kept packet counters')
+def step_impl(context):
+    sure.expect(get_packet_counters(context.sim)).equal(context.kept_packet_counters)
+
+
+@when('we run the simulation till "{time:d}"')
+def step_impl(context, time):
+    context.sim.run_warm_up(time)
+
+
+@then('the registry locates the packets in the queues of the SFFs and SFIs, and by their flow')
+def step_impl(context):
+    sim = context.sim
+    live = sim.props.packet.live
+    sure.expect(len(live)).equal(sim.props.packet.counter_packet_in_system)
+    queued_at_sff = set()
+    for sff in sim.props.sff.allSFFs.values():
+        queues = sff.packet_queue_per_class.values() if hasattr(sff, 'packet_queue_per_class') else [sff.packet_queue]
+        for queue in queues:
+            queued_at_sff.update(packet.id for packet in queue)
+    queued_at_sfi = set(packet.id for sfi in sim.props.sfi.all_sfi.values() for packet in sfi.queue)
+    sure.expect(queued_at_sff.union(queued_at_sfi)).to_not.be.empty
+    location = sfctss.model.PacketLocation
+    sure.expect(set(packet.id for packet in live.get_packets_at(location.sff_queue))).equal(queued_at_sff)
+    sure.expect(set(packet.id for packet in live.get_packets_at(location.sfi_queue))).equal(queued_at_sfi)
+    sure.expect(sum(live.get_number_of_packets_per_location().values())).equal(len(live))
+    flows = set(packet.flow for packet in live)
+    sure.expect(sum(len(live.get_packets_of_flow(flow.id)) for flow in flows)).equal(len(live))
+    for flow in flows:
+        for packet in live.get_packets_of_flow(flow.id):
+            sure.expect(packet.flow).to.be(flow)
+            sure.expect(live.get(packet.id)).to.be(packet)
+
+
+@given('the SFC classes "{do_or_not:DoDoNot}" depend on the egress')
+def step_impl(context, do_or_not):
+    context.sim.props.flow.individual_class_per_egress = do_or_not == 'do'
+
+
+@then('the SFC registry has "{number:d}" SFCs, and its class tables match the classes of the packets in the network')
+def step_impl(context, number):
+    flow_props = context.sim.props.flow
+    sure.expect(len(flow_props.sfc_chains)).equal(number)
+    sure.expect(len(flow_props.sfc_ids)).equal(number)
+    sure.expect(sorted(flow_props.sfc_ids.values())).equal(list(range(number)))
+    for sfc_id, chain in enumerate(flow_props.sfc_chains):
+        sfc_class = flow_props.sfc_class_base[sfc_id]
+        sure.expect(flow_props.sfc_classes[flow_props.sfc_identifiers[sfc_id]]).equal(sfc_class)
+        for pos, sf in enumerate(chain):
+            sure.expect((flow_props.class_sf_type[sfc_class + pos], flow_props.class_eoc[sfc_class + pos])).equal(
+                flow_props.sfc_class_to_sf[sfc_class + pos])
+            sure.expect(flow_props.class_deadline[sfc_class + pos]).equal(
+                flow_props.sfc_class_to_deadline[sfc_class + pos])
+    live = context.sim.props.packet.live
+    sure.expect(len(live)).to.be.greater_than(0)
+    for packet in live:
+        flow = packet.flow
+        sure.expect(flow.sfTypeChain).to.be(flow_props.sfc_chains[flow.sfc_id])
+        sure.expect(flow.sfc_class).equal(flow_props.sfc_class_base[flow.sfc_id])
+        sure.expect(packet.packet_class).equal(flow.sfc_class + packet.sfc_position)
+
+
+@given('the MPP scheduler does sanity checks')
+def step_impl(context):
+    context.sim.props.mpp_scheduler.do_sanity_checks = True
+
+
+@then('each packet class maps back to its SFC and position')
+def step_impl(context):
+    flow_props = context.sim.props.flow
+    sure.expect(flow_props.sfc_next_free_class).to.be.greater_than(0)
+    for packet_class in range(flow_props.sfc_next_free_class):
+        sfc_id, pos = sfctss.model.Flow.get_sfc_id_and_pos_of_packet_class(context.sim, packet_class)
+        sure.expect(flow_props.sfc_class_base[sfc_id] + pos).equal(packet_class)
+        sure.expect(flow_props.sfc_chains[sfc_id][pos]).equal(flow_props.class_sf_type[packet_class])
+        sfc_identifier, pos_of_identifier = sfctss.model.Flow.get_sfc_identifier_and_pos_of_packet_class(
+            context.sim, packet_class)
+        sure.expect(flow_props.sfc_classes[sfc_identifier] + pos_of_identifier).equal(packet_class)
+    for packet_class in [-1, flow_props.sfc_next_free_class]:
+        sure.expect(sfctss.model.Flow.get_sfc_id_and_pos_of_packet_class(context.sim, packet_class)).to.be.none
+        sure.expect(sfctss.model.Flow.get_sfc_identifier_and_pos_of_packet_class(context.sim, packet_class)).to.be.none
+
+
+@given('we trace the path of all packets')
+def step_impl(context):
+    context.sim.TRACE_PACKET_PATH = True
+
+
+@given('we debug the packet with id "{packet_id:d}"')
+def step_impl(context, packet_id):
+    context.sim.PACKET_ID_TO_DEBUG = packet_id
+
+
+@then('the simulator uses the handlers "{with_or_without}" tracing')
+def step_impl(context, with_or_without):
+    for sff in context.sim.props.sff.allSFFs.values():
+        for name in sfctss.model.SFF.traced_handlers:
+            sure.expect(name in vars(sff)).equal(with_or_without == 'with')
+    for sfi in context.sim.props.sfi.all_sfi.values():
+        for name in sfctss.model.SFI.traced_handlers:
+            sure.expect(name in vars(sfi)).equal(with_or_without == 'with')
+    packet_props = context.sim.props.packet
+    if with_or_without == 'with':
+        sure.expect(packet_props.packet_type).to.be(sfctss.model.TracedPacket)
+        sure.expect(packet_props.network_delay_event_type).to.be(sfctss.model.TracedNetworkDelayEvent)
+    else:
+        sure.expect(packet_props.packet_type).to.be(sfctss.model.Packet)
+        sure.expect(packet_props.network_delay_event_type).to.be(sfctss.model.NetworkDelayEvent)
+
+
+@step('we draw "{number:d}" random numbers from the stream "{name}" of the simulator')
+def step_impl(context, number, name):
+    if 'drawn_random_numbers' not in context:
+        context.drawn_random_numbers = {}
+    stream = context.sim.random_streams.get(name)
+    context.drawn_random_numbers[name] = [stream.random() for _ in range(number)]
+
+
+@then('the stream "{name}" of the simulator gives the same "{number:d}" random numbers')
+def step_impl(context, name, number):
+    stream = context.sim.random_streams.get(name)
+    sure.expect([stream.random() for _ in range(number)]).equal(context.drawn_random_numbers[name])
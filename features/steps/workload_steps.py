@@ -0,0 +1,325 @@
+# coding=utf-8
+import gc
+import json
+import os
+import tempfile
+
+import numpy as np
+import sure
+from behave import given, when, then
+
+import sfctss
+
+
+def create_synthetic_workload(context, generator, workload_lambda, till, chunk_size, cache=None, prepare=True):
+    config = sfctss.workload.VectorizedSyntheticWorkloadGenerator.get_default_config()
+    config['workload_lambda'] = workload_lambda
+    config['workload_start_new_flows_till'] = till
+    config['workload_chunk_size'] = chunk_size
+    if 'workload_models' in context:
+        config.update(context.workload_models)
+    if generator == 'synthetic':
+        context.workload = sfctss.workload.SyntheticWorkloadGenerator(context.sim, context.random, config)
+    elif generator == 'vectorized':
+        context.workload = sfctss.workload.VectorizedSyntheticWorkloadGenerator(context.sim, context.random, config)
+    else:
+        raise NameError(f'unknown workload generator {generator}')
+    if not prepare:
+        return
+    if cache is None:
+        context.workload.prepare_before_simulation_starts()
+    else:
+        cache.prepare_before_simulation_starts(context.workload)
+    context.workload_flows = len(context.workload.flows)
+    context.workload_packets = int(sum(context.workload.flow_sizes))
+
+
+@given('we use the "{generator}" synthetic workload generator with lambda "{workload_lambda:d}" for "{till:d}" µs and '
+       'chunks of "{chunk_size:d}" flows')
+def step_impl(context, generator, workload_lambda, till, chunk_size):
+    create_synthetic_workload(context, generator, workload_lambda, till, chunk_size)
+
+
+@given('we configure the "{generator}" synthetic workload generator with lambda "{workload_lambda:d}" for "{till:d}" µs '
+       'without preparing it')
+def step_impl(context, generator, workload_lambda, till):
+    create_synthetic_workload(context, generator, workload_lambda, till, 100, prepare=False)
+
+
+def check_overloaded_sf_types(context, sf_types):
+    offered_load = sfctss.sanity.get_offered_load(context.sim, context.workload, expected=True)
+    sure.expect(offered_load['overloaded_sf'].tolist()).equal(sf_types)
+    sure.expect(context.workload.flows).equal(None)
+
+
+@then('the expected offered load of the workload overloads the sf types "{sf_types}"')
+def step_impl(context, sf_types):
+    check_overloaded_sf_types(context, [int(sf) for sf in sf_types.split(',')])
+
+
+@then('the expected offered load of the workload overloads no sf type')
+def step_impl(context):
+    check_overloaded_sf_types(context, [])
+
+
+@then('checking the expected offered load of the workload fails')
+def step_impl(context):
+    sfctss.sanity.check_offered_load.when.called_with(context.sim, context.workload).should.throw(
+        sfctss.sanity.OfferedLoadTooHigh)
+
+
+@then('the offered load of the workload differs by less than "{percent:d}"% from its expected offered load')
+def step_impl(context, percent):
+    demand = sfctss.sanity.get_offered_load(context.sim, context.workload)['demand_per_sff']
+    expected_demand = sfctss.sanity.get_offered_load(context.sim, context.workload, expected=True)['demand_per_sff']
+    sure.expect(demand.shape).equal(expected_demand.shape)
+    for value, expected_value in zip(demand.reshape(-1).tolist(), expected_demand.reshape(-1).tolist()):
+        sure.expect(value).equal(expected_value, epsilon=expected_value * percent / 100)
+
+
+@then('the workload statistics count the packets of all flows for each sf of their chain')
+def step_impl(context):
+    workload = context.workload
+    packets = {sf: 0 for sf in range(len(context.sim.props.sfi.processingRateOfSfType))}
+    for flow, size in zip(workload.flows, workload.get_sizes_of_flows().tolist()):
+        for sf in flow.sfTypeChain:
+            packets[sf] += size
+    statistics = workload.get_workload_statistics()
+    sure.expect({sf: statistics[sf][0] for sf in statistics}).equal(packets)
+
+
+@given('the workload uses the "{model}" flow {kind} model with')
+def step_impl(context, model, kind):
+    if kind not in ['arrival', 'size']:
+        raise NameError(f'unknown kind of workload model {kind}')
+    if 'workload_models' not in context:
+        context.workload_models = {}
+    config = {'model': model}
+    for row in context.table:
+        config[row['parameter']] = json.loads(row['value'])
+    context.workload_models[f'workload_flow_{kind}_model'] = config
+
+
+@given('the workload uses an empirical flow size model fitted to the flow sizes of the workload')
+def step_impl(context):
+    if 'workload_models' not in context:
+        context.workload_models = {}
+    context.workload_models['workload_flow_size_model'] = sfctss.workload_models.EmpiricalFlowSize.fit(
+        context.workload.flow_sizes).get_config()
+
+
+@then('the mean flow size of the workload differs by less than "{percent:d}"% from the mean of its model')
+def step_impl(context, percent):
+    mean = context.workload.get_flow_size_model().get_mean()
+    sure.expect(float(np.mean(context.workload.flow_sizes))).equal(float(mean), epsilon=mean * percent / 100)
+
+
+@then('the largest flow of the workload has more than "{factor:d}" times the packets of the mean flow')
+def step_impl(context, factor):
+    sizes = context.workload.flow_sizes
+    sure.expect(float(np.max(sizes))).to.be.greater_than(factor * float(np.mean(sizes)))
+
+
+@then('the number of flows of the workload differs by less than "{percent:d}"% from the expected number of its model')
+def step_impl(context, percent):
+    workload = context.workload
+    expected = (len(context.sim.props.sff.allSFFs) * workload.config['workload_start_new_flows_till'] /
+                workload.get_flow_arrival_model().get_mean_gap())
+    sure.expect(float(context.workload_flows)).equal(expected, epsilon=expected * percent / 100)
+
+
+@then('in the busiest tenth of the period "{ratio:d}" times more flows start than in the quietest tenth')
+def step_impl(context, ratio):
+    period = context.workload.get_flow_arrival_model().period
+    start_times = np.array([flow.start_time for flow in context.workload.flows])
+    flows_per_tenth = np.bincount((start_times % period * 10 // period).astype(np.int64), minlength=10)
+    sure.expect(float(flows_per_tenth.max())).to.be.greater_than(ratio * float(flows_per_tenth.min()))
+
+
+@given('we use a workload cache of "{max_bytes:d}" bytes')
+def step_impl(context, max_bytes):
+    context.workload_cache = sfctss.workload.WorkloadCache(tempfile.mkdtemp(), max_bytes=max_bytes)
+
+
+@given('we use the "{generator}" synthetic workload generator with lambda "{workload_lambda:d}" for "{till:d}" µs '
+       'through the workload cache')
+def step_impl(context, generator, workload_lambda, till):
+    create_synthetic_workload(context, generator, workload_lambda, till, 100, cache=context.workload_cache)
+
+
+def get_packets_of_workload(workload):
+    packets = []
+    while True:
+        try:
+            event = workload.__next__()
+        except StopIteration:
+            return packets
+        packets.append((event.time, event.flow.id, str(event.flow), event.transmission_size))
+
+
+@given('the global numpy random state is seeded with "{seed:d}"')
+def step_impl(context, seed):
+    np.random.seed(seed)
+
+
+@given('we keep the packets of the workload')
+def step_impl(context):
+    context.kept_packets = get_packets_of_workload(context.workload)
+
+
+@then('the workload creates the kept packets')
+def step_impl(context):
+    sure.expect(get_packets_of_workload(context.workload)).equal(context.kept_packets)
+
+
+@then('the workload cache has "{hits:d}" hits, "{misses:d}" misses, and "{entries:d}" entries')
+def step_impl(context, hits, misses, entries):
+    cache = context.workload_cache
+    sure.expect(cache.hits).equal(hits)
+    sure.expect(cache.misses).equal(misses)
+    sure.expect(len([f for f in os.listdir(cache.directory) if f.endswith('.npz')])).equal(entries)
+
+
+@then('the workload generator creates all packets of its flows in chunks sorted by time')
+def step_impl(context):
+    workload = context.workload
+    packets_per_flow = {flow: 0 for flow in workload.flows}
+    packets = 0
+    chunks = 0
+    while True:
+        try:
+            event = workload.__next__()
+        except StopIteration:
+            break
+        if workload.next_packet == 1:
+            chunks += 1
+        else:
+            sure.expect(event.time).to.be.greater_than_or_equal_to(previous_time)
+        previous_time = event.time
+        packets_per_flow[event.flow] += 1
+        sure.expect(event.time).to.be.greater_than_or_equal_to(event.flow.start_time)
+        packets += 1
+    sure.expect(packets).equal(context.workload_packets)
+    sure.expect([packets_per_flow[flow] for flow in workload.flows]).equal(workload.flow_sizes.tolist())
+    sure.expect(chunks).equal(-(-len(workload.flows) // workload.config['workload_chunk_size']))
+
+
+@given('we keep the number of flows and packets of the workload')
+def step_impl(context):
+    context.kept_workload = (context.workload_flows, context.workload_packets)
+
+
+@then('the number of flows and packets of the workload differ by less than "{percent:d}"% from the kept ones')
+def step_impl(context, percent):
+    flows, packets = context.kept_workload
+    sure.expect(float(context.workload_flows)).equal(float(flows), epsilon=flows * percent / 100)
+    sure.expect(float(context.workload_packets)).equal(float(packets), epsilon=packets * percent / 100)
+
+
+@given('we register the workload generator at the simulator')
+def step_impl(context):
+    context.sim.register_packet_generator(context.workload)
+
+
+@then('all packets of the workload are counted in the statistics')
+def step_impl(context):
+    packet_props = context.sim.props.packet
+    sure.expect(packet_props.statsPacketsTotalCount).equal(context.workload_packets)
+    sure.expect(packet_props.statsPacketsSuccessfulProcessed + packet_props.statsPacketsRejectedProcessingDelay +
+                packet_props.statsPacketsRejectedSchedule).equal(context.workload_packets)
+
+
+@given('we record the workload trace of the simulation')
+def step_impl(context):
+    if 'workload_traces' not in context:
+        context.workload_traces = []
+    context.workload_traces.append(tempfile.mkdtemp())
+    sfctss.measurement.SimStats.activate_workload_trace(context.sim, context.workload_traces[-1])
+
+
+@given('we replay the recorded workload trace in chunks of "{chunk_size:d}" packets')
+def step_impl(context, chunk_size):
+    config = sfctss.trace.TraceWorkloadGenerator.get_default_config()
+    config['workload_trace'] = context.workload_traces[-1]
+    config['workload_chunk_size'] = chunk_size
+    context.workload = sfctss.trace.TraceWorkloadGenerator(context.sim, context.random, config)
+    context.workload.prepare_before_simulation_starts()
+    context.workload_packets = context.workload.meta['count']
+
+
+@then('the workload generator released the flows which have no packet in the simulation')
+def step_impl(context):
+    gc.collect()
+    workload = context.workload
+    handed_out = workload.next_packet - (len(workload.chunk) - workload.chunk_position)
+    flows_handed_out = set(workload.get_columns()['flow_id'][:handed_out].tolist())
+    held_flows = set(workload.flows.keys())
+    sure.expect(held_flows.issubset(flows_handed_out)).equal(True)
+    if context.sim.event_list.len() == 0:
+        sure.expect(held_flows).to.be.empty
+    else:
+        sure.expect(len(held_flows)).to.be.lower_than(len(flows_handed_out))
+
+
+@then('the recorded workload traces are equal')
+def step_impl(context):
+    recorded, replayed = context.workload_traces[-2:]
+    meta = sfctss.trace.WorkloadTrace.read_meta(recorded)
+    sure.expect(sfctss.trace.WorkloadTrace.read_meta(replayed)).equal(meta)
+    recorded_columns = sfctss.trace.WorkloadTrace.open_columns(recorded, meta)
+    replayed_columns = sfctss.trace.WorkloadTrace.open_columns(replayed, meta)
+    for column in sfctss.trace.WorkloadTrace.columns:
+        sure.expect(replayed_columns[column].tolist()).equal(recorded_columns[column].tolist())
+
+
+@given('we register the workload generator at the simulator through a background producer with "{slots:d}" slots of '
+       '"{batch_size:d}" packets')
+def step_impl(context, slots, batch_size):
+    context.producer = sfctss.producer.BackgroundWorkloadProducer(context.sim, context.workload, slots=slots,
+                                                                  batch_size=batch_size)
+    context.sim.register_packet_generator(context.producer)
+
+
+@then('the background producer is done')
+def step_impl(context):
+    sure.expect(context.producer.done).equal(True)
+    sure.expect(context.producer.process).equal(None)
+    sure.expect(context.producer.finalizer).equal(None)
+    # the producer keeps only the flows of packets in the simulation
+    gc.collect()
+    sure.expect(len(context.producer.flows)).equal(0)
+
+
+class FailingEvent(sfctss.events.BaseEvent):
+    __slots__ = []
+    
+    def process_event(self):
+        raise NameError("the simulation fails")
+
+
+@when('the simulation fails at "{time:d}"')
+def step_impl(context, time):
+    context.sim.run_warm_up(time - 1)
+    context.producer_process = context.producer.process
+    context.producer_shm_name = context.producer.ring.shm.name
+    sure.expect(context.producer_process.is_alive()).equal(True)
+    context.sim.schedule_event(FailingEvent(time))
+    context.sim.run_sim.when.called_with(show_progress=False).should.throw(NameError, "the simulation fails")
+
+
+@then('the process of the background producer is stopped and its shared memory is freed')
+def step_impl(context):
+    sure.expect(context.producer_process.is_alive()).equal(False)
+    sure.expect(os.path.exists(os.path.join('/dev/shm', context.producer_shm_name.lstrip('/')))).equal(False)
+
+
+@given('we use the adaptive refill policy with a memory budget of "{memory_budget:d}" bytes')
+def step_impl(context, memory_budget):
+    context.sim.refill_policy = sfctss.events.AdaptiveRefillPolicy(memory_budget=memory_budget, initial_events=1000)
+
+
+@then('the workload was refilled at least "{refills:d}" times and buffered at most "{max_bytes:d}" bytes')
+def step_impl(context, refills, max_bytes):
+    report = context.sim.refill_policy.get_report(context.sim.event_list)
+    sure.expect(report['refills']).to.be.greater_than_or_equal_to(refills)
+    sure.expect(report['max_buffered_bytes']).to.be.lower_than_or_equal_to(max_bytes)
@@ -0,0 +1,233 @@
+Feature: Workload Generators
+
+  Background: a valid simulator setup
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+
+  Scenario: the vectorized workload generator creates all packets of its flows in chunks sorted by time
+    Given we use the "vectorized" synthetic workload generator with lambda "20" for "1000000" µs and chunks of "200" flows
+    Then the workload generator creates all packets of its flows in chunks sorted by time
+
+  Scenario Outline: the vectorized workload generator draws the same workload model as the synthetic one with lambda <lambda>
+    Given we use the "synthetic" synthetic workload generator with lambda "<lambda>" for "5000000" µs and chunks of "4096" flows
+    And we keep the number of flows and packets of the workload
+    Given we use the "vectorized" synthetic workload generator with lambda "<lambda>" for "5000000" µs and chunks of "4096" flows
+    Then the number of flows and packets of the workload differ by less than "5"% from the kept ones
+
+    Examples: lambda
+      | lambda |
+      | 5      |
+      | 60     |
+
+  Scenario: a simulation with the vectorized workload generator accounts for all packets
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "200000" µs and chunks of "50" flows
+    And we register the workload generator at the simulator
+    When we let the simulation run till all processing is done
+    Then no packet is still in the simulator
+    And all packets of the workload are counted in the statistics
+
+  Scenario: a recorded workload trace replays the same ingress stream
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "200000" µs and chunks of "50" flows
+    And we register the workload generator at the simulator
+    And we record the workload trace of the simulation
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we replay the recorded workload trace in chunks of "1000" packets
+    And we register the workload generator at the simulator
+    And we record the workload trace of the simulation
+    When we let the simulation run till all processing is done
+    Then all packets of the workload are counted in the statistics
+    And the recorded workload traces are equal
+    And the statistics of the simulation are equal to the kept statistics
+
+  Scenario: a replayed workload trace releases the flows which have no packet in the simulation
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "1000000" µs and chunks of "50" flows
+    And we register the workload generator at the simulator
+    And we record the workload trace of the simulation
+    When we let the simulation run till all processing is done
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we replay the recorded workload trace in chunks of "1000" packets
+    And we use the adaptive refill policy with a memory budget of "100000" bytes
+    And we register the workload generator at the simulator
+    When we run the simulation till "500000"
+    Then the workload generator released the flows which have no packet in the simulation
+    When we let the simulation run till all processing is done
+    Then all packets of the workload are counted in the statistics
+    And the workload generator released the flows which have no packet in the simulation
+
+  Scenario Outline: the <generator> workload generator reuses a prepared workload of the workload cache
+    Given we use a workload cache of "100000000" bytes
+    And we use the "<generator>" synthetic workload generator with lambda "20" for "300000" µs through the workload cache
+    And we keep the packets of the workload
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And we use the "<generator>" synthetic workload generator with lambda "20" for "300000" µs through the workload cache
+    Then the workload creates the kept packets
+    And the workload cache has "1" hits, "1" misses, and "1" entries
+
+    Examples: generators
+      | generator  |
+      | synthetic  |
+      | vectorized |
+
+  Scenario Outline: the <generator> workload generator does not depend on the global numpy random state
+    Given we use a workload cache of "100000000" bytes
+    And the global numpy random state is seeded with "1"
+    And we use the "<generator>" synthetic workload generator with lambda "20" for "300000" µs through the workload cache
+    And we keep the packets of the workload
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And the global numpy random state is seeded with "2"
+    And we use the "<generator>" synthetic workload generator with lambda "20" for "300000" µs through the workload cache
+    Then the workload creates the kept packets
+    And the workload cache has "1" hits, "1" misses, and "1" entries
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And the global numpy random state is seeded with "3"
+    And we use the "<generator>" synthetic workload generator with lambda "20" for "300000" µs and chunks of "100" flows
+    Then the workload creates the kept packets
+
+    Examples: generators
+      | generator  |
+      | synthetic  |
+      | vectorized |
+
+  Scenario: the workload cache removes the least recently used workloads
+    Given we use a workload cache of "1" bytes
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "300000" µs through the workload cache
+    And we use the "vectorized" synthetic workload generator with lambda "30" for "300000" µs through the workload cache
+    Then the workload cache has "0" hits, "2" misses, and "1" entries
+
+  Scenario: a simulation with a background workload producer has the same results as with the workload generator
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "200000" µs and chunks of "50" flows
+    And we register the workload generator at the simulator
+    When we let the simulation run till all processing is done
+    And we keep the statistics of the simulation
+    Given an empty simulator setup
+    And we have "2" SFFs using scheduler "GreedyLocal"
+    And we have latency class "0" of latency "10"
+    And we connect all sff with each other using latency class "0"
+    And we have "2" sfi types and SFF-SFI connections use latency class "0"
+    And we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "200000" µs and chunks of "50" flows
+    And we register the workload generator at the simulator through a background producer with "4" slots of "100" packets
+    When we let the simulation run till all processing is done
+    Then all packets of the workload are counted in the statistics
+    And the statistics of the simulation are equal to the kept statistics
+    And the background producer is done
+
+  Scenario: a background workload producer is stopped when its simulation fails
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "2000000" µs and chunks of "50" flows
+    And we use the adaptive refill policy with a memory budget of "100000" bytes
+    And we register the workload generator at the simulator through a background producer with "4" slots of "100" packets
+    When the simulation fails at "10000"
+    Then the process of the background producer is stopped and its shared memory is freed
+
+  Scenario: the adaptive refill policy keeps the buffered workload within its memory budget
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "vectorized" synthetic workload generator with lambda "60" for "400000" µs and chunks of "20" flows
+    And we use the adaptive refill policy with a memory budget of "1000000" bytes
+    And we register the workload generator at the simulator
+    When we let the simulation run till all processing is done
+    Then all packets of the workload are counted in the statistics
+    And the workload was refilled at least "5" times and buffered at most "2000000" bytes
+
+  Scenario: the vectorized workload generator draws heavy tailed flow sizes of the pareto flow size model
+    Given the workload uses the "pareto" flow size model with
+      | parameter | value |
+      | alpha     | 1.5   |
+      | minimum   | 50    |
+      | maximum   | 10000 |
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "2000000" µs and chunks of "200" flows
+    Then the mean flow size of the workload differs by less than "10"% from the mean of its model
+    And the largest flow of the workload has more than "10" times the packets of the mean flow
+    And the workload generator creates all packets of its flows in chunks sorted by time
+
+  Scenario: a fitted empirical flow size model draws flows of the same mean size as the fitted workload
+    Given the workload uses the "lognormal" flow size model with
+      | parameter | value |
+      | mean      | 100   |
+      | sigma     | 1     |
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "2000000" µs and chunks of "200" flows
+    Then the mean flow size of the workload differs by less than "5"% from the mean of its model
+    Given the workload uses an empirical flow size model fitted to the flow sizes of the workload
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "2000000" µs and chunks of "200" flows
+    Then the mean flow size of the workload differs by less than "5"% from the mean of its model
+
+  Scenario Outline: the vectorized workload generator draws the flow arrivals of an on-off source with periods of alpha <alpha>
+    Given the workload uses the "on-off" flow arrival model with
+      | parameter | value   |
+      | mean_gap  | 25      |
+      | on_mean   | 500     |
+      | off_mean  | 1500    |
+      | alpha     | <alpha> |
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "1000000" µs and chunks of "200" flows
+    Then the number of flows of the workload differs by less than "10"% from the expected number of its model
+
+    Examples: exponential and pareto distributed periods
+      | alpha |
+      | null  |
+      | 2.5   |
+
+  Scenario: the diurnal flow arrival model modulates the rate of its base model
+    Given the workload uses the "diurnal" flow arrival model with
+      | parameter | value                                   |
+      | base      | {"model": "poisson", "mean_gap": 400}   |
+      | period    | 1000000                                 |
+      | amplitude | 0.8                                     |
+    And we use the "vectorized" synthetic workload generator with lambda "20" for "4000000" µs and chunks of "200" flows
+    Then the number of flows of the workload differs by less than "5"% from the expected number of its model
+    And in the busiest tenth of the period "2" times more flows start than in the quietest tenth
+
+  Scenario Outline: the offered load of a <generator> workload matches the offered load expected by its model
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we have "2" SFIs of type "1" running on "2" servers and "do not" share the server
+    And we use the "<generator>" synthetic workload generator with lambda "60" for "3000000" µs and chunks of "200" flows
+    Then the offered load of the workload differs by less than "10"% from its expected offered load
+    And the workload statistics count the packets of all flows for each sf of their chain
+
+    Examples: generators
+      | generator  |
+      | synthetic  |
+      | vectorized |
+
+  Scenario: the expected offered load flags overloaded sf types without preparing the workload
+    Given we have "2" SFIs of type "0" running on "2" servers and "do not" share the server
+    And we configure the "vectorized" synthetic workload generator with lambda "5000" for "1000000" µs without preparing it
+    Then the expected offered load of the workload overloads the sf types "1"
+    And checking the expected offered load of the workload fails
+    Given we have "1" SFIs of type "1" running on "1" servers and "do not" share the server
+    Then the expected offered load of the workload overloads no sf type
+    Given we configure the "vectorized" synthetic workload generator with lambda "60" for "1000000" µs without preparing it
+    Then the expected offered load of the workload overloads the sf types "0,1"
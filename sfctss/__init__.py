@@ -8,7 +8,13 @@ __all__ = ["model",
            "workload",
            "sanity",
            "simulator",
-           "events"]
+           "events",
+           "pdes",
+           "profiling",
+           "trace",
+           "producer",
+           "rng",
+           "workload_models"]
 
 import json
 import os
@@ -29,3 +35,9 @@ from .sanity import *
 from .events import *
 from .scheduler import *
 from .model import *
+from .pdes import *
+from .profiling import *
+from .trace import *
+from .producer import *
+from .rng import *
+from .workload_models import *
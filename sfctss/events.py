@@ -1,9 +1,29 @@
 #!/usr/bin/env python3
 # coding=utf-8
-from sortedcontainers import SortedKeyList
+from bisect import insort
+from collections import deque
+from heapq import heappush, heappop, merge
+from typing import List, Tuple, Deque
+
+from sortedcontainers import SortedList
 
 
 class BaseEvent(object):
+    __slots__ = ['time', 'ignoreWhenFinished']
+    
+    # processed events are kept in a free list of their class and reused when a new event of the same class is
+    # created, see Sim.RECYCLE_EVENTS. each subclass gets its own free list
+    free_list: List['BaseEvent'] = []
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.free_list = []
+    
+    def __new__(cls, *args, **kwargs):
+        if cls.free_list:
+            return cls.free_list.pop()
+        return super().__new__(cls)
+    
     def __init__(self, at_time):  # absolute time of event (from start of simulation)
         # we don't allow events with floating time, since there might be a precision error -> may affect
         # deterministic property int, because float may introduce rounding errors and is more expensive
@@ -13,6 +33,10 @@ class BaseEvent(object):
     def process_event(self):
         pass
     
+    # the event must not be used anymore after it is released
+    def release(self):
+        self.free_list.append(self)
+    
     def __str__(self):
         return f"{self.__class__.__name__}({self.time})"
     
@@ -21,6 +45,7 @@ class BaseEvent(object):
 
 
 class PacketHoldingEvent(BaseEvent):
+    __slots__ = ['inner_packet']
     
     def __init__(self, at_time, inner_packet):
         super().__init__(at_time)
@@ -28,38 +53,390 @@ class PacketHoldingEvent(BaseEvent):
     
     def update_packet_time_tracking(self):
         raise NameError("this need to be implemented")
+    
+    def release(self):
+        self.inner_packet = None
+        super().release()
+
+
+# an entry of an event list backend is the tuple (time, sequence number, event).
+# the sequence number is unique and increases with every enqueued event, so entries with the same time are
+# returned in FIFO order and the event itself is never compared
+EventEntry = Tuple[int, int, BaseEvent]
+
+
+class EventListBackend(object):
+    """Priority queue holding the entries of the EventList, ordered by (time, sequence number)."""
+    
+    def push(self, entry: EventEntry):
+        raise NotImplementedError()
+    
+    def pop(self) -> EventEntry:
+        raise NotImplementedError()
+    
+    def peek(self) -> EventEntry:
+        raise NotImplementedError()
+    
+    def peek_last(self) -> EventEntry:
+        raise NotImplementedError()
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        raise NotImplementedError()
+    
+    def __len__(self):
+        raise NotImplementedError()
+
+
+class SortedListEventBackend(EventListBackend):
+    """Keeps all entries in a sorted list, O(log n) insert and pop, cheap access to both ends."""
+    
+    def __init__(self):
+        self.entries = SortedList()
+    
+    def push(self, entry: EventEntry):
+        self.entries.add(entry)
+    
+    def pop(self) -> EventEntry:
+        return self.entries.pop(0)
+    
+    def peek(self) -> EventEntry:
+        return self.entries[0]
+    
+    def peek_last(self) -> EventEntry:
+        return self.entries[-1]
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        return self.entries[:]
+    
+    def __len__(self):
+        return len(self.entries)
+
+
+class HeapEventBackend(EventListBackend):
+    """Binary heap (heapq), O(log n) insert and pop with very low constant factors."""
+    
+    def __init__(self):
+        self.heap: List[EventEntry] = []
+        # the entry with the largest time; reset when popped and searched again on demand
+        self.last: EventEntry = None
+    
+    def push(self, entry: EventEntry):
+        heappush(self.heap, entry)
+        # the sequence number of a new entry is larger than of all others, so time decides
+        if self.last is None or entry[0] >= self.last[0]:
+            self.last = entry
+    
+    def pop(self) -> EventEntry:
+        entry = heappop(self.heap)
+        if entry is self.last:
+            self.last = None
+        return entry
+    
+    def peek(self) -> EventEntry:
+        return self.heap[0]
+    
+    def peek_last(self) -> EventEntry:
+        if self.last is None:
+            self.last = max(self.heap)
+        return self.last
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        return sorted(self.heap)
+    
+    def __len__(self):
+        return len(self.heap)
+
+
+class CalendarQueueEventBackend(EventListBackend):
+    """Calendar queue (R. Brown, 1988) for integer µs timestamps.
+    Entries are hashed into buckets of `width` µs, each bucket is a small sorted list and the buckets are scanned
+    like the days of a calendar year. The queue resizes itself when its size doubles or halves, so enqueue and
+    dequeue stay O(1) on average."""
+    
+    def __init__(self, number_of_buckets: int = 2, width: int = 1000):
+        self.size = 0
+        self.last: EventEntry = None
+        self.number_of_buckets = number_of_buckets
+        self.width = width
+        self.buckets: List[List[EventEntry]] = [[] for _ in range(number_of_buckets)]
+        # bucket of the last dequeued entry and the end of its time window
+        self.current_bucket = 0
+        self.bucket_top = width
+        self.grow_threshold = 2 * number_of_buckets
+        self.shrink_threshold = number_of_buckets // 2 - 2
+    
+    def push(self, entry: EventEntry):
+        day = entry[0] // self.width
+        insort(self.buckets[day % self.number_of_buckets], entry)
+        self.size += 1
+        # the calendar may have been moved ahead to the next pending entry, so go back if this entry comes earlier
+        if entry[0] < self.bucket_top - self.width:
+            self.current_bucket = day % self.number_of_buckets
+            self.bucket_top = (day + 1) * self.width
+        if self.last is None or entry[0] >= self.last[0]:
+            self.last = entry
+        if self.size > self.grow_threshold:
+            self.resize(2 * self.number_of_buckets)
+    
+    def locate(self) -> List[EventEntry]:
+        # advance the calendar to the bucket which holds the smallest entry, and return this bucket
+        buckets = self.buckets
+        i = self.current_bucket
+        top = self.bucket_top
+        for _ in range(self.number_of_buckets):
+            bucket = buckets[i]
+            if bucket and bucket[0][0] < top:
+                self.current_bucket = i
+                self.bucket_top = top
+                return bucket
+            i += 1
+            top += self.width
+            if i == self.number_of_buckets:
+                i = 0
+        
+        # we went through a whole year without hitting an entry, so search directly for the smallest one
+        first = min(bucket[0] for bucket in buckets if bucket)
+        self.current_bucket = (first[0] // self.width) % self.number_of_buckets
+        self.bucket_top = (first[0] // self.width + 1) * self.width
+        return buckets[self.current_bucket]
+    
+    def pop(self) -> EventEntry:
+        if self.size == 0:
+            raise IndexError("pop from empty calendar queue")
+        entry = self.locate().pop(0)
+        self.size -= 1
+        if entry is self.last:
+            self.last = None
+        if self.size < self.shrink_threshold:
+            self.resize(self.number_of_buckets // 2)
+        return entry
+    
+    def peek(self) -> EventEntry:
+        if self.size == 0:
+            raise IndexError("peek into empty calendar queue")
+        return self.locate()[0]
+    
+    def peek_last(self) -> EventEntry:
+        if self.size == 0:
+            raise IndexError("peek into empty calendar queue")
+        if self.last is None:
+            self.last = max(bucket[-1] for bucket in self.buckets if bucket)
+        return self.last
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        return sorted(entry for bucket in self.buckets for entry in bucket)
+    
+    def resize(self, number_of_buckets: int):
+        entries = self.get_all_sorted()
+        
+        # estimate the bucket width from the average separation of the next entries, but ignore large gaps
+        sample = [entries[i + 1][0] - entries[i][0] for i in range(min(len(entries), 25) - 1)]
+        if len(sample) > 0:
+            average = sum(sample) / len(sample)
+            sample = [s for s in sample if s <= 2 * average]
+            average = sum(sample) / len(sample) if len(sample) > 0 else average
+            self.width = max(1, int(3 * average))
+        
+        self.number_of_buckets = max(2, number_of_buckets)
+        self.grow_threshold = 2 * self.number_of_buckets
+        self.shrink_threshold = self.number_of_buckets // 2 - 2
+        self.buckets = [[] for _ in range(self.number_of_buckets)]
+        # the entries are sorted, so we simply append them
+        for entry in entries:
+            self.buckets[(entry[0] // self.width) % self.number_of_buckets].append(entry)
+        
+        start = entries[0][0] if len(entries) > 0 else 0
+        self.current_bucket = (start // self.width) % self.number_of_buckets
+        self.bucket_top = (start // self.width + 1) * self.width
+    
+    def __len__(self):
+        return self.size
+
+
+class IngressEventBuffer(EventListBackend):
+    """Holds the events of the workload generator. New entries are appended to an unsorted list, which is sorted
+    and merged into the sorted entries only when the next entry is accessed. The workload is almost ordered by
+    time, so sorting and merging is cheap compared to inserting each entry into the dynamic event list."""
+    
+    def __init__(self):
+        self.entries = deque()
+        self.pending: List[EventEntry] = []
+    
+    def push(self, entry: EventEntry):
+        self.pending.append(entry)
+    
+    def merge_pending(self):
+        pending = self.pending
+        pending.sort()
+        entries = self.entries
+        if len(entries) > 0 and entries[-1] > pending[0]:
+            # only the overlapping part of the sorted entries has to be merged
+            overlap = []
+            while len(entries) > 0 and entries[-1] > pending[0]:
+                overlap.append(entries.pop())
+            overlap.reverse()
+            pending = merge(overlap, pending)
+        entries.extend(pending)
+        self.pending = []
+    
+    def pop(self) -> EventEntry:
+        if len(self.pending) > 0:
+            self.merge_pending()
+        return self.entries.popleft()
+    
+    def peek(self) -> EventEntry:
+        if len(self.pending) > 0:
+            self.merge_pending()
+        return self.entries[0]
+    
+    def peek_last(self) -> EventEntry:
+        if len(self.pending) > 0:
+            self.merge_pending()
+        return self.entries[-1]
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        if len(self.pending) > 0:
+            self.merge_pending()
+        return list(self.entries)
+    
+    def __len__(self):
+        return len(self.entries) + len(self.pending)
+
+
+class WorkloadRefillPolicy(object):
+    """Decides how many events the simulation takes from the workload generator. The event list asks for a refill when
+    its last relevant event is less than refill_margin µs ahead of the last popped event; the simulation then takes at
+    least slice_events events, and further events till the last relevant event is lookahead µs ahead of the last
+    relevant event before the refill. This policy uses fixed slices."""
+    
+    # memory of a pending ingress event including its entry in the event list, measured with tracemalloc
+    bytes_per_event = 264
+    
+    def __init__(self, slice_events: int = 800000, lookahead: int = 800000, refill_margin: int = 500000):
+        self.slice_events = slice_events
+        self.lookahead = lookahead
+        self.refill_margin = refill_margin
+        self.refills = 0
+        self.refilled_events = 0
+        self.max_buffered_events = 0
+    
+    def get_initial_events(self) -> int:
+        return self.slice_events
+    
+    # returns the minimum number of new events and the minimum future time
+    def get_refill(self, event_list: 'EventList') -> Tuple[int, int]:
+        return self.slice_events, self.lookahead
+    
+    def refill_done(self, event_list: 'EventList', events: int, time_before: int, time_after: int):
+        self.refills += 1
+        self.refilled_events += events
+        self.max_buffered_events = max(self.max_buffered_events, len(event_list.ingress_list))
+    
+    def get_report(self, event_list: 'EventList') -> dict:
+        buffered_events = len(event_list.ingress_list)
+        return {'refills': self.refills,
+                'refilled_events': self.refilled_events,
+                'buffered_events': buffered_events,
+                'buffered_bytes': buffered_events * self.bytes_per_event,
+                'max_buffered_events': self.max_buffered_events,
+                'max_buffered_bytes': self.max_buffered_events * self.bytes_per_event,
+                'refill_margin': self.refill_margin}
+
+
+class AdaptiveRefillPolicy(WorkloadRefillPolicy):
+    """Sizes the lookahead window of the workload by a memory budget and the observed rate of workload events, so that
+    the window holds about memory_budget / bytes_per_event events. The simulation refills the window when less than
+    half of it is left."""
+    
+    def __init__(self, memory_budget: int = 256 << 20, initial_events: int = 10000, min_lookahead: int = 1000,
+                 max_lookahead: int = 60 * 1000000):
+        super().__init__(slice_events=initial_events, lookahead=max_lookahead, refill_margin=max_lookahead // 2)
+        self.memory_budget = memory_budget
+        self.min_lookahead = min_lookahead
+        self.max_lookahead = max_lookahead
+        # workload events per µs, smoothed over the refills
+        self.rate: float = None
+    
+    def get_refill(self, event_list: 'EventList') -> Tuple[int, int]:
+        # fill the window beyond the last popped event
+        window_end = (event_list.last_popped_time or 0) + self.lookahead
+        return 0, max(0, window_end - (event_list.last_time_of_relevant_event or 0))
+    
+    def refill_done(self, event_list: 'EventList', events: int, time_before: int, time_after: int):
+        super().refill_done(event_list, events, time_before, time_after)
+        if events == 0 or time_after <= time_before:
+            return
+        rate = events / (time_after - time_before)
+        self.rate = rate if self.rate is None else (self.rate + rate) / 2
+        budget_events = self.memory_budget / self.bytes_per_event
+        self.lookahead = int(min(self.max_lookahead, max(self.min_lookahead, budget_events / self.rate)))
+        self.refill_margin = self.lookahead // 2
+    
+    def get_report(self, event_list: 'EventList') -> dict:
+        report = super().get_report(event_list)
+        report['lookahead'] = self.lookahead
+        report['rate'] = self.rate
+        return report
 
 
 class EventList(object):
-    length_of_a_slice = 800000
     
-    def __init__(self, sim):
-        self.current_list: SortedKeyList[BaseEvent] = SortedKeyList(key=lambda e: e.time)
+    # available backends, the backend is selected by its name when creating the simulator
+    backends = {
+        'sorted': SortedListEventBackend,
+        'heap': HeapEventBackend,
+        'calendar': CalendarQueueEventBackend,
+    }
+    
+    def __init__(self, sim, backend: str = 'sorted'):
+        if backend not in EventList.backends:
+            raise NameError(f"unknown event list backend {backend}, use one of {list(EventList.backends)}")
+        self.current_list: EventListBackend = EventList.backends[backend]()
+        # events of the workload generator are kept separately and merged with the current list when popping
+        self.ingress_list = IngressEventBuffer()
+        # events due at the time of the last popped event, ordered by the sequence number since they have equal time
+        self.now_list: Deque[EventEntry] = deque()
+        self.next_sequence_number = 0
         self.sim = sim
         self.number_of_events = 0
         self.number_of_relevant_events = 0
         self.last_popped_time = None
         self.last_time_of_relevant_event = None
+        # the simulation asks the workload generator for more events, when the last relevant event is less than
+        # refill_margin ahead, see WorkloadRefillPolicy
+        self.refill_margin = 500000
+    
+    def get_all_sorted(self) -> List[EventEntry]:
+        return list(merge(self.now_list, self.current_list.get_all_sorted(), self.ingress_list.get_all_sorted()))
     
     def debug_get_all_remaining(self):
-        return self.current_list[:]
+        return [e for _, _, e in self.get_all_sorted()]
     
     def debug_access(self, relative_to_next_event) -> BaseEvent:
         assert relative_to_next_event >= 0
-        return self.current_list[relative_to_next_event]
-    
-    # this is used when filling up the backlog with new events from the workload
-    def add_event_from_the_back(self, event):
-        self.enqueue_event(event)
+        return self.get_all_sorted()[relative_to_next_event][2]
     
-    def enqueue_event(self, event: BaseEvent):
+    def create_entry(self, event: BaseEvent) -> EventEntry:
         self.number_of_events += 1
         if not event.ignoreWhenFinished:
             self.number_of_relevant_events += 1
             if self.last_time_of_relevant_event is None or self.last_time_of_relevant_event < event.time:
                 self.last_time_of_relevant_event = event.time
         
-        self.current_list.add(event)
+        self.next_sequence_number += 1
+        return event.time, self.next_sequence_number, event
+    
+    # this is used when filling up the backlog with new events from the workload
+    def add_event_from_the_back(self, event: BaseEvent):
+        self.ingress_list.push(self.create_entry(event))
+    
+    def enqueue_event(self, event: BaseEvent):
+        self.current_list.push(self.create_entry(event))
+    
+    # this is used for events which are due at the time of the last popped event, so they are never sorted
+    def enqueue_event_now(self, event: BaseEvent):
+        assert event.time == self.last_popped_time
+        self.now_list.append(self.create_entry(event))
     
     def len(self):
         return self.number_of_events
@@ -67,8 +444,32 @@ class EventList(object):
     def get_number_of_relevant_events(self):
         return self.number_of_relevant_events
     
+    def pop_next_entry(self) -> EventEntry:
+        # the next entry is the smallest head of the now list, the ingress list, and the current list
+        current = self.current_list
+        ingress = self.ingress_list
+        if ingress.pending:
+            ingress.merge_pending()
+        
+        now = self.now_list
+        if now:
+            entry = now[0]
+            if (len(current) == 0 or entry < current.peek()) and (not ingress.entries or entry < ingress.entries[0]):
+                return now.popleft()
+        
+        if ingress.entries and (len(current) == 0 or ingress.entries[0] < current.peek()):
+            return ingress.entries.popleft()
+        return current.pop()
+    
+    # returns the event which is popped next, without removing it from the list
+    def peek_next(self) -> BaseEvent:
+        heads = [event_list.peek() for event_list in [self.current_list, self.ingress_list] if len(event_list) > 0]
+        if len(self.now_list) > 0:
+            heads.append(self.now_list[0])
+        return min(heads)[2]
+    
     def pop_next(self) -> BaseEvent:
-        item = self.current_list.pop(0)
+        item = self.pop_next_entry()[2]
         
         self.number_of_events -= 1
         if not item.ignoreWhenFinished:
@@ -76,19 +477,34 @@ class EventList(object):
         assert self.last_popped_time is None or item.time >= self.last_popped_time
         self.last_popped_time = item.time
         
-        if not self.sim.packed_generator_is_done and self.last_time_of_relevant_event - 500000 < self.last_popped_time:
-            self.sim.ask_packet_generator_for_more_events(EventList.length_of_a_slice, 800000)
+        if not self.sim.packed_generator_is_done and \
+                self.last_time_of_relevant_event - self.refill_margin < self.last_popped_time:
+            self.sim.refill_workload()
         
         return item
     
+    # removes all events without processing them, e.g., when the simulation stops, and returns them
+    def clear(self) -> List[BaseEvent]:
+        events = [e for _, _, e in self.get_all_sorted()]
+        self.current_list = self.current_list.__class__()
+        self.ingress_list = IngressEventBuffer()
+        self.now_list.clear()
+        self.number_of_events = 0
+        self.number_of_relevant_events = 0
+        return events
+    
     def print_snapshot(self):
         print(f"Number of pending events: {self.number_of_events}")
-        if len(self.current_list) > 0:
-            for e in self.current_list[:5]:
+        if self.number_of_events > 0:
+            entries = self.get_all_sorted()
+            for _, _, e in entries[:5]:
                 print(f"    {e}, {e.time}")
             print("...")
-            for e in self.current_list[-5:]:
+            for _, _, e in entries[-5:]:
                 print(f"    {e}, {e.time}")
     
     def peek_last(self):
-        return self.current_list[-1]
+        last = [event_list.peek_last() for event_list in [self.current_list, self.ingress_list] if len(event_list) > 0]
+        if len(self.now_list) > 0:
+            last.append(self.now_list[-1])
+        return max(last)[2]
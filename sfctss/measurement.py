@@ -2,7 +2,9 @@
 # coding=utf-8
 import re
 import time
-from typing import List
+from typing import Dict, List
+
+import numpy as np
 
 from .model.server import Server
 from .model.sff import SFF
@@ -10,9 +12,12 @@ from .model.sfi import SFI
 from .model.core import Flow, Packet
 from .simulator import Sim
 from .events import BaseEvent
+from .trace import WorkloadTraceWriter
 
 
 class StatisticsPollingEvent(BaseEvent):
+    __slots__ = ['stats_writer', 'interval']
+    
     def __init__(self, interval, stats_writer: 'SimStatsPoller', first_event=False):
         super().__init__(stats_writer.sim.currentTime + (0 if first_event else interval))
         self.ignoreWhenFinished = True
@@ -27,6 +32,7 @@ class StatisticsPollingEvent(BaseEvent):
 
 
 class OverviewStatisticsEvent(BaseEvent):
+    __slots__ = ['sim', 'list_of_snapshots']
     
     def __init__(self, list_of_snapshots: List[int], sim: Sim):
         super().__init__(list_of_snapshots.pop(0))
@@ -159,6 +165,89 @@ class SimStatsCdfWriter(SimStatsWriter):
         self.bucket_holder[key][group][bucket] += 1
 
 
+class SimStatsPacketStore(SimStatsWriter):
+    """Statistics of the packets which left the network, kept as numpy columns indexed by the packet id. Each packet
+    writes its row when it is torn down, and all rows are written to the csv file at once when the simulation is done
+    (ordered by the packet id)."""
+    
+    final_states = ['', 'done', 'timeout', 'rejectSchedule']
+    columns = [('flow_id', np.int64),
+               ('ingress_time', np.int64),
+               ('status', np.int8),
+               ('time_total', np.int64),
+               ('time_processing', np.int64),
+               ('time_processing_queue', np.int64),
+               ('time_network', np.int64),
+               ('time_network_queue', np.int64),
+               ('time_queue_scheduling', np.int64),
+               ('real_time_scheduling', np.float64),
+               ('seen_by_schedulers', np.int64),
+               ('ingress_egress_delay', np.int64)]
+    
+    def __init__(self, sim: Sim, filepath, capacity: int = 1024):
+        super().__init__(sim, filepath)
+        self.state_codes = {state: code for code, state in enumerate(self.final_states)}
+        self.arrays: Dict[str, np.ndarray] = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.columns}
+        self.flushed = False
+        self.init_file()
+    
+    def header_row(self):
+        return self.sim.props.sim_stats.SEPARATOR.join(['id'] + [name for name, _ in self.columns])
+    
+    def grow(self, min_capacity: int):
+        capacity = len(self.arrays['status'])
+        while capacity < min_capacity:
+            capacity *= 2
+        for name, dtype in self.columns:
+            array = np.zeros(capacity, dtype=dtype)
+            array[:len(self.arrays[name])] = self.arrays[name]
+            self.arrays[name] = array
+    
+    def add_packet(self, packet: Packet, ingress_egress_delay: int):
+        i = packet.id
+        if i >= len(self.arrays['status']):
+            self.grow(i + 1)
+        arrays = self.arrays
+        arrays['flow_id'][i] = packet.flow.id
+        arrays['ingress_time'][i] = packet.time_ingress
+        arrays['status'][i] = self.state_codes[packet.final_state]
+        arrays['time_total'][i] = packet.delay
+        arrays['time_processing'][i] = packet.timeProcessing
+        arrays['time_processing_queue'][i] = packet.timeQueueProcessing
+        arrays['time_network'][i] = packet.timeNetwork
+        arrays['time_network_queue'][i] = packet.timeQueueNetwork
+        arrays['time_queue_scheduling'][i] = packet.timeQueueScheduling
+        arrays['real_time_scheduling'][i] = packet.realTimeScheduling
+        arrays['seen_by_schedulers'][i] = packet.seenByScheduler
+        arrays['ingress_egress_delay'][i] = ingress_egress_delay
+    
+    # returns the columns of all packets which left the network, the status as final state of the packet
+    def get_columns(self) -> Dict[str, np.ndarray]:
+        ids = np.flatnonzero(self.arrays['status'])
+        columns = {'id': ids}
+        for name, _ in self.columns:
+            columns[name] = self.arrays[name][ids]
+        columns['status'] = np.array(self.final_states, dtype=object)[columns['status']]
+        return columns
+    
+    def flush(self):
+        # the rows are kept after writing them, but written only once
+        if self.flushed:
+            return
+        self.flushed = True
+        columns = self.get_columns()
+        if self.sim.DEBUG:
+            print("* flush {0} packets to {1}".format(len(columns['id']), self.filepath))
+        sep = self.sim.props.sim_stats.SEPARATOR
+        names = ['id'] + [name for name, _ in self.columns]
+        chunk = self.sim.props.sim_stats.FLUSH_ENTRIES
+        with open(self.filepath, "a") as f:
+            for start in range(0, len(columns['id']), chunk):
+                values = [map(str, columns[name][start:start + chunk].tolist()) for name in names]
+                f.write("\n")
+                f.write("\n".join(map(sep.join, zip(*values))))
+
+
 class SimStatsPoller(SimStatsRowWriter):
     
     def __init__(self, sim: Sim, filepath, interval):
@@ -310,50 +399,21 @@ class SimStats(object):
             self.SEPARATOR: str = ','
             self.FLUSH_ENTRIES: int = 10000
             self.debugStats: SimStatsKvWriter = None
-            self.packetStats: SimStatsRowWriter = None
+            self.packetStats: SimStatsPacketStore = None
             self.packetCdfStats: SimStatsCdfWriter = None
             self.pollStatistics: SimStatsPoller = None
             self.exp_stats: SimStatsKvWriter = None
             self.serverStats: SimStatsRowWriter = None
             self.overviewStats: SimStatsKvWriter = None
             self.workloadStats: SimStatsRowWriter = None
+            self.workloadTrace: WorkloadTraceWriter = None
     
     @staticmethod
     def activate_packet_statistics(sim: Sim):
         if sim.props.sim_stats.exp_id is None:
             raise NameError("you have to activate statistics ... SimStats.activate")
         filepath = "stats_{0}_packets.csv".format(sim.props.sim_stats.exp_id)
-        sim.props.sim_stats.packetStats = SimStatsRowWriter(
-            sim=sim,
-            filepath=filepath,
-            columns=[
-                "id",
-                "flow_id",
-                "ingress_time",
-                "status",
-                "time_total",
-                "time_processing",
-                "time_processing_queue",
-                "time_network",
-                "time_network_queue",
-                "time_queue_scheduling",
-                "real_time_scheduling",
-                "seen_by_schedulers",
-                "ingress_egress_delay"],
-            data_types=[
-                int,
-                int,
-                int,
-                str,
-                int,
-                int,
-                int,
-                int,
-                int,
-                int,
-                float,
-                int,
-                int])
+        sim.props.sim_stats.packetStats = SimStatsPacketStore(sim=sim, filepath=filepath)
     
     @staticmethod
     def activate(sim: Sim, exp_id: str, configuration: dict = None):
@@ -381,6 +441,12 @@ class SimStats(object):
                                                      data_types=[int, int, str, int,
                                                                  int, int])
     
+    @staticmethod
+    def activate_workload_trace(sim: Sim, directory: str):
+        # records the ingress stream as binary workload trace, which can be replayed by the TraceWorkloadGenerator
+        stat_props: SimStats.Props = sim.props.sim_stats
+        stat_props.workloadTrace = WorkloadTraceWriter(sim=sim, directory=directory)
+    
     @staticmethod
     def activate_flow_statistics(sim: Sim):
         stat_props: SimStats.Props = sim.props.sim_stats
@@ -485,20 +551,8 @@ class SimStats(object):
         sim = packet.flow.sim
         stat_props: SimStats.Props = sim.props.sim_stats
         if not (stat_props.packetStats is None):
-            stat_props.packetStats.add_entry(
-                packet.id,
-                packet.flow.id,
-                packet.time_ingress,
-                packet.final_state,
-                packet.delay,
-                packet.timeProcessing,
-                packet.timeQueueProcessing,
-                packet.timeNetwork,
-                packet.timeQueueNetwork,
-                packet.timeQueueScheduling,
-                packet.realTimeScheduling,
-                packet.seenByScheduler,
-                SFF.get_multi_hop_latency_for(sim, packet.ingress_sff_id, packet.flow.desiredEgressSSFid))
+            stat_props.packetStats.add_packet(
+                packet, SFF.get_multi_hop_latency_for(sim, packet.ingress_sff_id, packet.flow.desiredEgressSSFid))
         
         expected_delay = packet.timeProcessing + packet.timeNetwork + \
                          packet.timeQueueScheduling + packet.timeQueueProcessing + packet.timeQueueNetwork
@@ -595,6 +649,9 @@ class SimStats(object):
             SimStats.do_overview_statistics_snapshot(sim)
             stat_props.overviewStats.flush()
         
+        if stat_props.workloadTrace is not None:
+            stat_props.workloadTrace.close()
+        
         if stat_props.debugStats is not None:
             stat_props.debugStats.flush()
         
@@ -2,7 +2,7 @@
 # coding=utf-8
 from collections import deque
 from enum import unique, Enum
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from ..events import PacketHoldingEvent
 from ..simulator import Sim
@@ -15,7 +15,25 @@ class ServerCpuPolicy(Enum):
     one_at_a_time = 3
 
 
+class PacketLocation(object):
+    """Where a packet is since its last time mark (see Packet.mark_time). The time till the next mark is added to the
+    statistic value of the location, e.g., to timeNetwork for a packet on the wire."""
+    ingress = 0
+    sff_queue = 1
+    link_queue = 2
+    wire = 3
+    sfi_queue = 4
+    sfi_processing = 5
+    
+    names = ['ingress', 'sff_queue', 'link_queue', 'wire', 'sfi_queue', 'sfi_processing']
+    time_attributes = [None, 'timeQueueScheduling', 'timeQueueNetwork', 'timeNetwork', 'timeQueueProcessing',
+                       'timeProcessing']
+
+
 class Flow(object):
+    __slots__ = ['sim', 'id', 'sfTypeChain', 'desiredEgressSSFid', 'ingress_sff_id', 'qosMaxDelay', 'start_time',
+                 'sfc_id', 'sfc_identifier', 'sfc_class', '__weakref__']
+    
     @Sim.register_reset_global_fields
     class Props:
         def __init__(self):
@@ -26,9 +44,24 @@ class Flow(object):
             # the sfc class is an integer which refers to the buffer/class of this sfc of position 0.
             #   so when this sfc has 3 entries, it reserves buffer/class "sfc class", "sfc class"+1, "sfc class"+2
             
-            # holds a map from sfc id to sfc class
+            # holds a map from sfc identifier to sfc class
             self.sfc_classes: Dict[str, int] = dict()
             
+            # the sfc registry, each sfc (or sfc and egress, see individual_class_per_egress) has an integer sfc id,
+            # and flows look up their sfc by a tuple key instead of building the sfc identifier
+            self.sfc_ids: Dict[tuple, int] = dict()
+            # per sfc id: the chain of sf types (shared by all flows of this sfc), sfc identifier, and sfc class
+            self.sfc_chains: List[List[int]] = []
+            self.sfc_identifiers: List[str] = []
+            self.sfc_class_base: List[int] = []
+            # per sfc class: the sf type, whether it is the last sf of its sfc, and the deadline of its sfc
+            self.class_sf_type: List[int] = []
+            # per sfc class: the sfc id and the position in the sfc, see get_sfc_id_and_pos_of_packet_class
+            self.class_sfc_id: List[int] = []
+            self.class_position: List[int] = []
+            self.class_eoc: List[bool] = []
+            self.class_deadline: List[int] = []
+            
             self.statistics_drops_per_class: Dict[int, int] = dict()
             
             # holds a map from sfc class to deadline of this sfc
@@ -55,10 +88,34 @@ class Flow(object):
             return "-".join(str(c) for c in sfc_type)
     
     @staticmethod
-    def register_sfc_for_packet_classes(sim: Sim, sfc_type: list, qos_max_delay: int, egress_id: int):
+    def get_sfc_key(sim: Sim, sfc_type, egress_id: int) -> tuple:
+        if sim.props.flow.individual_class_per_egress:
+            return tuple(sfc_type), egress_id
+        return tuple(sfc_type), None
+    
+    # returns the sfc id of the sfc, or None if it is not registered
+    @staticmethod
+    def get_sfc_id(sim: Sim, sfc_type, egress_id: int):
+        flow_props: Flow.Props = sim.props.flow
+        sfc_id = flow_props.sfc_ids.get(Flow.get_sfc_key(sim, sfc_type, egress_id))
+        if sfc_id is None:
+            # the sf types might be given as strings
+            sfc_id = flow_props.sfc_ids.get(Flow.get_sfc_key(sim, [int(i) for i in sfc_type], egress_id))
+        return sfc_id
+    
+    @staticmethod
+    def register_sfc_for_packet_classes(sim: Sim, sfc_type: list, qos_max_delay: int, egress_id: int) -> int:
+        flow_props: Flow.Props = sim.props.flow
+        sfc_type = [int(i) for i in sfc_type]
         sfc_identifier = Flow.get_sfc_identifier(sim, sfc_type, egress_id)
         assert sfc_identifier not in sim.props.flow.sfc_classes
         
+        sfc_id = len(flow_props.sfc_chains)
+        flow_props.sfc_ids[Flow.get_sfc_key(sim, sfc_type, egress_id)] = sfc_id
+        flow_props.sfc_chains.append(sfc_type)
+        flow_props.sfc_identifiers.append(sfc_identifier)
+        flow_props.sfc_class_base.append(flow_props.sfc_next_free_class)
+        
         sim.props.flow.sfc_classes[sfc_identifier] = sim.props.flow.sfc_next_free_class
         sim.props.flow.sfc_next_free_class += len(sfc_type)
         
@@ -78,6 +135,11 @@ class Flow(object):
                 raise NameError("we store the qos delay per class, which is used by the optimal scheduler, however," +
                                 f" your setup has different values for the same SFC {sfc_identifier}")
             sim.props.flow.sfc_class_to_deadline[this_class_identifier] = qos_max_delay
+            flow_props.class_sf_type.append(sfc_type[i])
+            flow_props.class_eoc.append((i + 1) == len(sfc_type))
+            flow_props.class_deadline.append(qos_max_delay)
+            flow_props.class_sfc_id.append(sfc_id)
+            flow_props.class_position.append(i)
             if sim.props.flow.individual_class_per_egress:
                 sim.props.flow.sfc_class_to_egress[this_class_identifier] = egress_id
             
@@ -85,36 +147,41 @@ class Flow(object):
                 if sff.scheduler.requires_queues_per_class():
                     sff.packet_queue_per_class[this_class_identifier] = deque()
             sim.props.flow.statistics_drops_per_class[this_class_identifier] = 0
+        return sfc_id
     
     @staticmethod
     def get_packet_class_of_packet(packet: 'Packet'):
-        return packet.flow.sim.props.flow.sfc_classes[packet.flow.sfc_identifier] + packet.sfc_position
+        return packet.packet_class
     
     @staticmethod
     def get_sf_and_eoc_of_packet(packet: 'Packet') -> tuple:
-        return Flow.get_sf_and_eoc_of(packet.flow.sim, packet.flow.sfc_identifier, packet.sfc_position)
+        flow_props: Flow.Props = packet.flow.sim.props.flow
+        return flow_props.class_sf_type[packet.packet_class], flow_props.class_eoc[packet.packet_class]
     
     @staticmethod
     def get_sf_and_eoc_of(sim: Sim, sfc_identifier: str, at_position: int) -> tuple:
         flow_pros: Flow.Props = sim.props.flow
         return flow_pros.sfc_class_to_sf[flow_pros.sfc_classes[sfc_identifier] + at_position]
     
+    # returns the sfc id and the position in the sfc of a packet class, or None if there is no such class
+    @staticmethod
+    def get_sfc_id_and_pos_of_packet_class(sim: Sim, packet_class: int) -> Optional[Tuple[int, int]]:
+        flow_props: Flow.Props = sim.props.flow
+        if not 0 <= packet_class < len(flow_props.class_sfc_id):
+            return None
+        return flow_props.class_sfc_id[packet_class], flow_props.class_position[packet_class]
+    
+    # returns the sfc identifier and the position in the sfc of a packet class, or None if there is no such class
+    @staticmethod
+    def get_sfc_identifier_and_pos_of_packet_class(sim: Sim, packet_class: int) -> Optional[Tuple[str, int]]:
+        sfc_id_and_pos = Flow.get_sfc_id_and_pos_of_packet_class(sim, packet_class)
+        if sfc_id_and_pos is None:
+            return None
+        return sim.props.flow.sfc_identifiers[sfc_id_and_pos[0]], sfc_id_and_pos[1]
+    
     @staticmethod
     def debug_get_sfc_identifier_and_pos_of_packet_class(sim: Sim, packet_class: int):
-        if not sim.DEBUG:
-            # print("WARNING this method is not intended to be used for normal runs")
-            pass
-        # find the sfc_identifier that has the largest packet_class but still smaller/equal than the given
-        flow_pros: Flow.Props = sim.props.flow
-        found_sfc = None
-        found_packet_class = -1
-        for other_sfc_identifier in flow_pros.sfc_classes:
-            if found_sfc is None or (
-                    packet_class >= flow_pros.sfc_classes[other_sfc_identifier] > found_packet_class):
-                found_sfc = other_sfc_identifier
-                found_packet_class = flow_pros.sfc_classes[other_sfc_identifier]
-        assert found_sfc is not None
-        return found_sfc, (packet_class - found_packet_class)
+        return Flow.get_sfc_identifier_and_pos_of_packet_class(sim, packet_class)
     
     def __init__(self, sim: Sim, sf_type_chain: List[int], qos_max_delay: int,
                  desired_egress_ssf_id: int, ingress_sff_id: int, start_time: int = 0):
@@ -122,22 +189,24 @@ class Flow(object):
         flow_props: Flow.Props = sim.props.flow
         flow_props.lastId += 1
         self.id = flow_props.lastId
-        self.sfTypeChain = [int(i) for i in sf_type_chain]
         self.desiredEgressSSFid = desired_egress_ssf_id
         self.ingress_sff_id = int(ingress_sff_id)
         self.qosMaxDelay = qos_max_delay
         self.start_time = start_time
         
-        assert len(self.sfTypeChain) > 0
+        assert len(sf_type_chain) > 0
         
         if flow_props.max_deadline is None or flow_props.max_deadline < self.qosMaxDelay:
             flow_props.max_deadline = self.qosMaxDelay
         
-        self.sfc_identifier = Flow.get_sfc_identifier(sim, sf_type_chain, desired_egress_ssf_id)
-        if self.sfc_identifier not in sim.props.flow.sfc_classes:
-            Flow.register_sfc_for_packet_classes(sim, sf_type_chain, qos_max_delay, desired_egress_ssf_id)
+        sfc_id = Flow.get_sfc_id(sim, sf_type_chain, desired_egress_ssf_id)
+        if sfc_id is None:
+            sfc_id = Flow.register_sfc_for_packet_classes(sim, sf_type_chain, qos_max_delay, desired_egress_ssf_id)
         
-        self.sfc_class = sim.props.flow.sfc_classes[self.sfc_identifier]
+        self.sfc_id = sfc_id
+        self.sfTypeChain = flow_props.sfc_chains[sfc_id]
+        self.sfc_identifier = flow_props.sfc_identifiers[sfc_id]
+        self.sfc_class = flow_props.sfc_class_base[sfc_id]
     
     def __str__(self):
         return "Flow(id={0},chain={1},egress={2},qos={3})".format(
@@ -145,40 +214,73 @@ class Flow(object):
 
 
 class IngressEvent(PacketHoldingEvent):
+    # the workload holds many packets which did not enter the network yet, so the ingress event holds only the
+    # ingress record of its packet (flow, size, and the reserved packet id). the packet is created when it enters
+    # the network, or when it is needed before (see materialize_packet)
+    __slots__ = ['sff_id', 'flow', 'transmission_size', 'packet_id']
     
-    def __init__(self, inner_packet: 'Packet', sff_id):
-        super().__init__(inner_packet.time_ingress, inner_packet)
+    def __init__(self, time_ingress: int, flow: Flow, transmission_size: int, packet_id: int, sff_id):
+        super().__init__(time_ingress, None)
+        self.flow = flow
+        self.transmission_size = transmission_size
+        self.packet_id = packet_id
         self.sff_id = sff_id
     
+    def materialize_packet(self) -> 'Packet':
+        if self.inner_packet is None:
+            self.inner_packet = self.flow.sim.props.packet.packet_type(self.time, self.flow, self.transmission_size,
+                                                                       packet_id=self.packet_id)
+        return self.inner_packet
+    
     def update_packet_time_tracking(self):
-        pass
+        # the packet did not enter the network, but it is accounted when the simulation stops
+        self.materialize_packet()
     
     # send packet to ingress SFF
     def process_event(self):
-        sim = self.inner_packet.flow.sim
+        flow = self.flow
+        sim = flow.sim
         sim.last_packet_ingress_time = self.time
         
         stat_props = sim.props.sim_stats
         if stat_props.workloadStats is not None:
             stat_props.workloadStats.add_entry(self.time,
-                                               self.inner_packet.flow.id,
-                                               '-'.join(map(str, self.inner_packet.flow.sfTypeChain)),
+                                               flow.id,
+                                               '-'.join(map(str, flow.sfTypeChain)),
                                                self.sff_id,
-                                               self.inner_packet.flow.desiredEgressSSFid,
-                                               self.inner_packet.flow.qosMaxDelay)
+                                               flow.desiredEgressSSFid,
+                                               flow.qosMaxDelay)
+        if stat_props.workloadTrace is not None:
+            stat_props.workloadTrace.add_entry(self.time, flow, self.sff_id, self.transmission_size)
         
-        packet_props = self.inner_packet.flow.sim.props.packet
+        packet_props = sim.props.packet
         packet_props.counter_packet_in_system += 1
         packet_props.counter_ingress_packets += 1
-        sim.props.sff.allSFFs[self.sff_id].handle_packet_from_ingress(self.inner_packet)
+        sim.props.sff.allSFFs[self.sff_id].handle_packet_from_ingress(self.materialize_packet())
+    
+    def release(self):
+        self.flow = None
+        super().release()
 
 
 class Packet(object):
+    # many packets are in flight at heavy load, so packets are slotted and keep only a cursor into the chain of
+    # their flow. schedulers keep their flags of a packet in slots as well, e.g., mpp_locking
+    __slots__ = ['id', 'time_ingress', 'flow', 'processing_done', 'sfc_position', 'packet_class', 'next_sf_position',
+                 'pathPosition', 'fullPath', 'ingress_sff_id', 'transmission_size', 'seenByScheduler',
+                 'timeQueueProcessing', 'timeQueueNetwork', 'timeQueueScheduling', 'timeProcessing', 'timeNetwork',
+                 'realTimeScheduling', 'timeMarker', 'location', 'delay', 'final_state', 'callback_when_be_dropped',
+                 'visitedHops', 'mpp_locking']
+    
     teardown_hooks = []
     
+    # registers a hook for all simulations created afterwards, or only for the given simulation
     @staticmethod
-    def register_tear_down(func):
-        Packet.teardown_hooks.append(func)
+    def register_tear_down(func, sim: Sim = None):
+        if sim is None:
+            Packet.teardown_hooks.append(func)
+        else:
+            sim.props.packet.teardown_hooks.append(func)
         return func
     
     @Sim.register_reset_global_fields
@@ -191,7 +293,9 @@ class Packet(object):
             # we are able to calculate the effective avg delay correctly
             self.counter_packet_after_workload_end_in_system_no_timeout: int = 0
             
-            self.all: list = []
+            # the packets in the network, if sim.KEEP_LIST_OF_ALL_PACKETS is set
+            self.live: PacketRegistry = PacketRegistry()
+            self.teardown_hooks: list = Packet.teardown_hooks[:]
             self.statsRatiosQos: float = 0
             self.statsPacketsSuccessfulProcessed: int = 0
             self.statsPacketsRejectedSchedule: int = 0
@@ -201,14 +305,20 @@ class Packet(object):
             self.statsPacketsTotalCount: int = 0
             
             self.dones: list = []
+            
+            # the classes of new packets and network delay events, with debug output if the simulation is tracing
+            # (see bind_handlers)
+            self.packet_type: type = Packet
+            self.network_delay_event_type: type = NetworkDelayEvent
+            
+            # interned paths, so that all packets with the same path share one tuple
+            self.paths: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+            self.max_interned_paths: int = 2 ** 20
     
-    def __init__(self, time_ingress: int, flow: Flow, transmission_size: int):
-        self.scheduler_flag = dict()
+    # the packet id is reserved by Packet.reserve_id, if the packet is created lazily by its IngressEvent
+    def __init__(self, time_ingress: int, flow: Flow, transmission_size: int, packet_id: int = None):
         packet_props: Packet.Props = flow.sim.props.packet
-        if flow.sim.KEEP_LIST_OF_ALL_PACKETS:
-            packet_props.all.append(self)
-        packet_props.lastId += 1
-        self.id = packet_props.lastId
+        self.id = Packet.reserve_id(flow.sim) if packet_id is None else packet_id
         self.time_ingress = int(time_ingress)
         self.flow = flow
         
@@ -220,19 +330,20 @@ class Packet(object):
         # holds the position with respect to the sfc, so position 1 means,
         # that the next SFI to be processed is of type of the second element in the chain
         self.sfc_position = 0
+        # the sfc class of the packet at its sfc position
+        self.packet_class = flow.sfc_class
         
         self.pathPosition = 0  # holds the position of the total path
-        # holds the full path, some schedulers will build this list
-        # incrementally
-        self.fullPath = []
-        # holds all remaining SF types, that need to be visited
-        self.toBeVisited = list(flow.sfTypeChain)
+        # holds the full path as an interned tuple of hops (see sff_hop and sfi_hop), some schedulers will build
+        # this path incrementally
+        self.fullPath = ()
+        # holds the position of the next SF type in the chain, that needs to be scheduled
+        self.next_sf_position = 0
         
         self.ingress_sff_id = flow.ingress_sff_id
         
         self.transmission_size = int(transmission_size)
         self.seenByScheduler = 0
-        packet_props.statsPacketsTotalCount += 1
         
         # statistic values
         self.timeQueueProcessing = 0
@@ -244,14 +355,70 @@ class Packet(object):
         self.realTimeScheduling = 0
         
         self.timeMarker = None
+        self.location = PacketLocation.ingress
         
         self.delay = None
         self.final_state = None
         
         self.callback_when_be_dropped = None
         
-        if flow.sim.TRACE_PACKET_PATH:
-            self.visitedHops = []
+        self.visitedHops = [] if flow.sim.TRACE_PACKET_PATH else None
+        
+        # set by the MppScheduler while the packet is underway to a server
+        self.mpp_locking = False
+        
+        if flow.sim.KEEP_LIST_OF_ALL_PACKETS:
+            packet_props.live.add(self)
+    
+    def has_sf_to_schedule(self) -> bool:
+        return self.next_sf_position < len(self.flow.sfTypeChain)
+    
+    def get_next_sf_to_schedule(self) -> int:
+        return self.flow.sfTypeChain[self.next_sf_position]
+    
+    def pop_next_sf_to_schedule(self) -> int:
+        sf = self.flow.sfTypeChain[self.next_sf_position]
+        self.next_sf_position += 1
+        return sf
+    
+    # a hop of a path is the id of a SFF, or the complement of the id of a SFI, so SFI hops are negative
+    @staticmethod
+    def sff_hop(sff_id: int) -> int:
+        return sff_id
+    
+    @staticmethod
+    def sfi_hop(sfi_id: int) -> int:
+        return ~sfi_id
+    
+    @staticmethod
+    def is_sfi_hop(hop: int) -> bool:
+        return hop < 0
+    
+    # returns the SFF or SFI of a hop
+    @staticmethod
+    def get_instance_of_hop(sim: Sim, hop: int):
+        if hop < 0:
+            return sim.props.sfi.all_sfi[~hop]
+        return sim.props.sff.allSFFs[hop]
+    
+    @staticmethod
+    def intern_path(sim: Sim, path: Tuple[int, ...]) -> Tuple[int, ...]:
+        packet_props: Packet.Props = sim.props.packet
+        interned = packet_props.paths.get(path)
+        if interned is None:
+            if len(packet_props.paths) < packet_props.max_interned_paths:
+                packet_props.paths[path] = path
+            return path
+        return interned
+    
+    # appends the hops to the path of the packet
+    def extend_path(self, hops):
+        self.fullPath = Packet.intern_path(self.flow.sim, self.fullPath + tuple(hops))
+    
+    # all SF types which are not yet scheduled
+    @property
+    def toBeVisited(self) -> List[int]:
+        return self.flow.sfTypeChain[self.next_sf_position:]
     
     @staticmethod
     @Sim.register_sim_oneliner_text_provider
@@ -271,10 +438,21 @@ class Packet(object):
                f'reject:{packet_props.statsPacketsRejectedSchedule} ' \
                f'avg succ:{avg_succ} ) '
     
+    # each packet is counted when its id is reserved, so the total number of packets includes the packets of the
+    # workload which did not enter the network when the simulation stops
+    @staticmethod
+    def reserve_id(sim: Sim) -> int:
+        packet_props: Packet.Props = sim.props.packet
+        packet_props.lastId += 1
+        packet_props.statsPacketsTotalCount += 1
+        return packet_props.lastId
+    
     @staticmethod
     def create_wrap_in_event(time_ingress: int, flow: Flow, transmission_size: int) -> 'IngressEvent':
-        p = Packet(time_ingress, flow, transmission_size)
-        return IngressEvent(inner_packet=p, sff_id=flow.ingress_sff_id)
+        assert flow is not None
+        assert time_ingress >= flow.start_time
+        return IngressEvent(time_ingress, flow, int(transmission_size), Packet.reserve_id(flow.sim),
+                            sff_id=flow.ingress_sff_id)
     
     @staticmethod
     def create_and_schedule(time_ingress: int, flow: Flow, transmission_size: int, ingress_sff_id: int):
@@ -284,10 +462,12 @@ class Packet(object):
     def set_callback_when_dropped(self, callback):
         self.callback_when_be_dropped = callback
     
-    # mark the current time, used for statistics purpose
-    def mark_time(self):
+    # mark the current time and the location of the packet, used for statistics purpose. the time of a mark without
+    # location is not accounted when the simulation stops
+    def mark_time(self, location: int = PacketLocation.ingress):
         assert (self.timeMarker is None)
         self.timeMarker = self.flow.sim.currentTime
+        self.location = location
     
     # returns the delta of current time and time marker
     def get_delta_of_time_mark(self):
@@ -296,28 +476,31 @@ class Packet(object):
         self.timeMarker = None
         return tmp
     
+    # adds the time since the time mark to the statistic value of the location, e.g., when the simulation stops
+    def account_time_mark(self):
+        if self.timeMarker is not None:
+            attribute = PacketLocation.time_attributes[self.location]
+            delta = self.get_delta_of_time_mark()
+            if attribute is not None:
+                setattr(self, attribute, getattr(self, attribute) + delta)
+    
     def tear_down(self, final_state):
         sim: Sim = self.flow.sim
         packet_props: Packet.Props = sim.props.packet
         
-        if sim.PACKET_ID_TO_DEBUG == self.id:
-            print(f"Debug packet gets tear down")
-            Packet.debug_packet(self)
-        
         if sim.KEEP_LIST_OF_ALL_PACKETS:
-            packet_props.all.remove(self)
+            packet_props.live.remove(self)
         self.delay = sim.currentTime - self.time_ingress
         self.final_state = final_state
         packet_props.counter_packet_in_system -= 1
         packet_props.statsSumDelay += self.delay
         
-        for f in Packet.teardown_hooks:
+        for f in packet_props.teardown_hooks:
             f(self)
         
         self.flow = None
         self.callback_when_be_dropped = None
         self.fullPath = None
-        self.scheduler_flag = None
     
     def handle_stop_simulation(self):
         # this method will be called when the simulation done, but the packet is somewhere in the simulation
@@ -325,14 +508,13 @@ class Packet(object):
         if (self.flow.sim.currentTime - self.time_ingress) >= self.flow.qosMaxDelay:
             self.drop_timed_out(end_of_sim=True)
         else:
+            if self.flow.sim.KEEP_LIST_OF_ALL_PACKETS:
+                packet_props.live.remove(self)
             packet_props.counter_packet_in_system -= 1
             packet_props.statsPacketsSuccessfulProcessed += 1
             packet_props.counter_packet_after_workload_end_in_system_no_timeout += 1
     
     def drop_timed_out(self, caller=None, end_of_sim=False):
-        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
-            print(f"** drop debug packet because of timeout, caller:{caller}")
-        
         props = self.flow.sim.props
         props.packet.statsPacketsRejectedProcessingDelay += 1
         
@@ -350,16 +532,11 @@ class Packet(object):
         self.tear_down("timeout")
     
     def reject(self):
-        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
-            print("** reject debug packet")
-        
         self.flow.sim.props.packet.statsPacketsRejectedSchedule += 1
         self.tear_down("rejectSchedule")
     
     def done(self):
         packet_props: Packet.Props = self.flow.sim.props.packet
-        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
-            print("** debug packet is done")
         packet_props.statsPacketsSuccessfulProcessed += 1
         
         self.delay = self.flow.sim.currentTime - self.time_ingress
@@ -367,6 +544,18 @@ class Packet(object):
         
         self.tear_down("done")
     
+    @staticmethod
+    @Sim.register_bind_handlers_hook
+    def bind_handlers(sim: Sim):
+        # packets which are already in the network keep their class
+        packet_props: Packet.Props = sim.props.packet
+        if sim.is_tracing():
+            packet_props.packet_type = TracedPacket
+            packet_props.network_delay_event_type = TracedNetworkDelayEvent
+        else:
+            packet_props.packet_type = Packet
+            packet_props.network_delay_event_type = NetworkDelayEvent
+    
     @staticmethod
     def debug_packet(packet):
         print("config:")
@@ -382,30 +571,105 @@ class Packet(object):
             print("\t visited hops: {0}".format(
                 str(list(map(str, packet.visitedHops)))))
         
-        Packet.debug_print_path(packet.fullPath, current_position=packet.pathPosition)
+        Packet.debug_print_path(packet.flow.sim, packet.fullPath, current_position=packet.pathPosition)
     
     @staticmethod
-    def debug_print_path(path: list, current_position=None):
+    def debug_print_path(sim: Sim, path: Tuple[int, ...], current_position=None):
         print("this path has {0} steps".format(len(path)))
-        for i, (t, instance) in enumerate(path):
+        for i, hop in enumerate(path):
             if current_position is not None and i == current_position:
                 print("\t ---- current position")
-            if t == 'SFF':
-                print("\ttype: SFF instance id: {0}".format(str(instance.id)))
-            elif t == 'SFI':
+            instance = Packet.get_instance_of_hop(sim, hop)
+            if Packet.is_sfi_hop(hop):
                 print("\ttype: SFI type: {0} @ SFF {1} of Server {2}".format(str(instance.of_type), instance.sffId,
                                                                              instance.server.id))
             else:
-                raise NameError(f"Something goes wrong with the path! - {path}")
+                print("\ttype: SFF instance id: {0}".format(str(instance.id)))
+
+
+class TracedPacket(Packet):
+    """Packet with debug output for sim.PACKET_ID_TO_DEBUG, used while the simulation is tracing (see
+    Packet.bind_handlers)."""
+    __slots__ = []
+    
+    def tear_down(self, final_state):
+        if self.flow.sim.PACKET_ID_TO_DEBUG == self.id:
+            print(f"Debug packet gets tear down")
+            Packet.debug_packet(self)
+        Packet.tear_down(self, final_state)
+    
+    def drop_timed_out(self, caller=None, end_of_sim=False):
+        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
+            print(f"** drop debug packet because of timeout, caller:{caller}")
+        Packet.drop_timed_out(self, caller=caller, end_of_sim=end_of_sim)
+    
+    def reject(self):
+        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
+            print("** reject debug packet")
+        Packet.reject(self)
+    
+    def done(self):
+        if self.id == self.flow.sim.PACKET_ID_TO_DEBUG:
+            print("** debug packet is done")
+        Packet.done(self)
+
+
+class PacketRegistry(object):
+    """The packets in the network of a simulation with sim.KEEP_LIST_OF_ALL_PACKETS (see sim.props.packet.live),
+    indexed by their id and by their flow, so that adding and removing a packet takes O(1). A packet is added when it
+    is created, and removed when it is torn down."""
+    
+    def __init__(self):
+        self.packets: Dict[int, Packet] = {}
+        self.packets_per_flow: Dict[int, Dict[int, Packet]] = {}
+    
+    def __len__(self):
+        return len(self.packets)
+    
+    def __iter__(self):
+        return iter(self.packets.values())
+    
+    def __contains__(self, packet: Packet):
+        return packet.id in self.packets
+    
+    def add(self, packet: Packet):
+        self.packets[packet.id] = packet
+        packets_of_flow = self.packets_per_flow.get(packet.flow.id)
+        if packets_of_flow is None:
+            packets_of_flow = self.packets_per_flow[packet.flow.id] = {}
+        packets_of_flow[packet.id] = packet
+    
+    def remove(self, packet: Packet):
+        del self.packets[packet.id]
+        packets_of_flow = self.packets_per_flow[packet.flow.id]
+        del packets_of_flow[packet.id]
+        if len(packets_of_flow) == 0:
+            del self.packets_per_flow[packet.flow.id]
+    
+    def get(self, packet_id: int) -> Packet:
+        return self.packets.get(packet_id)
+    
+    def get_packets_of_flow(self, flow_id: int) -> List[Packet]:
+        return list(self.packets_per_flow.get(flow_id, {}).values())
+    
+    # location is one of PacketLocation, e.g., PacketLocation.sff_queue
+    def get_packets_at(self, location: int) -> List[Packet]:
+        return [packet for packet in self.packets.values() if packet.location == location]
+    
+    def get_number_of_packets_per_location(self) -> Dict[str, int]:
+        counts = dict.fromkeys(PacketLocation.names, 0)
+        for packet in self.packets.values():
+            counts[PacketLocation.names[packet.location]] += 1
+        return counts
 
 
 class NetworkDelayEvent(PacketHoldingEvent):
+    __slots__ = ['source', 'destID', 'source_is_sff', 'dest_is_sff']
+    
     def __init__(self, delay, inner_packet: Packet, source, dest_id,
                  source_is_sff=True, dest_is_sff=True):
         sim = inner_packet.flow.sim
         super().__init__(sim.currentTime + delay, inner_packet)
-        if sim.PACKET_ID_TO_DEBUG == inner_packet.id:
-            print("** create network delay event of debug packet")
         self.source = source
         self.destID = dest_id
         self.source_is_sff = source_is_sff
@@ -415,24 +679,26 @@ class NetworkDelayEvent(PacketHoldingEvent):
     def update_packet_time_tracking(self):
         self.inner_packet.timeNetwork += self.inner_packet.get_delta_of_time_mark()
     
-    # free resources of sourceSFF, and send packet to destSSF
-    def process_event(self):
-        sff_props = self.inner_packet.flow.sim.props.sff
-        if sff_props.consider_link_capacity and self.source_is_sff and self.dest_is_sff:
-            self.source.free_bw_resource_to_dest_id(self.destID, self.inner_packet)
+    # free the bw resources of the link source SFF -> dest SFF, and put the next queued packet on the wire
+    @staticmethod
+    def release_link(source, dest_id, packet: Packet):
+        sff_props = source.sim.props.sff
+        if sff_props.consider_link_capacity:
+            source.free_bw_resource_to_dest_id(dest_id, packet)
             # check if we have to deque the next packet
-            if len(self.source.outQueue[self.destID]) > 0:
+            if len(source.outQueue[dest_id]) > 0:
                 # check if available bw is enough for the next packet,
                 # or if we have to wait till the next packet is done
-                if (self.source.outQueue[self.destID][0].transmission_size <=
-                        sff_props.linkBwRemaining[self.source.id][self.destID]):
-                    self.source.put_packet_on_wire(
-                        packet=self.source.outQueue[self.destID].pop(0), dest_id=self.destID)
+                if (source.outQueue[dest_id][0].transmission_size <=
+                        sff_props.linkBwRemaining[source.id][dest_id]):
+                    source.put_packet_on_wire(packet=source.outQueue[dest_id].pop(0), dest_id=dest_id)
+    
+    # free resources of sourceSFF, and send packet to destSSF
+    def process_event(self):
+        sff_props = self.inner_packet.flow.sim.props.sff
+        if self.source_is_sff and self.dest_is_sff:
+            NetworkDelayEvent.release_link(self.source, self.destID, self.inner_packet)
         
-        if self.inner_packet.flow.sim.PACKET_ID_TO_DEBUG == self.inner_packet.id:
-            sim = self.inner_packet.flow.sim
-            print(f"** @{sim.currentTime} at event {sim.current_event} " +
-                  f"network delay event is done, so get time delta of network")
         self.update_packet_time_tracking()
         # do statistics for network time
         if self.source_is_sff and self.dest_is_sff:
@@ -445,3 +711,22 @@ class NetworkDelayEvent(PacketHoldingEvent):
             if self.destID != self.source.sffId:
                 raise NameError("invalid action, trying to send a packet from one SFI to another SFI (directly)")
             self.inner_packet.flow.sim.props.sfi.all_sfi[self.destID].enqueue_packet(self.inner_packet)
+
+
+class TracedNetworkDelayEvent(NetworkDelayEvent):
+    """Network delay event with debug output for sim.PACKET_ID_TO_DEBUG, used while the simulation is tracing (see
+    Packet.bind_handlers)."""
+    __slots__ = []
+    
+    def __init__(self, delay, inner_packet: Packet, source, dest_id,
+                 source_is_sff=True, dest_is_sff=True):
+        super().__init__(delay, inner_packet, source, dest_id, source_is_sff=source_is_sff, dest_is_sff=dest_is_sff)
+        if inner_packet.flow.sim.PACKET_ID_TO_DEBUG == inner_packet.id:
+            print("** create network delay event of debug packet")
+    
+    def process_event(self):
+        sim = self.inner_packet.flow.sim
+        if sim.PACKET_ID_TO_DEBUG == self.inner_packet.id:
+            print(f"** @{sim.currentTime} at event {sim.current_event} " +
+                  f"network delay event is done, so get time delta of network")
+        super().process_event()
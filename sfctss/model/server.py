@@ -8,6 +8,8 @@ from ..simulator import Sim
 
 
 class ServerCpuShareEvent(BaseEvent):
+    __slots__ = ['server', 'interval']
+    
     def __init__(self, interval, server):
         super().__init__(server.sim.currentTime + interval)
         self.ignoreWhenFinished = True
@@ -35,6 +37,7 @@ class Server(object):
         self.SFF_ids: Set[int] = set()
         sim.props.server.lastId += 1
         self.id = sim.props.server.lastId
+        self.random = sim.random_streams.get(f"server-{self.id}")
         self.processing_cap = int(processing_cap)
         self.availableShares = self.processing_cap
         self.sfiWeights = {}
@@ -99,7 +102,7 @@ class Server(object):
         if self.cpu_policy == ServerCpuPolicy.one_at_a_time:
             if self.is_free():
                 shuffled_sfi = [i for i in self.SFIs]
-                self.sim.random.shuffle(shuffled_sfi)
+                self.random.shuffle(shuffled_sfi)
                 for sfi in shuffled_sfi:
                     if len(sfi.queue) > 0:
                         sfi.notify_for_processing()
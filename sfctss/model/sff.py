@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 # coding=utf-8
-from itertools import cycle
 from statistics import mean
 from typing import Iterable
 
@@ -8,6 +7,24 @@ from .core import *
 from ..simulator import Sim, SchedulingFailure
 
 
+class LatencyCycle(object):
+    """Endless cycle over the given latencies like itertools.cycle, but it can be stored in a checkpoint."""
+    
+    def __init__(self, values: List[int]):
+        self.values = list(values)
+        self.position = 0
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self) -> int:
+        value = self.values[self.position]
+        self.position += 1
+        if self.position == len(self.values):
+            self.position = 0
+        return value
+
+
 class SFF(object):
     @Sim.register_reset_global_fields
     class Props:
@@ -18,6 +35,8 @@ class SFF(object):
             self.linkBwRemaining: List[List[int]] = None
             self.linkLatency: List[List[int]] = None
             self.latencyProvider: Dict[int, Iterable[int]] = None
+            # the smallest latency of each latency provider, this is the lookahead of parallel simulations
+            self.latencyMinimum: Dict[int, int] = None
             
             self.end_to_end_latency: List[List[int]] = None
             self.end_to_end_bw: List[List[int]] = None
@@ -41,6 +60,24 @@ class SFF(object):
             sff_props.end_to_end_bw = [[0 for _ in range(di)] for _ in range(di)]
             sff_props.end_to_end_next_hop = [[0 for _ in range(di)] for _ in range(di)]
     
+    # handlers of the packet path, which have a variant with debug output and tracing (method name + "_traced")
+    traced_handlers = ['route_packet_to_sfi',
+                       'route_packet_to_sff_id',
+                       'route_packet_to_next_hop',
+                       'check_and_update_packet_and_return_if_process_locally',
+                       'inform_scheduler_about_packet']
+    
+    @staticmethod
+    @Sim.register_bind_handlers_hook
+    def bind_handlers(sim: Sim):
+        tracing = sim.is_tracing()
+        for sff in sim.props.sff.allSFFs.values():
+            for name in SFF.traced_handlers:
+                if tracing:
+                    setattr(sff, name, getattr(sff, f'{name}_traced'))
+                else:
+                    sff.__dict__.pop(name, None)
+    
     @staticmethod
     @Sim.register_stop_sim_catch_all_packets_hooks
     def callback_get_all_packets_from_sff(sim: Sim):
@@ -132,32 +169,38 @@ class SFF(object):
         else:
             return len(self.packet_queue)
     
-    def route_packet_to_sfi(self, packet: 'Packet', sfi: 'SFI'):
+    def route_packet_to_sfi_traced(self, packet: 'Packet', sfi: 'SFI'):
         if self.sim.DEBUG:
             print("route packet to sfi " + str(sfi))
-        
-        packet.mark_time()
+        SFF.route_packet_to_sfi(self, packet, sfi)
+    
+    def route_packet_to_sfi(self, packet: 'Packet', sfi: 'SFI'):
+        packet.mark_time(PacketLocation.wire)
         sfi_props: 'SFI.Props' = self.sim.props.sfi
         sff_props: SFF.Props = self.sim.props.sff
         
         delay = next(sff_props.latencyProvider[sfi_props.latency_provider])
-        self.sim.schedule_event(NetworkDelayEvent(delay=delay,
-                                                  inner_packet=packet,
-                                                  source=self,
-                                                  dest_id=sfi.id,
-                                                  source_is_sff=True,
-                                                  dest_is_sff=False))
+        network_delay_event = self.sim.props.packet.network_delay_event_type
+        self.sim.schedule_event(network_delay_event(delay=delay,
+                                                    inner_packet=packet,
+                                                    source=self,
+                                                    dest_id=sfi.id,
+                                                    source_is_sff=True,
+                                                    dest_is_sff=False))
     
     def free_bw_resource_to_dest_id(self, dest_id, packet: Packet):
         assert self.sim.props.sff.consider_link_capacity
         self.sim.props.sff.linkBwRemaining[self.id][dest_id] += packet.transmission_size
     
-    # sends a packet to a SFF
-    def route_packet_to_sff_id(self, packet: Packet, dest_id):
+    def route_packet_to_sff_id_traced(self, packet: Packet, dest_id):
         if self.sim.DEBUG:
             print("route packet to sff" + str(dest_id))
+        SFF.route_packet_to_sff_id(self, packet, dest_id)
+    
+    # sends a packet to a SFF
+    def route_packet_to_sff_id(self, packet: Packet, dest_id):
         # mark current time for statistics
-        packet.mark_time()
+        packet.mark_time(PacketLocation.link_queue)
         
         sff_props: SFF.Props = self.sim.props.sff
         
@@ -184,38 +227,45 @@ class SFF(object):
     # use route_packet_to_sff_id() for sending packets to a SFF
     def put_packet_on_wire(self, packet: Packet, dest_id):
         packet.timeQueueNetwork += packet.get_delta_of_time_mark()
-        packet.mark_time()
+        packet.mark_time(PacketLocation.wire)
         sff_props: SFF.Props = self.sim.props.sff
         # enough bw so that we can send the packet immediately
         delay = next(sff_props.latencyProvider[sff_props.linkLatency[self.id][dest_id]])
-        self.sim.schedule_event(NetworkDelayEvent(delay=delay,
-                                                  inner_packet=packet, source=self, dest_id=dest_id))
+        network_delay_event = self.sim.props.packet.network_delay_event_type
+        self.sim.schedule_event(network_delay_event(delay=delay,
+                                                    inner_packet=packet, source=self, dest_id=dest_id))
         if sff_props.consider_link_capacity:
             sff_props.linkBwRemaining[self.id][dest_id] -= packet.transmission_size
     
-    def route_packet_to_next_hop(self, packet: Packet):
-        next_hop_type, next_hop = packet.fullPath[packet.pathPosition]
-        packet.pathPosition += 1
+    def route_packet_to_next_hop_traced(self, packet: Packet):
+        next_hop = packet.fullPath[packet.pathPosition]
         
         if self.sim.PACKET_ID_TO_DEBUG == packet.id:
             print(f'** packet at sff {self.id}, route to next hop')
         
-        if next_hop_type == 'SFF':
+        if Packet.is_sfi_hop(next_hop):
+            if self.sim.DEBUG:
+                print(". packet goes to a SFI")
+        else:
             if self.sim.DEBUG:
                 print(". packet goes to another SFF")
-            # we send this packet to the other SFF
             if packet.id == self.sim.PACKET_ID_TO_DEBUG:
-                print("** debug packet route to {0}".format(str(next_hop)))
-            self.route_packet_to_sff_id(packet, next_hop.id)
-        elif next_hop_type == 'SFI':
-            if self.sim.DEBUG:
-                print(". packet goes to a SFI")
-            # we send this packet to the SFI
-            self.route_packet_to_sfi(packet, next_hop)
+                print("** debug packet route to {0}".format(str(Packet.get_instance_of_hop(self.sim, next_hop))))
+        SFF.route_packet_to_next_hop(self, packet)
+    
+    def route_packet_to_next_hop(self, packet: Packet):
+        next_hop = packet.fullPath[packet.pathPosition]
+        packet.pathPosition += 1
+        
+        if next_hop >= 0:
+            # we send this packet to the other SFF
+            self.route_packet_to_sff_id(packet, next_hop)
         else:
-            NameError(f"unknown next hop: {next_hop_type}")
+            # we send this packet to the SFI
+            self.route_packet_to_sfi(packet, self.sim.props.sfi.all_sfi[~next_hop])
     
-    def check_and_update_packet_and_return_if_process_locally(self, packet: Packet, source: str) -> bool:
+    # source is only used for debug output, e.g., 'ingress', or the SFF / SFI which sent the packet
+    def check_and_update_packet_and_return_if_process_locally_traced(self, packet: Packet, source) -> bool:
         if self.sim.TRACE_PACKET_PATH:
             packet.visitedHops.append(self)
         if self.sim.DEBUG:
@@ -225,32 +275,32 @@ class SFF(object):
         if packet.id == self.sim.PACKET_ID_TO_DEBUG:
             print(
                 f"** @{self.sim.currentTime} debug packet at {str(self)}, path={packet.fullPath}, coming from {source}")
-        if packet.flow.qosMaxDelay < (self.sim.currentTime - packet.time_ingress):
-            if self.sim.DEBUG:
+        if self.sim.DEBUG:
+            if packet.flow.qosMaxDelay < (self.sim.currentTime - packet.time_ingress):
                 print(". drop packet because of timeout")
-            # print(". drop packet because of timeout " + source)
-            
+            elif packet.processing_done and not packet.has_sf_to_schedule() and (
+                    len(packet.fullPath) == packet.pathPosition and self.id == packet.flow.desiredEgressSSFid):
+                print(". packet reached egress")
+        return SFF.check_and_update_packet_and_return_if_process_locally(self, packet, source)
+    
+    def check_and_update_packet_and_return_if_process_locally(self, packet: Packet, source) -> bool:
+        if packet.flow.qosMaxDelay < (self.sim.currentTime - packet.time_ingress):
             packet.drop_timed_out(self)
             return False
         
         if packet.processing_done:
             # do we have to add the path to the egress?
-            if len(packet.toBeVisited) == 0 and len(
+            if not packet.has_sf_to_schedule() and len(
                     packet.fullPath) == packet.pathPosition and self.id != packet.flow.desiredEgressSSFid:
                 # add the path to the egress
-                path_to_dest = self.get_multi_hop_path_for(self.sim, self.id, packet.flow.desiredEgressSSFid)
-                for sff_id in path_to_dest:
-                    packet.fullPath.append((SFF.__name__, self.sim.props.sff.allSFFs[sff_id]))
+                packet.extend_path(self.get_multi_hop_path_for(self.sim, self.id, packet.flow.desiredEgressSSFid))
             
             # we reached already the egress?
             if len(packet.fullPath) == packet.pathPosition:
-                if self.sim.DEBUG:
-                    print(". packet reached egress")
-                
                 # we should be at the egress
                 assert (self.id == packet.flow.desiredEgressSSFid)
                 # there should be no remaining sf type
-                assert (len(packet.toBeVisited) == 0)
+                assert (not packet.has_sf_to_schedule())
                 
                 packet.done()
                 return False
@@ -264,21 +314,21 @@ class SFF(object):
         return True
     
     def handle_packet_from_ingress(self, packet: Packet):
-        if self.check_and_update_packet_and_return_if_process_locally(packet, f'ingress'):
+        if self.check_and_update_packet_and_return_if_process_locally(packet, 'ingress'):
             self.apply_logic_packet_from_ingress(packet)
     
     def handle_packet_from_other_sff(self, packet: Packet, other_sff: 'SFF'):
-        if self.check_and_update_packet_and_return_if_process_locally(packet, f'a sff {other_sff.id}'):
+        if self.check_and_update_packet_and_return_if_process_locally(packet, other_sff):
             self.apply_logic_packet_from_other_sff(packet, other_sff)
     
     def handle_packet_from_sfi(self, packet: Packet, sfi: 'SFI'):
-        if self.check_and_update_packet_and_return_if_process_locally(packet, f'a sfi {sfi.id}'):
+        if self.check_and_update_packet_and_return_if_process_locally(packet, sfi):
             self.apply_logic_packet_from_sfi(packet, sfi)
     
     def handle_packet_from_scheduler(self, packet: Packet):
         if self.sim.PACKET_ID_TO_DEBUG == packet.id:
             print(f'** receive packet from scheduler..')
-            Packet.debug_print_path(packet.fullPath, packet.pathPosition)
+            Packet.debug_print_path(self.sim, packet.fullPath, packet.pathPosition)
         
         if self.check_and_update_packet_and_return_if_process_locally(packet, 'scheduler'):
             Packet.debug_packet(packet)
@@ -297,9 +347,12 @@ class SFF(object):
         self.put_packet_in_queue(packet)
         self.inform_scheduler_about_packet(packet)
     
-    def inform_scheduler_about_packet(self, packet):
+    def inform_scheduler_about_packet_traced(self, packet):
         if self.sim.DEBUG or packet.id == self.sim.PACKET_ID_TO_DEBUG:
             print(f'** send packet ({packet.id}) to scheduler')
+        SFF.inform_scheduler_about_packet(self, packet)
+    
+    def inform_scheduler_about_packet(self, packet):
         packet.seenByScheduler += 1
         try:
             self.scheduler.handle_packet_arrival(packet=packet)
@@ -313,7 +366,7 @@ class SFF(object):
     
     def put_packet_in_queue(self, packet):
         if self.scheduler.requires_queues_per_class():
-            queue = Flow.get_packet_class_of_packet(packet)
+            queue = packet.packet_class
             
             if queue not in self.packet_queue_per_class:
                 self.packet_queue_per_class[queue] = deque()
@@ -324,7 +377,7 @@ class SFF(object):
         else:
             self.packet_queue.append(packet)
         
-        packet.mark_time()  # mark time when this packet was queued to the scheduler
+        packet.mark_time(PacketLocation.sff_queue)  # mark time when this packet was queued to the scheduler
     
     def register_sfi(self, sfi: 'SFI'):
         if not (sfi.of_type in self.SFIsPerType):
@@ -388,9 +441,7 @@ class SFF(object):
     def get_multi_hop_route_between_ids(sim: Sim, from_id, to_id):
         if from_id == to_id:
             return []
-        steps = SFF.get_multi_hop_path_for(sim, from_id, to_id)
-        all_sff: SFF.Props = sim.props.sff.allSFFs
-        return [(SFF.__name__, all_sff[step]) for step in steps]
+        return [Packet.sff_hop(step) for step in SFF.get_multi_hop_path_for(sim, from_id, to_id)]
     
     @staticmethod
     def get_multi_hop_path_for(sim: Sim, source_id, dest_id):
@@ -423,7 +474,9 @@ class SFF(object):
         sff_props: SFF.Props = sim.props.sff
         if sff_props.latencyProvider is None:
             sff_props.latencyProvider = {}
-        sff_props.latencyProvider[id] = cycle(values)
+            sff_props.latencyMinimum = {}
+        sff_props.latencyProvider[id] = LatencyCycle(values)
+        sff_props.latencyMinimum[id] = int(min(values))
     
     @staticmethod
     def setup_connection(sim: Sim, source_id, destination_id,
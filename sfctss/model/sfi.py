@@ -7,6 +7,8 @@ from ..simulator import Sim
 
 
 class SfiProcessEvent(PacketHoldingEvent):
+    __slots__ = ['sfi']
+    
     def __init__(self, processing_time, inner_packet: Packet, sfi: 'SFI'):
         super().__init__(inner_packet.flow.sim.currentTime + processing_time, inner_packet)
         self.sfi = sfi
@@ -52,6 +54,20 @@ class SFI(object):
         
         self.sim.props.sff.allSFFs[responsible_sff_id].register_sfi(self)
     
+    # handlers of the packet path, which have a variant with debug output and tracing (method name + "_traced")
+    traced_handlers = ['finished_processing', 'enqueue_packet']
+    
+    @staticmethod
+    @Sim.register_bind_handlers_hook
+    def bind_handlers(sim: Sim):
+        tracing = sim.is_tracing()
+        for sfi in sim.props.sfi.all_sfi.values():
+            for name in SFI.traced_handlers:
+                if tracing:
+                    setattr(sfi, name, getattr(sfi, f'{name}_traced'))
+                else:
+                    sfi.__dict__.pop(name, None)
+    
     @staticmethod
     @Sim.register_stop_sim_catch_all_packets_hooks
     def callback_to_get_all_packets_from_sfi(sim: Sim):
@@ -215,6 +231,18 @@ class SFI(object):
         self.free = False
         self.internal_schedule_event(self.queue.popleft())
     
+    def finished_processing_traced(self, packet: Packet):
+        if self.sim.DEBUG:
+            print(f"processing done for packet {packet.id} at sfi {self.id}")
+            Packet.debug_print_path(self.sim, packet.fullPath)
+        if self.sim.PACKET_ID_TO_DEBUG == packet.id:
+            next_hop = packet.fullPath[packet.pathPosition]
+            if Packet.is_sfi_hop(next_hop):
+                print(f'** packet processed at sfi {self.id}, send it to next sfi {~next_hop}')
+            else:
+                print(f'** packet processed at sfi {self.id}, send it back to sff')
+        SFI.finished_processing(self, packet)
+    
     def finished_processing(self, packet: Packet):
         # do we need to refresh our server shares we reserve?
         if self.refreshShares:
@@ -223,10 +251,6 @@ class SFI(object):
             self.free = False
         
         # handle next hop of packet
-        if self.sim.DEBUG:
-            print(f"processing done for packet {packet.id} at sfi {self.id}")
-            Packet.debug_print_path(packet.fullPath)
-        
         if self.server.cpu_policy == ServerCpuPolicy.one_at_a_time:
             self.free = True
             self.server.sfi_finishes_processing(self)
@@ -239,51 +263,48 @@ class SFI(object):
         sff_props: SFF.Props = self.sim.props.sff
         sff_props.allSFFs[self.sffId].sfi_finishes_processing_of_packet(self, packet)
         
-        next_hop_type, next_hop = packet.fullPath[packet.pathPosition]
+        next_hop = packet.fullPath[packet.pathPosition]
         packet.pathPosition += 1
         # we also have to add 1 to the position with respect to the sfc
         
         # is this the last stop of this sfc?
-        if Flow.get_sf_and_eoc_of_packet(packet)[1]:
+        if self.sim.props.flow.class_eoc[packet.packet_class]:
             packet.processing_done = True
         
         packet.sfc_position += 1
+        packet.packet_class += 1
         
-        packet.mark_time()
+        packet.mark_time(PacketLocation.wire)
         sfi_props: SFI.Props = self.sim.props.sfi
         sff_props: SFF.Props = self.sim.props.sff
         
         delay = next(sff_props.latencyProvider[sfi_props.latency_provider])
         
-        if next_hop_type == SFF.__name__:
+        if next_hop >= 0:
             # we send this packet to a SFF
             # this should be the SFF to which this SFI belongs to
-            assert (self.sffId == next_hop.id)
+            assert (self.sffId == next_hop)
             # since this does not take any latency, we simply call handle
             # packet
-            if self.sim.PACKET_ID_TO_DEBUG == packet.id:
-                print(f'** packet processed at sfi {self.id}, send it back to sff')
-            self.sim.schedule_event(NetworkDelayEvent(delay=delay,
-                                                      inner_packet=packet,
-                                                      source=self,
-                                                      dest_id=next_hop.id,
-                                                      source_is_sff=False,
-                                                      dest_is_sff=True))
+            network_delay_event = self.sim.props.packet.network_delay_event_type
+            self.sim.schedule_event(network_delay_event(delay=delay,
+                                                        inner_packet=packet,
+                                                        source=self,
+                                                        dest_id=next_hop,
+                                                        source_is_sff=False,
+                                                        dest_is_sff=True))
         
-        elif next_hop_type == SFI.__name__:
+        else:
             # we send this packet to the next SFI
             # this SFI should have the same SFF as I have, otherwise this is not
             # allowed
-            if self.sim.PACKET_ID_TO_DEBUG == packet.id:
-                print(f'** packet processed at sfi {self.id}, send it to next sfi {next_hop.id}')
-            self.sim.schedule_event(NetworkDelayEvent(delay=delay,
-                                                      inner_packet=packet,
-                                                      source=self,
-                                                      dest_id=next_hop.id,
-                                                      source_is_sff=False,
-                                                      dest_is_sff=False))
-        else:
-            NameError("unknown next hop")
+            network_delay_event = self.sim.props.packet.network_delay_event_type
+            self.sim.schedule_event(network_delay_event(delay=delay,
+                                                        inner_packet=packet,
+                                                        source=self,
+                                                        dest_id=~next_hop,
+                                                        source_is_sff=False,
+                                                        dest_is_sff=False))
     
     def internal_schedule_event(self, packet: Packet):
         assert not self.free
@@ -334,22 +355,24 @@ class SFI(object):
         packet.timeQueueProcessing += packet.get_delta_of_time_mark()
         
         # process packet
-        packet.mark_time()
+        packet.mark_time(PacketLocation.sfi_processing)
         self.sim.schedule_event(
             SfiProcessEvent(
                 processing_time=self.cachedTimeToProcessAPacket,
                 inner_packet=packet,
                 sfi=self))
     
-    def enqueue_packet(self, packet: Packet):
+    def enqueue_packet_traced(self, packet: Packet):
         if self.sim.TRACE_PACKET_PATH:
             packet.visitedHops.append(self)
         
         if packet.id == self.sim.PACKET_ID_TO_DEBUG:
             print(f"** receive debug packet at sfi {self}")
-        
+        SFI.enqueue_packet(self, packet)
+    
+    def enqueue_packet(self, packet: Packet):
         # remember current time so that we track queue time for this packet
-        packet.mark_time()
+        packet.mark_time(PacketLocation.sfi_queue)
         
         if self.free:
             if self.server.ask_for_processing(self):
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import multiprocessing
+import time
+import traceback
+from typing import Callable, Dict, List, Tuple
+
+from .events import BaseEvent, PacketHoldingEvent
+from .model.core import Flow, Packet, IngressEvent, NetworkDelayEvent
+from .simulator import Sim
+
+# conservative parallel simulation (PDES) of a simulation partitioned by SFFs, e.g., one partition per site.
+#
+# each partition runs in a worker process, and each worker builds the full simulation (all SFFs, SFIs, servers, and
+# the complete workload), but only simulates the SFFs (and the servers of their SFIs) of its own partition. packets
+# which are sent between SFFs of different partitions are handed over as messages. the partitions advance in time
+# windows: all events earlier than (earliest pending event or message + lookahead) are safe, since the lookahead is
+# the smallest latency of all links between partitions, so no message can arrive within the current window.
+
+# (arrival time, packet id, source sff id, destination sff id, packet state)
+PacketMessage = Tuple[int, int, int, int, dict]
+
+
+def get_packet_state(packet: Packet) -> dict:
+    if packet.callback_when_be_dropped is not None:
+        raise NameError(f"packet {packet.id} has a drop callback of its scheduler, schedulers which keep state "
+                        f"of packets at other SFFs are not supported in partitioned simulations")
+    state = {name: getattr(packet, name) for name in Packet.__slots__}
+    del state['flow']
+    del state['callback_when_be_dropped']
+    state['flow_id'] = packet.flow.id
+    if packet.visitedHops is not None:
+        state['visitedHops'] = [sff.id for sff in packet.visitedHops]
+    return state
+
+
+def create_packet_from_state(sim: 'PartitionSim', state: dict) -> Packet:
+    state = dict(state)
+    packet_type = sim.props.packet.packet_type
+    packet = packet_type.__new__(packet_type)
+    packet.flow = sim.get_flow(state.pop('flow_id'))
+    packet.callback_when_be_dropped = None
+    state['fullPath'] = Packet.intern_path(sim, tuple(state['fullPath']))
+    if state['visitedHops'] is not None:
+        state['visitedHops'] = [sim.props.sff.allSFFs[sff_id] for sff_id in state['visitedHops']]
+    for name, value in state.items():
+        setattr(packet, name, value)
+    return packet
+
+
+class LinkReleaseEvent(BaseEvent):
+    """Frees the link of a packet which was sent to another partition, when the packet arrives there."""
+    __slots__ = ['source', 'dest_id', 'packet']
+    
+    def __init__(self, at_time, source, dest_id, packet: Packet):
+        super().__init__(at_time)
+        self.source = source
+        self.dest_id = dest_id
+        self.packet = packet
+    
+    def process_event(self):
+        NetworkDelayEvent.release_link(self.source, self.dest_id, self.packet)
+    
+    def release(self):
+        self.packet = None
+        super().release()
+
+
+class RemoteArrivalEvent(PacketHoldingEvent):
+    """A packet of another partition arrives at a SFF of this partition."""
+    __slots__ = ['source', 'dest_id']
+    
+    def __init__(self, at_time, inner_packet: Packet, source, dest_id):
+        super().__init__(at_time, inner_packet)
+        self.source = source
+        self.dest_id = dest_id
+    
+    def update_packet_time_tracking(self):
+        self.inner_packet.timeNetwork += self.inner_packet.get_delta_of_time_mark()
+    
+    def process_event(self):
+        self.update_packet_time_tracking()
+        self.inner_packet.flow.sim.props.sff.allSFFs[self.dest_id].handle_packet_from_other_sff(self.inner_packet,
+                                                                                                self.source)
+
+
+class PartitionPacketGenerator(object):
+    """Wraps the packet generator of a partition, so that the partition only gets the packets of its ingress SFFs."""
+    
+    def __init__(self, sim: 'PartitionSim', packet_generator):
+        self.sim = sim
+        self.packet_generator = packet_generator
+    
+    def get_expected_workload_time(self):
+        return self.packet_generator.get_expected_workload_time()
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        while True:
+            event = self.packet_generator.__next__()
+            if self.sim.accept_ingress_event(event):
+                return event
+
+
+class PartitionSim(Sim):
+    """The simulation of a single partition, used by the worker processes of PartitionedSimulation.
+    
+    The workload is filtered after the partitioning is known, so all ingress events and the packet generator are kept
+    back till start() is called."""
+    
+    def __init__(self, seed, partition: int, event_list_backend: str = 'sorted'):
+        super().__init__(seed, event_list_backend=event_list_backend)
+        self.partition = partition
+        self.partition_of_sff: Dict[int, int] = None
+        self.local_sffs: list = []
+        self.local_servers: list = []
+        self.lookahead: int = None
+        self.ticks = 0
+        self.outbox: List[PacketMessage] = []
+        self.flows: Dict[int, Flow] = dict()
+        self.deferred_ingress_events: List[IngressEvent] = []
+        self.deferred_packet_generator = None
+        self.counter_exported_packets = 0
+        self.counter_imported_packets = 0
+    
+    def schedule_event(self, event: BaseEvent):
+        if self.partition_of_sff is None:
+            if isinstance(event, IngressEvent):
+                self.deferred_ingress_events.append(event)
+                return
+        elif (isinstance(event, NetworkDelayEvent) and event.source_is_sff and event.dest_is_sff and
+              self.partition_of_sff[event.destID] != self.partition):
+            if not self.ignore_all_future_schedule_event_attempts:
+                self.export_packet(event)
+            return
+        super().schedule_event(event)
+    
+    def register_packet_generator(self, packet_generator, fetch_all=False):
+        assert self.deferred_packet_generator is None
+        self.deferred_packet_generator = (packet_generator, fetch_all)
+    
+    # all partitions generate the full workload (so that flow and packet ids are the same in all partitions), but keep
+    # only the packets of their ingress SFFs
+    def accept_ingress_event(self, event: IngressEvent) -> bool:
+        self.flows[event.flow.id] = event.flow
+        if self.partition_of_sff[event.sff_id] == self.partition:
+            return True
+        
+        # the packet was not created so far, only its id was reserved
+        self.props.packet.statsPacketsTotalCount -= 1
+        if self.RECYCLE_EVENTS:
+            event.release()
+        return False
+    
+    def get_flow(self, flow_id: int) -> Flow:
+        # the packet generator of this partition might be behind the generator of the sending partition
+        while flow_id not in self.flows and not self.packed_generator_is_done:
+            self.ask_packet_generator_for_more_events(1, 0)
+        if flow_id not in self.flows:
+            raise NameError(f"unknown flow {flow_id}, the workload of all partitions has to be the same")
+        return self.flows[flow_id]
+    
+    def get_lookahead(self):
+        sff_props = self.props.sff
+        lookahead = None
+        for source_id in sff_props.allSFFs:
+            for dest_id in sff_props.allSFFs:
+                if (sff_props.linkBwCap[source_id][dest_id] > 0 and
+                        self.partition_of_sff[source_id] != self.partition_of_sff[dest_id]):
+                    latency = sff_props.latencyMinimum[sff_props.linkLatency[source_id][dest_id]]
+                    if lookahead is None or latency < lookahead:
+                        lookahead = latency
+        if lookahead == 0:
+            raise NameError("links between partitions without latency are not supported, "
+                            "the lookahead of a partitioned simulation has to be larger than 0")
+        return lookahead
+    
+    def start(self, partition_of_sff: Dict[int, int]):
+        assert not self.run
+        if set(partition_of_sff.keys()) != set(self.props.sff.allSFFs.keys()):
+            raise NameError("the partitioning has to assign each SFF to a partition")
+        self.partition_of_sff = partition_of_sff
+        self.local_sffs = [sff for sff in self.props.sff.allSFFs.values() if partition_of_sff[sff.id] == self.partition]
+        
+        # a server shares its cpu among its SFIs, so all SFIs of a server have to be in the same partition
+        for server in self.props.server.all_servers:
+            partitions = set(partition_of_sff[sff_id] for sff_id in server.SFF_ids)
+            if len(partitions) > 1:
+                raise NameError(f"server {server.id} has SFIs of SFFs in different partitions {partitions}")
+            if partitions == {self.partition} or (len(partitions) == 0 and self.partition == 0):
+                self.local_servers.append(server)
+        
+        for sff in self.local_sffs:
+            if sff.scheduler.oracle:
+                print(f"WARNING the oracle scheduler of SFF {sff.id} does not see the state of other partitions")
+        
+        for event in self.deferred_ingress_events:
+            if self.accept_ingress_event(event):
+                super().schedule_event(event)
+        self.deferred_ingress_events = []
+        
+        if self.deferred_packet_generator is not None:
+            packet_generator, fetch_all = self.deferred_packet_generator
+            super().register_packet_generator(PartitionPacketGenerator(self, packet_generator), fetch_all=fetch_all)
+        else:
+            self.packed_generator_is_done = True
+        
+        self.run = True
+        self.bind_handlers()
+        for f in self.simulation_start_hooks:
+            f(self)
+        self.lookahead = self.get_lookahead()
+        self.start_time = time.time()
+        if self.workload_end_time == 0 and self.event_list.len() > 0:
+            self.workload_end_time = self.event_list.peek_last().time
+    
+    def get_next_event_time(self):
+        return self.event_list.peek_next().time if self.event_list.len() > 0 else None
+    
+    def export_packet(self, event: NetworkDelayEvent):
+        packet = event.inner_packet
+        # the link is released at the source when the packet arrives at the other partition
+        super().schedule_event(LinkReleaseEvent(event.time, event.source, event.destID, packet))
+        self.outbox.append((event.time, packet.id, event.source.id, event.destID, get_packet_state(packet)))
+        self.counter_exported_packets += 1
+        
+        self.props.packet.counter_packet_in_system -= 1
+        if self.KEEP_LIST_OF_ALL_PACKETS:
+            self.props.packet.live.remove(packet)
+        if self.RECYCLE_EVENTS:
+            event.release()
+    
+    def import_packets(self, messages: List[PacketMessage]):
+        # sort the messages, so that the order does not depend on the order of the partitions
+        for arrival_time, _, source_id, dest_id, state in sorted(messages, key=lambda m: m[:4]):
+            packet = create_packet_from_state(self, state)
+            self.counter_imported_packets += 1
+            self.props.packet.counter_packet_in_system += 1
+            if self.KEEP_LIST_OF_ALL_PACKETS:
+                self.props.packet.live.add(packet)
+            super().schedule_event(RemoteArrivalEvent(arrival_time, packet,
+                                                      source=self.props.sff.allSFFs[source_id], dest_id=dest_id))
+    
+    # processes all events before window_end, or all events till there is no relevant event if window_end is None
+    def run_window(self, window_end: int = None) -> List[PacketMessage]:
+        event_list = self.event_list
+        while event_list.len() > 0:
+            if window_end is None:
+                if event_list.get_number_of_relevant_events() == 0:
+                    break
+            elif event_list.peek_next().time >= window_end:
+                break
+            
+            self.ticks += 1
+            e = event_list.pop_next()
+            self.current_event = e
+            self.currentTime = e.time
+            if not e.ignoreWhenFinished:
+                self.lastRelevantTime = self.currentTime
+            
+            if self.DEBUG:
+                print(f"Simulation tick @time {self.currentTime} with event {e} in partition {self.partition}")
+            
+            e.process_event()
+            if self.RECYCLE_EVENTS:
+                e.release()
+        
+        outbox = self.outbox
+        self.outbox = []
+        return outbox
+    
+    def finish(self, end_time: int) -> dict:
+        self.ignore_all_future_schedule_event_attempts = True
+        # process all pending statistic events, as done by run_sim
+        if self.event_list.len() > 0 and self.event_list.get_number_of_relevant_events() == 0:
+            while self.event_list.len() > 0:
+                self.event_list.pop_next().process_event()
+        
+        for f in self.simulation_done_hooks:
+            f(self)
+        
+        counters = self.get_statistics_counters(servers=self.local_servers, sffs=self.local_sffs, end_time=end_time)
+        counters['ticks'] = self.ticks
+        counters['exported_packets'] = self.counter_exported_packets
+        counters['imported_packets'] = self.counter_imported_packets
+        return counters
+
+
+def run_partition_worker(connection, builder: Callable[[Sim], Dict[int, int]], partition: int, seed,
+                         event_list_backend: str):
+    try:
+        sim = PartitionSim(seed=seed, partition=partition, event_list_backend=event_list_backend)
+        sim.start(builder(sim))
+        connection.send(('ok', (sim.lookahead, sim.get_next_event_time(),
+                                sim.event_list.get_number_of_relevant_events(), sim.currentTime,
+                                sim.partition_of_sff)))
+        
+        while True:
+            command, window_end, messages = connection.recv()
+            sim.import_packets(messages)
+            if command == 'finish':
+                connection.send(('ok', sim.finish(window_end)))
+                break
+            
+            outbox = sim.run_window(window_end)
+            connection.send(('ok', (outbox, sim.get_next_event_time(),
+                                    sim.event_list.get_number_of_relevant_events(), sim.currentTime)))
+    except BaseException as e:
+        connection.send(('error', f"partition {partition} failed: {e}\n{traceback.format_exc()}"))
+    finally:
+        connection.close()
+
+
+class PartitionedSimulation(object):
+    """Runs a simulation partitioned by SFFs in parallel worker processes.
+    
+    The builder is called in each worker with an empty simulation, sets up the full simulation (SFFs, links, SFIs, and
+    the workload), and returns a dict which maps each SFF id to its partition (0..number_of_partitions-1). So the
+    builder has to be deterministic. If the start method is not fork, the builder has to be picklable.
+    
+    The results are deterministic for a given partitioning, but they are not identical to the results of a sequential
+    run, e.g., the partitions draw the link latencies and random numbers independently. Schedulers which use the state
+    of SFFs or SFIs of other partitions (oracle) only see the initial state of the other partitions. The statistic
+    writers of sfctss.measurement are not supported."""
+    
+    def __init__(self, builder: Callable[[Sim], Dict[int, int]], number_of_partitions: int, seed,
+                 event_list_backend: str = 'sorted', start_method: str = None):
+        self.builder = builder
+        self.number_of_partitions = number_of_partitions
+        self.seed = seed
+        self.event_list_backend = event_list_backend
+        self.start_method = start_method
+        self.lookahead: int = None
+        self.partition_of_sff: Dict[int, int] = None
+        self.number_of_windows = 0
+        self.counters: dict = None
+        self.stats: dict = None
+    
+    @staticmethod
+    def receive(connection):
+        status, result = connection.recv()
+        if status != 'ok':
+            raise NameError(result)
+        return result
+    
+    def run_sim(self, max_sim_time: int = -1, show_progress: bool = True):
+        context = multiprocessing.get_context(self.start_method)
+        connections = []
+        processes = []
+        for partition in range(self.number_of_partitions):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=run_partition_worker,
+                                      args=(worker_connection, self.builder, partition, self.seed,
+                                            self.event_list_backend),
+                                      daemon=True)
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+        
+        start_time = time.time()
+        try:
+            states = [PartitionedSimulation.receive(c) for c in connections]
+            self.lookahead = states[0][0]
+            self.partition_of_sff = states[0][4]
+            if not set(self.partition_of_sff.values()) <= set(range(self.number_of_partitions)):
+                raise NameError(f"the builder returns partitions {set(self.partition_of_sff.values())}, "
+                                f"but there are only {self.number_of_partitions} partitions")
+            print(f"start partitioned simulation with {self.number_of_partitions} partitions, "
+                  f"lookahead {self.lookahead}µs till max SimTime:{max_sim_time}")
+            
+            next_event_times = [state[1] for state in states]
+            relevant_events = [state[2] for state in states]
+            current_times = [state[3] for state in states]
+            messages: List[List[PacketMessage]] = [[] for _ in range(self.number_of_partitions)]
+            exchanged_messages = 0
+            
+            while True:
+                in_flight = [m[0] for partition_messages in messages for m in partition_messages]
+                if sum(relevant_events) == 0 and len(in_flight) == 0:
+                    break
+                window_start = min([t for t in next_event_times if t is not None] + in_flight)
+                if max_sim_time != -1 and window_start > max_sim_time:
+                    break
+                
+                if self.lookahead is None:
+                    # the partitions are not connected, so they run independently
+                    window_end = None if max_sim_time == -1 else max_sim_time + 1
+                else:
+                    window_end = window_start + self.lookahead
+                    if max_sim_time != -1:
+                        window_end = min(window_end, max_sim_time + 1)
+                
+                for partition, connection in enumerate(connections):
+                    connection.send(('window', window_end, messages[partition]))
+                messages = [[] for _ in range(self.number_of_partitions)]
+                
+                for partition, connection in enumerate(connections):
+                    outbox, next_event_times[partition], relevant_events[partition], current_times[partition] = \
+                        PartitionedSimulation.receive(connection)
+                    for message in outbox:
+                        messages[self.partition_of_sff[message[3]]].append(message)
+                    exchanged_messages += len(outbox)
+                
+                self.number_of_windows += 1
+                if show_progress and self.number_of_windows % 256 == 0:
+                    print(f"\r@{window_start}µs windows:{self.number_of_windows} "
+                          f"packets between partitions:{exchanged_messages} "
+                          f"({int(time.time() - start_time)} s)", end='\r')
+            
+            # deliver the packets which are still on the wire, so that they are counted as packets in the system
+            end_time = max(current_times)
+            for partition, connection in enumerate(connections):
+                connection.send(('finish', end_time, messages[partition]))
+            partition_counters = [PartitionedSimulation.receive(c) for c in connections]
+        finally:
+            for connection in connections:
+                connection.close()
+            for process in processes:
+                process.join()
+        
+        self.counters = {key: sum(c[key] for c in partition_counters) for key in partition_counters[0]}
+        self.counters['time'] = end_time
+        self.stats = Sim.calculate_statistics_from_counters(self.counters)
+        
+        time_passed = time.time() - start_time
+        print(f"\nPartitioned simulation done with a total of {self.counters['ticks']} ticks in "
+              f"{self.number_of_windows} windows, {exchanged_messages} packets between partitions "
+              f"({end_time / 1000000}s simulated in {time_passed}s)")
+        print(self.stats)
+        return self.stats
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import multiprocessing
+import time
+import traceback
+import weakref
+from typing import Dict, List
+
+import numpy as np
+
+from .model.core import Flow, Packet
+from .simulator import Sim
+
+
+class WorkloadRingBuffer(object):
+    """Ring buffer of compact ingress records in shared memory, written by one producer and read by one consumer. The
+    ring has a number of slots, each holds a batch of up to batch_size records; the semaphores count the free and the
+    filled slots. A batch of 0 records marks the end of the workload, a negative count a failed producer."""
+    
+    record = np.dtype([('time', '<i8'),
+                       ('flow_id', '<i8'),
+                       ('flow_start_time', '<i8'),
+                       ('sfc_class', '<i4'),
+                       ('ingress', '<i4'),
+                       ('egress', '<i4'),
+                       ('qos_delay', '<i8'),
+                       ('size', '<i4')])
+    
+    def __init__(self, context, slots: int, batch_size: int):
+        self.slots = slots
+        self.batch_size = batch_size
+        # requires python 3.8
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(create=True, size=8 * slots + slots * batch_size * self.record.itemsize)
+        self.free = context.Semaphore(slots)
+        self.filled = context.Semaphore(0)
+        self.counts: np.ndarray = None
+        self.records: np.ndarray = None
+        self.attach()
+    
+    def attach(self):
+        self.counts = np.ndarray((self.slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray((self.slots, self.batch_size), dtype=self.record, buffer=self.shm.buf,
+                                  offset=8 * self.slots)
+    
+    def put(self, slot: int, batch: List[tuple]):
+        self.free.acquire()
+        if len(batch) > 0:
+            self.records[slot, :len(batch)] = batch
+        self.counts[slot] = len(batch)
+        self.filled.release()
+    
+    def put_failure(self, slot: int):
+        self.free.acquire()
+        self.counts[slot] = -1
+        self.filled.release()
+    
+    def acquire_batch(self) -> bool:
+        # waits for the next batch, returns whether the consumer had to wait
+        if self.filled.acquire(block=False):
+            return False
+        self.filled.acquire()
+        return True
+    
+    def read_batch(self, slot: int) -> List[tuple]:
+        # returns None when the producer failed
+        count = int(self.counts[slot])
+        batch = None if count < 0 else self.records[slot, :count].tolist()
+        self.free.release()
+        return batch
+    
+    def close(self):
+        # the views have to be released before the shared memory can be closed
+        self.counts = None
+        self.records = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def run_workload_producer(packet_generator, ring: WorkloadRingBuffer):
+    # runs in the producer process, which is forked after the workload was prepared
+    slot = 0
+    try:
+        batch = []
+        while True:
+            try:
+                event = packet_generator.__next__()
+            except StopIteration:
+                break
+            flow = event.flow
+            batch.append((event.time, flow.id, flow.start_time, flow.sfc_class, event.sff_id, flow.desiredEgressSSFid,
+                          flow.qosMaxDelay, event.transmission_size))
+            if len(batch) == ring.batch_size:
+                ring.put(slot, batch)
+                slot = (slot + 1) % ring.slots
+                batch = []
+        if len(batch) > 0:
+            ring.put(slot, batch)
+            slot = (slot + 1) % ring.slots
+        ring.put(slot, [])
+    except BaseException:
+        traceback.print_exc()
+        ring.put_failure(slot)
+
+
+def stop_workload_producer(process, ring: WorkloadRingBuffer):
+    # stops the producer and frees the shared memory, also when the simulation failed or the interpreter exits
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    ring.close()
+
+
+class BackgroundWorkloadProducer(object):
+    """Runs a prepared packet generator in a separate process, which fills a shared memory ring buffer with the ingress
+    records ahead of the simulation. Register it instead of the packet generator, e.g.,
+    sim.register_packet_generator(BackgroundWorkloadProducer(sim, generator)). The simulation only waits for the
+    producer when it catches up with it; the stalls are counted in stall_count and stall_time.
+    
+    The flows are created again from the records, with the ids of the producer. The producer process is forked, so that
+    it starts with the prepared generator, and it does not support checkpoints of the simulation."""
+    
+    # the simulation does not collect garbage before a refill from the producer
+    runs_in_background = True
+    
+    def __init__(self, sim: Sim, packet_generator, slots: int = 64, batch_size: int = 8192):
+        self.sim = sim
+        self.packet_generator = packet_generator
+        self.expected_workload_time = packet_generator.get_expected_workload_time()
+        self.slots = slots
+        self.batch_size = batch_size
+        self.ring: WorkloadRingBuffer = None
+        self.process = None
+        self.finalizer = None
+        self.slot = 0
+        self.batch: List[tuple] = []
+        self.position = 0
+        self.done = False
+        # flow id -> flow, as long as the simulation holds a packet or an event of the flow, and the chain of each
+        # sfc class
+        self.flows: Dict[int, Flow] = weakref.WeakValueDictionary()
+        self.chains: Dict[int, List[int]] = {}
+        self.stall_count = 0
+        self.stall_time = 0.0
+        sim.register_simulation_done_hook(self.simulation_done_hook)
+    
+    def __getstate__(self):
+        raise NameError("simulations with a background workload producer do not support checkpoints")
+    
+    def get_expected_workload_time(self):
+        return self.expected_workload_time
+    
+    def __iter__(self):
+        return self
+    
+    def start(self):
+        context = multiprocessing.get_context('fork')
+        self.ring = WorkloadRingBuffer(context, self.slots, self.batch_size)
+        self.process = context.Process(target=run_workload_producer, args=(self.packet_generator, self.ring),
+                                       daemon=True)
+        self.process.start()
+        self.finalizer = weakref.finalize(self, stop_workload_producer, self.process, self.ring)
+        # the producer has its own copy of the generator
+        self.packet_generator = None
+    
+    def close(self):
+        if self.finalizer is not None:
+            self.finalizer()
+            self.finalizer = None
+            self.process = None
+        self.done = True
+    
+    def simulation_done_hook(self, sim: Sim):
+        self.close()
+    
+    def read_next_batch(self):
+        if self.process is None:
+            self.start()
+        start = time.time()
+        if self.ring.acquire_batch():
+            # the simulation caught up with the producer
+            self.stall_count += 1
+            self.stall_time += time.time() - start
+        self.batch = self.ring.read_batch(self.slot)
+        self.slot = (self.slot + 1) % self.slots
+        self.position = 0
+        if self.batch is None:
+            self.close()
+            raise NameError("the background workload producer failed")
+        if len(self.batch) == 0:
+            print(f"background workload producer is done, the simulation waited {self.stall_count} times "
+                  f"for {self.stall_time:.3f}s")
+            self.close()
+    
+    def get_chain(self, sfc_class: int) -> List[int]:
+        chain = self.chains.get(sfc_class)
+        if chain is None:
+            flow_props: Flow.Props = self.sim.props.flow
+            chain = self.chains[sfc_class] = []
+            eoc = False
+            while not eoc:
+                sf, eoc = flow_props.sfc_class_to_sf[sfc_class + len(chain)]
+                chain.append(sf)
+        return chain
+    
+    def get_flow(self, flow_id: int, flow_start_time: int, sfc_class: int, ingress: int, egress: int,
+                 qos_delay: int) -> Flow:
+        flow = self.flows.get(flow_id)
+        if flow is None:
+            # a flow is created again when the simulation dropped it before its last packet, so the flow ids are
+            # taken from the producer
+            flow_props: Flow.Props = self.sim.props.flow
+            last_id = flow_props.lastId
+            flow = Flow(self.sim, self.get_chain(sfc_class), qos_delay, egress, ingress, start_time=flow_start_time)
+            flow.id = flow_id
+            flow_props.lastId = max(last_id, flow_id)
+            self.flows[flow_id] = flow
+        return flow
+    
+    def __next__(self):  # -> "IngressEvent"
+        if self.position == len(self.batch):
+            if self.done:
+                raise StopIteration
+            self.read_next_batch()
+            if self.done:
+                raise StopIteration
+        
+        time_ingress, flow_id, flow_start_time, sfc_class, ingress, egress, qos_delay, size = self.batch[self.position]
+        self.position += 1
+        return Packet.create_wrap_in_event(time_ingress=time_ingress,
+                                           flow=self.get_flow(flow_id, flow_start_time, sfc_class, ingress, egress,
+                                                              qos_delay),
+                                           transmission_size=size)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+import json
+import time
+
+from .events import BaseEvent
+
+# time.perf_counter_ns requires python 3.7
+if hasattr(time, 'perf_counter_ns'):
+    perf_counter_ns = time.perf_counter_ns
+else:
+    def perf_counter_ns() -> int:
+        return int(time.perf_counter() * 1e9)
+
+
+class EventProfiler(object):
+    """Instrumentation of a simulation, activated by sim.PROFILE_EVENTS. Counts the processed events and the time spent
+    in process_event per event class, samples the size of the event list every sample_interval ticks, and attributes
+    the time spent in the scheduler to the SFF of the scheduler. The scheduler time is part of the time of the events
+    which called the scheduler."""
+    
+    # methods of the scheduler, which are called from outside the scheduler
+    scheduler_methods = ['handle_packet_arrival', 'trigger_scheduling_logic', 'notify_sfi_finished_processing_of_packet']
+    
+    def __init__(self, sim, sample_interval: int = 4096):
+        self.sim = sim
+        self.sample_interval = sample_interval
+        self.ticks = 0
+        # event class -> [count, time in ns]
+        self.events = {}
+        # (tick, sim time, events, relevant events)
+        self.event_list_size = []
+        # sff id -> [calls, time in ns]
+        self.schedulers = {}
+        self.scheduler_depth = 0
+        self.wall_time_ns = 0
+        self.started_at = None
+    
+    def start(self):
+        if self.started_at is not None:
+            return
+        self.started_at = perf_counter_ns()
+        for sff in self.sim.props.sff.allSFFs.values():
+            if sff.id not in self.schedulers:
+                self.schedulers[sff.id] = [0, 0]
+            for name in EventProfiler.scheduler_methods:
+                setattr(sff.scheduler, name, self.timed_scheduler_call(sff.id, getattr(sff.scheduler, name)))
+    
+    def stop(self):
+        if self.started_at is None:
+            return
+        self.wall_time_ns += perf_counter_ns() - self.started_at
+        self.started_at = None
+        # remove the timed calls, so that the schedulers use their methods again
+        for sff in self.sim.props.sff.allSFFs.values():
+            for name in EventProfiler.scheduler_methods:
+                sff.scheduler.__dict__.pop(name, None)
+    
+    def timed_scheduler_call(self, sff_id, method):
+        counter = self.schedulers[sff_id]
+        
+        def timed(*args, **kwargs):
+            # a scheduler might call its own methods, e.g., trigger_scheduling_logic, we only measure the outer call
+            if self.scheduler_depth > 0:
+                return method(*args, **kwargs)
+            self.scheduler_depth += 1
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += perf_counter_ns() - start
+                self.scheduler_depth -= 1
+        
+        return timed
+    
+    def process_event(self, e: BaseEvent):
+        if self.ticks % self.sample_interval == 0:
+            self.sample_event_list()
+        self.ticks += 1
+        
+        start = perf_counter_ns()
+        e.process_event()
+        duration = perf_counter_ns() - start
+        
+        counter = self.events.get(e.__class__)
+        if counter is None:
+            counter = self.events[e.__class__] = [0, 0]
+        counter[0] += 1
+        counter[1] += duration
+    
+    def sample_event_list(self):
+        self.event_list_size.append((self.ticks, self.sim.currentTime, self.sim.event_list.len(),
+                                     self.sim.event_list.get_number_of_relevant_events()))
+    
+    def get_report(self) -> dict:
+        wall_time_ns = self.wall_time_ns
+        if self.started_at is not None:
+            wall_time_ns += perf_counter_ns() - self.started_at
+        event_time_ns = sum(t for _, t in self.events.values())
+        
+        events = {}
+        for clazz, (count, time_ns) in sorted(self.events.items(), key=lambda x: -x[1][1]):
+            events[clazz.__qualname__] = {'count': count,
+                                          'time_ns': time_ns,
+                                          'mean_ns': time_ns // count,
+                                          'share': 0.0 if event_time_ns == 0 else round(time_ns / event_time_ns, 4)}
+        
+        schedulers = []
+        for sff_id, (calls, time_ns) in sorted(self.schedulers.items()):
+            schedulers.append({'sff': sff_id,
+                               'scheduler': self.sim.props.sff.allSFFs[sff_id].scheduler.__class__.__name__,
+                               'calls': calls,
+                               'time_ns': time_ns,
+                               'mean_ns': 0 if calls == 0 else time_ns // calls})
+        
+        return {'ticks': self.ticks,
+                'sim_time': self.sim.currentTime,
+                'wall_time_ns': wall_time_ns,
+                'event_time_ns': event_time_ns,
+                'events': events,
+                'schedulers': schedulers,
+                'event_list_size': [{'tick': tick, 'time': t, 'events': n, 'relevant_events': relevant}
+                                    for tick, t, n, relevant in self.event_list_size]}
+    
+    def print_report(self):
+        report = self.get_report()
+        print(f"Profile of {report['ticks']} ticks, {report['event_time_ns'] / 1e9:.3f}s in process_event of "
+              f"{report['wall_time_ns'] / 1e9:.3f}s")
+        print(f"{'event':<32} {'count':>10} {'time (ms)':>12} {'mean (ns)':>10} {'share':>7}")
+        for name, e in report['events'].items():
+            print(f"{name:<32} {e['count']:>10} {e['time_ns'] / 1e6:>12.1f} {e['mean_ns']:>10} {e['share']:>7.1%}")
+        print(f"{'sff':<8} {'scheduler':<40} {'calls':>10} {'time (ms)':>12} {'mean (ns)':>10}")
+        for s in report['schedulers']:
+            print(f"{s['sff']:<8} {s['scheduler']:<40} {s['calls']:>10} {s['time_ns'] / 1e6:>12.1f} {s['mean_ns']:>10}")
+        if len(report['event_list_size']) > 0:
+            print(f"event list size: max {max(s['events'] for s in report['event_list_size'])} events, "
+                  f"{len(report['event_list_size'])} samples every {self.sample_interval} ticks")
+    
+    def write_json(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.get_report(), f, indent=1)
+        print(f"wrote profile to {path}")
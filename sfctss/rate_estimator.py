@@ -35,6 +35,7 @@ class RateEstimator(object):
 
 
 class RateEstimatorUpdateEvent(BaseEvent):
+    __slots__ = ['estimator']
     
     def __init__(self, estimator: RateEstimator):
         super().__init__(estimator.sim.currentTime + estimator.period)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import zlib
+from bisect import bisect
+from itertools import accumulate
+from typing import Dict, List
+
+import numpy as np
+
+
+class RandomStream(object):
+    """Random numbers of a single component, drawn as chunks of uniforms from its own numpy generator. Offers the
+    methods of random.Random the model uses."""
+    __slots__ = ['generator', 'chunk_size', 'buffer', 'position']
+    
+    def __init__(self, generator: np.random.Generator, chunk_size: int = 1024):
+        self.generator = generator
+        self.chunk_size = chunk_size
+        self.buffer: List[float] = []
+        self.position = 0
+    
+    def random(self) -> float:
+        if self.position == len(self.buffer):
+            self.buffer = self.generator.random(self.chunk_size).tolist()
+            self.position = 0
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+    
+    def choices(self, population: list, weights: list = None, *, cum_weights: list = None, k: int = 1) -> list:
+        if cum_weights is None:
+            if weights is None:
+                n = len(population)
+                return [population[int(self.random() * n)] for _ in range(k)]
+            cum_weights = list(accumulate(weights))
+        elif weights is not None:
+            raise TypeError("cannot specify both weights and cumulative weights")
+        if len(cum_weights) != len(population):
+            raise ValueError("the number of weights does not match the population")
+        total = cum_weights[-1] + 0.0
+        hi = len(population) - 1
+        return [population[bisect(cum_weights, self.random() * total, 0, hi)] for _ in range(k)]
+    
+    def choice(self, seq: list):
+        return seq[int(self.random() * len(seq))]
+    
+    def shuffle(self, x: list):
+        for i in reversed(range(1, len(x))):
+            j = int(self.random() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+
+class RandomStreams(object):
+    """The random streams of a simulation, see sim.random_streams. Each stream is seeded by the seed of the simulation
+    and the name of the stream, so the numbers of a component do not depend on which other components exist, in which
+    order they draw, or in which process they run."""
+    
+    def __init__(self, seed=None):
+        self.seed = seed
+        # without a seed, the streams share the entropy drawn once here
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.streams: Dict[str, RandomStream] = {}
+    
+    def get(self, name: str) -> RandomStream:
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.streams[name] = RandomStream(self.get_generator(name))
+        return stream
+    
+    def get_generator(self, name: str) -> np.random.Generator:
+        """A new numpy generator, seeded like the stream of the same name, for components that draw whole arrays."""
+        return np.random.default_rng(np.random.SeedSequence(self.entropy, spawn_key=(zlib.crc32(name.encode()),)))
+    
+    def get_seed_description(self, name: str) -> str:
+        return f"{self.entropy}:{name}"
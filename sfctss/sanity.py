@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 # coding=utf-8
-from .model.core import Flow
+from typing import Dict
+
+import numpy as np
+
+from .model.core import Flow, Packet
 from .model.sff import SFF
 from .model.sfi import SFI
 from .scheduler.core import BaseScheduler
 from .simulator import Sim
+from .workload import WorkloadGenerator
 
 
 class BG_Colors:
@@ -51,16 +56,17 @@ def print_sim_snapshot(sim: Sim, per_sfi_stats: bool = False):
     print(f'\t{sim.props.packet.statsPacketsTotalCount}: total')
 
 
-def validate_path(path: list, start_sff: SFF):
+# a path is a tuple of hops, see Packet.sff_hop and Packet.sfi_hop
+def validate_path(path: tuple, start_sff: SFF):
     last_sff: SFF = start_sff
     last_hop = start_sff
     sim = start_sff.sim
     
-    for entry_type, entry in path:
-        if entry_type == SFF.__name__:
-            assert entry.sim == sim
+    for hop in path:
+        entry = Packet.get_instance_of_hop(sim, hop)
+        if not Packet.is_sfi_hop(hop):
             # last hop was SFI?
-            if last_hop.__class__.__name__ == SFI.__name__:
+            if isinstance(last_hop, SFI):
                 # check if SFI belongs to this SFF
                 assert (last_hop.sffId == entry.id)
             else:
@@ -122,13 +128,13 @@ def print_infrastructure(sim: Sim, with_snap: bool = False, per_sfi_stats: bool
             if sched.requires_queues_per_class():
                 for packet_class in sff.packet_queue_per_class:
                     if 0 < len(sff.packet_queue_per_class[packet_class]):
-                        found_sfc, pos = Flow.debug_get_sfc_identifier_and_pos_of_packet_class(sim, packet_class)
+                        found_sfc, pos = Flow.get_sfc_identifier_and_pos_of_packet_class(sim, packet_class)
                         
                         for rel in range(-5, 5, 1):
                             print(
-                                f'.. {packet_class + rel} -> {Flow.debug_get_sfc_identifier_and_pos_of_packet_class(sim, packet_class + rel)}')
+                                f'.. {packet_class + rel} -> {Flow.get_sfc_identifier_and_pos_of_packet_class(sim, packet_class + rel)}')
                         
-                        sf, eoc = Flow.get_sf_and_eoc_of(sim, found_sfc, pos)
+                        sf = sim.props.flow.class_sf_type[packet_class]
                         found_sfc = f'{found_sfc}/{pos}/{sf}'
                         if found_sfc not in found:
                             found[found_sfc] = len(sff.packet_queue_per_class[packet_class])
@@ -165,3 +171,65 @@ def print_infrastructure(sim: Sim, with_snap: bool = False, per_sfi_stats: bool
               f"{round(sfi_capacity[sf][1] / sff_count, 1)}/{round(sfi_capacity[sf][2] / sff_count, 1)} capacity")
     
     return sfi_capacity
+
+
+class OfferedLoadTooHigh(Exception):
+    def __init__(self, offered_load: Dict):
+        super().__init__(f"offered load too high, overloaded sf types: {offered_load['overloaded_sf'].tolist()}, "
+                         f"utilization of the servers: {round(float(offered_load['utilization_of_servers']), 2)}")
+        self.offered_load = offered_load
+
+
+def get_utilization(demand: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    # demand without any capacity is an infinite utilization
+    return np.divide(demand, capacity, out=np.where(demand > 0, np.inf, 0.0), where=capacity > 0)
+
+
+def get_offered_load(sim: Sim, workload: WorkloadGenerator, expected: bool = False,
+                     max_utilization: float = 1.0) -> Dict:
+    # the demand of the workload (in packets per second) against the processing rates of the sfis. with expected, the
+    # demand is taken from the workload model, so that an infeasible setup is found before the workload is prepared.
+    # the rows of the per sff arrays are in the order of sff_ids, the columns are the sf types
+    sfi_props: SFI.Props = sim.props.sfi
+    sff_ids = sorted(sim.props.sff.allSFFs)
+    number_of_sf_types = len(sfi_props.processingRateOfSfType)
+    processing_rates = np.array(sfi_props.processingRateOfSfType, dtype=np.float64)
+    
+    packets = workload.get_expected_packets_per_sff_and_sf() if expected else workload.get_packets_per_sff_and_sf()
+    demand_per_sff = packets / (max(1, workload.get_expected_workload_time()) / 1000000)
+    capacity_per_sff = np.array([[sim.props.sff.allSFFs[sff_id].service_rate_per_sf.get(sf, 0)
+                                  for sf in range(number_of_sf_types)]
+                                 for sff_id in sff_ids], dtype=np.float64).reshape(len(sff_ids), number_of_sf_types)
+    
+    # each sfi counts once, even if it is connected to several sffs, and as if it had its server on its own
+    capacity_per_sf = np.zeros(number_of_sf_types)
+    servers = set()
+    for sfi in sfi_props.all_sfi.values():
+        capacity_per_sf[sfi.of_type] += sfi.server.processing_cap * processing_rates[sfi.of_type]
+        servers.add(sfi.server)
+    demand_per_sf = demand_per_sff.sum(axis=0)
+    utilization_per_sf = get_utilization(demand_per_sf, capacity_per_sf)
+    
+    # the sfis of a server share its capacity, so all servers together need this capacity
+    required_capacity = np.sum(get_utilization(demand_per_sf, processing_rates))
+    utilization_of_servers = get_utilization(required_capacity, np.float64(sum(s.processing_cap for s in servers)))
+    
+    overloaded_sf = np.flatnonzero(utilization_per_sf > max_utilization)
+    return {'sff_ids': np.array(sff_ids),
+            'demand_per_sff': demand_per_sff,
+            'capacity_per_sff': capacity_per_sff,
+            'utilization_per_sff': get_utilization(demand_per_sff, capacity_per_sff),
+            'demand_per_sf': demand_per_sf,
+            'capacity_per_sf': capacity_per_sf,
+            'utilization_per_sf': utilization_per_sf,
+            'utilization_of_servers': utilization_of_servers,
+            'overloaded_sf': overloaded_sf,
+            'overloaded': len(overloaded_sf) > 0 or utilization_of_servers > max_utilization}
+
+
+def check_offered_load(sim: Sim, workload: WorkloadGenerator, expected: bool = True, max_utilization: float = 1.0):
+    # raises OfferedLoadTooHigh if any sf type, or the servers in total, are loaded above max_utilization
+    offered_load = get_offered_load(sim, workload, expected=expected, max_utilization=max_utilization)
+    if offered_load['overloaded']:
+        raise OfferedLoadTooHigh(offered_load)
+    return offered_load
@@ -20,6 +20,7 @@ class ACP(object):
     
     def __init__(self, scheduler: 'BaseScheduler'):
         self.scheduler = scheduler
+        self.random = None
         self.dist_information = None  # sff_id -> ∀ sf unrolled the ratio of load / service
         #                                         time of information
         
@@ -33,7 +34,7 @@ class ACP(object):
         forward_to_neighbor = False
         
         # forward because we cannot serve?
-        next_sf = packet.toBeVisited[0]
+        next_sf = packet.get_next_sf_to_schedule()
         if next_sf not in self.scheduler.mySFF.SFIsPerType or len(self.scheduler.mySFF.SFIsPerType[next_sf]) == 0:
             forward_to_neighbor = True
         
@@ -54,7 +55,7 @@ class ACP(object):
             if threshold_high > load > threshold_low:
                 # load is still ok, but we forward with a certain ratio
                 to_test = (load - threshold_low) / (threshold_high - threshold_low)
-                if self.scheduler.sim.random.random() <= to_test:
+                if self.random.random() <= to_test:
                     forward_to_neighbor = True
             
             elif load >= threshold_high:
@@ -80,18 +81,16 @@ class ACP(object):
         return forward_to_neighbor
     
     def recommend_forwarding_neighbor_and_update_path(self, packet: Packet):
-        next_sf = packet.toBeVisited[0]
+        next_sf = packet.get_next_sf_to_schedule()
         # select a neighbor
         assert next_sf in self.scheduler.static_sff_rates_per_sf_cum_weights
         assert 0 < len(self.scheduler.static_sff_rates_per_sf_cum_weights[next_sf])
-        target_sff_id = self.scheduler.sim.random.choices(
+        target_sff_id = self.random.choices(
             self.scheduler.static_sff_rates_per_sf_sorted_sff[next_sf],
             cum_weights=self.scheduler.static_sff_rates_per_sf_cum_weights[next_sf],
             k=1)[0]
         
-        path_to_other_sff = SFF.get_multi_hop_path_for(self.scheduler.sim, self.scheduler.mySFF.id, target_sff_id)
-        for next_sff in path_to_other_sff:
-            packet.fullPath.append((SFF.__name__, self.scheduler.sim.props.sff.allSFFs[next_sff]))
+        packet.extend_path(SFF.get_multi_hop_path_for(self.scheduler.sim, self.scheduler.mySFF.id, target_sff_id))
 
 
 class BaseScheduler(object):
@@ -113,6 +112,7 @@ class BaseScheduler(object):
         self.oracle = oracle
         self.mySFF: SFF = None
         self.sim: Sim = sim
+        self.random = None
         self.time_scheduling_starts = None
         self.acp = ACP(self) if activate_acp else None
         
@@ -136,7 +136,7 @@ class BaseScheduler(object):
         self.rate_estimator: Dict[int, RateEstimator] = {}
     
     def inform_rate_estimator_about_packet_arrival(self, packet: Packet):
-        of_sf_type = packet.toBeVisited[0]
+        of_sf_type = packet.get_next_sf_to_schedule()
         if of_sf_type not in self.rate_estimator:
             self.rate_estimator[of_sf_type] = EWMA(self.sim)
         
@@ -188,6 +188,9 @@ class BaseScheduler(object):
     def assign_sff(self, sff: SFF):
         self.mySFF = sff
         assert self.sim == sff.sim
+        self.random = self.sim.random_streams.get(f"scheduler-{sff.id}")
+        if self.acp is not None:
+            self.acp.random = self.sim.random_streams.get(f"acp-{sff.id}")
     
     def requires_queues_per_class(self):
         # whether the scheduler asks for a queue per class at the sff, or a single queue
@@ -224,7 +227,7 @@ class BaseScheduler(object):
                 packet.timeQueueScheduling += packet.get_delta_of_time_mark()
                 
                 # if we forward, check if there are some other guys who are able to process the packet
-                next_sf = packet.toBeVisited[0]
+                next_sf = packet.get_next_sf_to_schedule()
                 if (next_sf not in self.static_sff_rates_per_sf_sorted_sff or
                         len(self.static_sff_rates_per_sf_sorted_sff[next_sf]) == 0):
                     # there is no other sff, so simply reject the packet
@@ -292,6 +295,8 @@ class RejectScheduler(BaseScheduler):
 
 
 class DoSchedulingEvent(BaseEvent):
+    __slots__ = ['scheduler']
+    
     def __init__(self, delay, scheduler: 'BaseScheduler'):
         super().__init__(scheduler.sim.currentTime + delay)
         self.scheduler = scheduler
@@ -57,8 +57,8 @@ class GreedyShortestDeadlineFirstScheduler(BaseScheduler):
         incremental_path = False
         
         # for each remaining sf type of the requested chain of this packet
-        while 0 < len(packet.toBeVisited) and not incremental_path:
-            next_sf_type = packet.toBeVisited.pop(0)
+        while packet.has_sf_to_schedule() and not incremental_path:
+            next_sf_type = packet.pop_next_sf_to_schedule()
             # we need to get a SFI for this corresponding sf type
             # try to get this SFI from the SFF where this packet is currently
             # (p_at_sff)
@@ -127,18 +127,17 @@ class GreedyShortestDeadlineFirstScheduler(BaseScheduler):
                 # so go to p_at_sff if the previous path element was
                 # a SFI
                 if (len(scheduled_path) >
-                        0 and scheduled_path[-1][0] == SFI.__name__):
-                    scheduled_path.append((SFF.__name__, p_at_sff))
+                        0 and Packet.is_sfi_hop(scheduled_path[-1])):
+                    scheduled_path.append(Packet.sff_hop(p_at_sff.id))
                 
                 path_to_other_sff = SFF.get_multi_hop_path_for(self.sim, p_at_sff.id, sff_to_ask.id)
                 if self.sim.DEBUG:
                     print(". path to this guy contains {0} intermediate SFFs".format(len(path_to_other_sff)))
-                for next_sff in path_to_other_sff:
-                    scheduled_path.append((SFF.__name__, sff_props.allSFFs[next_sff]))
+                scheduled_path += path_to_other_sff
                 
                 p_at_sff = sff_to_ask
             
-            scheduled_path.append((SFI.__name__, sfi))
+            scheduled_path.append(Packet.sfi_hop(sfi.id))
             
             # if we are in incremental scheduling mode, we set the incremental_path flag,
             # so that we stop scheduling from here on
@@ -147,23 +146,21 @@ class GreedyShortestDeadlineFirstScheduler(BaseScheduler):
                 # hence we stop scheduling here
                 incremental_path = True
                 # and then go back to the SFF for scheduling
-                scheduled_path.append((SFF.__name__, sff_to_ask))
+                scheduled_path.append(Packet.sff_hop(sff_to_ask.id))
         
         if not incremental_path:
             # finally, add the egress SFF
             if p_at_sff.id != packet.flow.desiredEgressSSFid:
                 # go back to the sff
-                scheduled_path.append((SFF.__name__, p_at_sff))
-                path_to_dest = SFF.get_multi_hop_path_for(self.sim, p_at_sff.id, packet.flow.desiredEgressSSFid)
-                for sff_id in path_to_dest:
-                    scheduled_path.append((SFF.__name__, sff_props.allSFFs[sff_id]))
+                scheduled_path.append(Packet.sff_hop(p_at_sff.id))
+                scheduled_path += SFF.get_multi_hop_path_for(self.sim, p_at_sff.id, packet.flow.desiredEgressSSFid)
             else:
-                scheduled_path.append((SFF.__name__, sff_props.allSFFs[packet.flow.desiredEgressSSFid]))
+                scheduled_path.append(Packet.sff_hop(packet.flow.desiredEgressSSFid))
         
         if self.sim.DEBUG:
-            Packet.debug_print_path(scheduled_path)
+            Packet.debug_print_path(self.sim, scheduled_path)
         
-        packet.fullPath += scheduled_path
+        packet.extend_path(scheduled_path)
         self.scheduling_attempts += 1
         
         if packet.id == self.sim.PACKET_ID_TO_DEBUG:
@@ -214,8 +211,8 @@ class LoadUnawareRoundRobinScheduler(BaseScheduler):
         scheduled_path = []
         
         # for each remaining sf type of the requested chain of this packet
-        while 0 < len(packet.toBeVisited):
-            next_sf_type = packet.toBeVisited.pop(0)
+        while packet.has_sf_to_schedule():
+            next_sf_type = packet.pop_next_sf_to_schedule()
             
             # get the sfi which has to serve this packet
             if self.static_sfi_rates_per_sf_cum_weights is None:
@@ -236,9 +233,9 @@ class LoadUnawareRoundRobinScheduler(BaseScheduler):
                   len(self.static_sfi_rates_per_sf_cum_weights[next_sf_type])):
                 raise NameError(f'data structures broken')
             
-            target_sfi_id = self.sim.random.choices(self.static_sfi_rates_per_sf_sorted_sfi[next_sf_type],
-                                                    cum_weights=self.static_sfi_rates_per_sf_cum_weights[next_sf_type],
-                                                    k=1)[0]
+            target_sfi_id = self.random.choices(self.static_sfi_rates_per_sf_sorted_sfi[next_sf_type],
+                                               cum_weights=self.static_sfi_rates_per_sf_cum_weights[next_sf_type],
+                                               k=1)[0]
             
             target_sff_id = sfi_props.all_sfi[target_sfi_id].sffId
             
@@ -254,25 +251,23 @@ class LoadUnawareRoundRobinScheduler(BaseScheduler):
                 # so go to p_at_sff if the previous path element was
                 # a SFI
                 if (len(scheduled_path) >
-                        0 and scheduled_path[-1][0] == SFI.__name__):
-                    scheduled_path.append((SFF.__name__, sff_props.allSFFs[p_at_sff_id]))
+                        0 and Packet.is_sfi_hop(scheduled_path[-1])):
+                    scheduled_path.append(Packet.sff_hop(p_at_sff_id))
                 
-                path_to_other_sff = SFF.get_multi_hop_path_for(self.sim, p_at_sff_id, target_sff_id)
-                for p in path_to_other_sff:
-                    scheduled_path.append((SFF.__name__, sff_props.allSFFs[p]))
+                scheduled_path += SFF.get_multi_hop_path_for(self.sim, p_at_sff_id, target_sff_id)
                 
                 p_at_sff_id = target_sff_id
             
-            scheduled_path.append((SFI.__name__, sfi_props.all_sfi[target_sfi_id]))
+            scheduled_path.append(Packet.sfi_hop(target_sfi_id))
             
             if self.incremental:
-                scheduled_path.append((SFF.__name__, sff_props.allSFFs[target_sff_id]))
+                scheduled_path.append(Packet.sff_hop(target_sff_id))
                 break
         
         if self.sim.DEBUG:
-            Packet.debug_print_path(scheduled_path)
+            Packet.debug_print_path(self.sim, scheduled_path)
         
-        packet.fullPath += scheduled_path
+        packet.extend_path(scheduled_path)
         self.scheduling_attempts += 1
         
         if packet.id == self.sim.PACKET_ID_TO_DEBUG:
@@ -480,9 +475,9 @@ class MppScheduler(BaseScheduler):
             print(f"MppScheduler gets notified that sfi {sfi} is finished of packet {packet}, "
                   f"so remove server {sfi.server} from the blocked list")
         
-        if 'mpp_locking' in packet.scheduler_flag and packet.scheduler_flag['mpp_locking'] is True:
+        if packet.mpp_locking:
             mpp_sched_props.packet_underway_counter_per_server[sfi.server] -= 1
-            packet.scheduler_flag['mpp_locking'] = False
+            packet.mpp_locking = False
         
         # check if this was the last event, if so, we do not queue at the sfi,
         # if not, we might queue at the sfi
@@ -501,7 +496,7 @@ class MppScheduler(BaseScheduler):
             # inform all affected schedulers
             sff_props: SFF.Props = self.sim.props.sff
             sff_to_be_informed = sorted(sfi.server.SFF_ids)
-            self.sim.random.shuffle(sff_to_be_informed)
+            self.random.shuffle(sff_to_be_informed)
             for sff_id in sff_to_be_informed:
                 # schedule a scheduling event which terminates now this is required,
                 # because we should do scheduling after
@@ -515,10 +510,10 @@ class MppScheduler(BaseScheduler):
         if caller is not None:
             if caller.__class__.__name__ == SFF.__name__:
                 # get the sfi from the packet's path
-                for path_cls, path_instance in packet.fullPath[packet.pathPosition:]:
-                    if path_cls == SFI.__name__:
+                for hop in packet.fullPath[packet.pathPosition:]:
+                    if Packet.is_sfi_hop(hop):
                         # we found the next sfi, this is the guy we are intrested in
-                        sfi = path_instance
+                        sfi = Packet.get_instance_of_hop(self.sim, hop)
                         break
             elif caller.__class__.__name__ == SFI.__name__:
                 sfi = caller
@@ -534,7 +529,7 @@ class MppScheduler(BaseScheduler):
     
     def apply_scheduling_logic_for_packet(self, packet: Packet):
         ## check if next hop matches available SFIs
-        expected_sf = packet.toBeVisited[0]
+        expected_sf = packet.get_next_sf_to_schedule()
         
         if self.accessible_sf is None:
             self.accessible_sf = set()
@@ -672,7 +667,7 @@ class MppScheduler(BaseScheduler):
                                                   f'doing {self.get_properties_of_activity(activity)}, with sfi of type '
                                                   f'{sfi_props.all_sfi[self.get_properties_of_activity(activity)["sfi_id"]].of_type} '
                                                   f'for sfc identifier '
-                                                  f'{Flow.debug_get_sfc_identifier_and_pos_of_packet_class(self.sim, queue)}')
+                                                  f'{Flow.get_sfc_identifier_and_pos_of_packet_class(self.sim, queue)}')
                                         
                                         # add this as an possible option
                                         p_values[activity] = p_value
@@ -728,15 +723,14 @@ class MppScheduler(BaseScheduler):
                 # do we have to go to another SFF?
                 if target_sff != from_sff:
                     assert self.oracle
-                    path = SFF.get_multi_hop_path_for(self.sim, from_sff.id, target_sff.id)
-                    for next_sff in path:
-                        scheduled_path.append((SFF.__name__, sff_props.allSFFs[next_sff]))
+                    scheduled_path += SFF.get_multi_hop_path_for(self.sim, from_sff.id, target_sff.id)
                 
                 # push to the SFI
-                scheduled_path.append((SFI.__name__, target_sfi))
+                scheduled_path.append(Packet.sfi_hop(target_sfi.id))
                 
                 # push back to the SFF
-                scheduled_path.append((SFF.__name__, target_sff))
+                scheduled_path.append(Packet.sff_hop(target_sff.id))
+                scheduled_path = tuple(scheduled_path)
                 
                 # how many packet shall we send on this path?
                 packet_count = min(mpp_sched_props.batch_scheduling,
@@ -759,7 +753,7 @@ class MppScheduler(BaseScheduler):
                                                                        self.mySFF.id, target_sff.id)
                                 + self.mySFF.get_multi_hop_latency_for(self.sim,
                                                                        target_sff.id, packet.flow.desiredEgressSSFid))
-
+                    
                     if time_left < min_time:
                         if self.sim.DEBUG:
                             print(". drop packet because of timeout inside scheduling queue")
@@ -769,17 +763,17 @@ class MppScheduler(BaseScheduler):
                     
                     packet_count -= 1
                     
-                    packet.set_callback_when_dropped(lambda p, caller: self.notify_packet_was_dropped(p, caller))
+                    packet.set_callback_when_dropped(self.notify_packet_was_dropped)
                     
                     mpp_sched_props.packet_underway_counter_per_server[target_sfi.server] += 1
-                    packet.scheduler_flag['mpp_locking'] = True
+                    packet.mpp_locking = True
                     
                     
-                    expected_sf = packet.toBeVisited.pop(0)
+                    expected_sf = packet.pop_next_sf_to_schedule()
                     if expected_sf != target_sfi.of_type:
                         raise NameError("the scheduler messed up something!")
                     
-                    packet.fullPath += scheduled_path
+                    packet.extend_path(scheduled_path)
                     
                     if packet.id == self.sim.PACKET_ID_TO_DEBUG:
                         print(
@@ -804,9 +798,7 @@ class MppScheduler(BaseScheduler):
                     for queue in self.mySFF.packet_queue_per_class:
                         if 0 < len(self.mySFF.packet_queue_per_class[queue]):
                             # there are packets in this queue, check the sf type of this queue
-                            sfc, pos = Flow.debug_get_sfc_identifier_and_pos_of_packet_class(self.sim, queue)
-                            flow_sf, eos = Flow.get_sf_and_eoc_of(self.sim, sfc, pos)
-                            if flow_sf == sf:
+                            if flow_props.class_sf_type[queue] == sf:
                                 waiting_queues_for_sf.append(queue)
                     
                     # if there is no queue waiting, we don't have to check the sfis
@@ -817,7 +809,7 @@ class MppScheduler(BaseScheduler):
                         if sfi.free and sfi.server.is_free():
                             raise NameError(f'there is a free sfi {sfi} of a sff {self.mySFF}, '
                                             f'which could serve a packet from a queue ('
-                                            f'{[(queue, Flow.debug_get_sfc_identifier_and_pos_of_packet_class(self.sim, queue)) for queue in waiting_queues_for_sf]}).')
+                                            f'{[(queue, Flow.get_sfc_identifier_and_pos_of_packet_class(self.sim, queue)) for queue in waiting_queues_for_sf]}).')
         
         return successfully_scheduled > 0
     
@@ -2,18 +2,22 @@
 # coding=utf-8
 
 import datetime
+import functools
 import gc
+import pickle
 import pprint
 import random
 import re
+import sys
 import time
 import traceback
-from typing import Generator
+from typing import Any, Callable, Generator, List
 
 import numpy as np
 
 from . import __version__, __copyright__
-from .events import EventList, BaseEvent, PacketHoldingEvent
+from .events import EventList, BaseEvent, PacketHoldingEvent, WorkloadRefillPolicy
+from .rng import RandomStreams
 
 
 class SchedulingFailure(Exception):
@@ -21,56 +25,101 @@ class SchedulingFailure(Exception):
         super().__init__(message)
 
 
+class hook_registration(object):
+    """Decorator for the register methods of Sim. Called at the class, e.g., as decorator @Sim.register_..., the
+    hook applies to all simulations created afterwards. Called at a Sim instance, it only applies to this simulation."""
+    
+    def __init__(self, func):
+        self.func = func
+    
+    def __get__(self, instance, owner):
+        return functools.partial(self.func, owner if instance is None else instance)
+
+
+class SimProps(object):
+    """Holds for each class registered by Sim.register_reset_global_fields an instance, e.g., sim.props.sff"""
+    
+    def __init__(self, property_classes: list):
+        for property_class in property_classes:
+            self.add(property_class)
+    
+    def add(self, property_class):
+        properties = property_class()
+        try:
+            name = re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)', properties.__class__.__qualname__)[-2]
+            name_of_props = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name).lower()
+        except IndexError as e:
+            print(f'error while resetting properties for {property_class}, '
+                  f'{e}: {traceback.format_exc()}')
+            raise e
+        # print(f'::reset properties for "sim.{name_of_props}"')
+        setattr(self, name_of_props, properties)
+    
+    def __str__(self):
+        return pprint.pformat(vars(self))
+
+
 class Sim(object):
-    # hooks
+    # hooks, each simulation copies these hooks when it is created and then uses its own lists
     reset_global_fields = []
     simulation_done_hooks = []
     simulation_start_hooks = []
     stop_sim_catch_all_packets_hooks = []
     simulation_one_liner_hooks = []
     workload_over_hooks = []
+    bind_handlers_hooks = []
     ui_update_hook = None
     
-    @classmethod
-    def register_reset_global_fields(cls, clazz):
-        cls.reset_global_fields.append(clazz)
-        print(f'::register class {clazz}')
+    @hook_registration
+    def register_reset_global_fields(owner, clazz):
+        owner.reset_global_fields.append(clazz)
+        if isinstance(owner, Sim):
+            owner.props.add(clazz)
+        else:
+            print(f'::register class {clazz}')
         return clazz
     
-    @classmethod
-    def register_simulation_done_hook(cls, func):
-        cls.simulation_done_hooks.append(func)
+    @hook_registration
+    def register_simulation_done_hook(owner, func):
+        owner.simulation_done_hooks.append(func)
         return func
     
-    @classmethod
-    def register_workload_over_hook(cls, func):
-        cls.workload_over_hooks.append(func)
+    @hook_registration
+    def register_workload_over_hook(owner, func):
+        owner.workload_over_hooks.append(func)
         return func
     
-    @classmethod
-    def register_simulation_start_hook(cls, func):
-        cls.simulation_start_hooks.append(func)
+    @hook_registration
+    def register_simulation_start_hook(owner, func):
+        owner.simulation_start_hooks.append(func)
         return func
     
-    @classmethod
-    def register_sim_oneliner_text_provider(cls, func):
-        cls.simulation_one_liner_hooks.append(func)
+    # these hooks are called before the simulation starts, so that the model can choose between its handlers with and
+    # without debug output / tracing (see Sim.is_tracing)
+    @hook_registration
+    def register_bind_handlers_hook(owner, func):
+        owner.bind_handlers_hooks.append(func)
+        return func
+    
+    @hook_registration
+    def register_sim_oneliner_text_provider(owner, func):
+        owner.simulation_one_liner_hooks.append(func)
         return func
     
     # these hooks provide iterator access to all packets that are somewhere stored at internal data structures
-    @classmethod
-    def register_stop_sim_catch_all_packets_hooks(cls, func):
-        cls.stop_sim_catch_all_packets_hooks.append(func)
+    @hook_registration
+    def register_stop_sim_catch_all_packets_hooks(owner, func):
+        owner.stop_sim_catch_all_packets_hooks.append(func)
         return func
     
-    @classmethod
-    def register_ui_update_hook(cls, f):
-        if cls.ui_update_hook is not None:
+    @hook_registration
+    def register_ui_update_hook(owner, f):
+        if owner.ui_update_hook is not None:
             print('WARNING someone overwrites ui update hook')
-        cls.ui_update_hook = f
+        owner.ui_update_hook = f
         return f
     
-    def __init__(self, seed):
+    def __init__(self, seed, event_list_backend: str = 'sorted'):
         self.packet_generator: Generator = None
         self.workload_end_time: int = 0
         self.last_packet_ingress_time = 0
@@ -85,71 +134,105 @@ class Sim(object):
         self.SERVER_CPU_POLICY_DYNAMIC_INTERVAL: int = 1000000
         self.DEBUG: bool = False
         self.SERVER_CPU_SHARE_GRANULARITY: int = 10000
+        # if set, processed events are returned to the free list of their class and reused, so it is not allowed to
+        # keep references to events after they are processed
+        self.RECYCLE_EVENTS: bool = False
+        # if set, run_sim and run_one_step measure the time spent per event class and per scheduler, see self.profiler
+        self.PROFILE_EVENTS: bool = False
+        self.profiler = None
         self.run: bool = False
         self.currentTime: int = 0
-        self.event_list: EventList = EventList(sim=self)
+        self.event_list: EventList = EventList(sim=self, backend=event_list_backend)
         self.ignore_all_future_schedule_event_attempts: bool = False
         self.lastRelevantTime = 0
         self.printing_progress_previous_ticks = 0
         self.printing_progress_previous_time = 0
         self.random = random.Random(seed)
-        self.random_state_workload_python = None
-        self.random_state_workload_numpy = None
+        # the model components draw from their own streams, see RandomStreams
+        self.random_streams = RandomStreams(seed)
         self.packed_generator_is_done = False
+        # decides when and how many events are taken from the packet generator, e.g., events.AdaptiveRefillPolicy
+        self.refill_policy: WorkloadRefillPolicy = WorkloadRefillPolicy()
+        self.paused: bool = False
         
         print(f"# SFC TSS - Traffic Scheduling Simulator")
         print(f"# Version {__version__}")
         
-        # initialize global fields
-        class Props:
-            def __init__(self):
-                for property_class in Sim.reset_global_fields:
-                    properties = property_class()
-                    try:
-                        name = re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)', properties.__class__.__qualname__)[-2]
-                        name_of_props = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name).lower()
-                    except IndexError as e:
-                        print(f'error while resetting properties for {property_class}, '
-                              f'{e}: {traceback.format_exc()}')
-                        raise e
-                    # print(f'::reset properties for "sim.{name_of_props}"')
-                    setattr(self, name_of_props, properties)
-            
-            def __str__(self):
-                return pprint.pformat(vars(self))
+        self.reset_global_fields = Sim.reset_global_fields[:]
+        self.simulation_done_hooks = Sim.simulation_done_hooks[:]
+        self.simulation_start_hooks = Sim.simulation_start_hooks[:]
+        self.stop_sim_catch_all_packets_hooks = Sim.stop_sim_catch_all_packets_hooks[:]
+        self.simulation_one_liner_hooks = Sim.simulation_one_liner_hooks[:]
+        self.workload_over_hooks = Sim.workload_over_hooks[:]
+        self.bind_handlers_hooks = Sim.bind_handlers_hooks[:]
+        self.ui_update_hook = Sim.ui_update_hook
         
-        self.props = Props()
+        # initialize global fields
+        self.props = SimProps(self.reset_global_fields)
+    
+    def is_tracing(self) -> bool:
+        return self.DEBUG or self.PACKET_ID_TO_DEBUG is not None or self.TRACE_PACKET_PATH
+    
+    def bind_handlers(self):
+        for f in self.bind_handlers_hooks:
+            f(self)
     
     def schedule_event(self, event: BaseEvent):  # schedules an event -> simply add it to the list of events
         if self.ignore_all_future_schedule_event_attempts:
             return
-        self.event_list.enqueue_event(event)
+        # events without delay, e.g., DoSchedulingEvent(delay=0), do not need to be sorted into the event list
+        if event.time == self.event_list.last_popped_time:
+            self.event_list.enqueue_event_now(event)
+        else:
+            self.event_list.enqueue_event(event)
     
     def debug_get_sorted_event_list(self):
         return sorted(self.event_list.debug_get_all_remaining(), key=lambda x: x.time)
     
-    def calculate_simple_statistics(self):
-        successfully_delivered = (
-                self.props.packet.statsPacketsSuccessfulProcessed - self.props.packet.counter_packet_after_workload_end_in_system_no_timeout)
+    def get_statistics_counters(self, servers: list = None, sffs: list = None, end_time: int = None) -> dict:
+        # counters of the whole simulation, or of a part of it; the counters of the partitions of a parallel
+        # simulation (see sfctss.pdes) are summed up before calculating the statistics
+        servers = self.props.server.all_servers if servers is None else servers
+        sffs = self.props.sff.allSFFs.values() if sffs is None else sffs
+        end_time = self.currentTime if end_time is None else end_time
+        packet_props = self.props.packet
+        
         idle_time = 0
-        for s in self.props.server.all_servers:
+        for s in servers:
             idle_time += s.stats_idle_time
             if s.is_free():
-                idle_time += self.currentTime - s.stats_last_time_idle
-        idle_time_ratio = 0 if self.currentTime == 0 else round(
-            100 * (idle_time / len(self.props.server.all_servers)) / self.currentTime, 4)
+                idle_time += end_time - s.stats_last_time_idle
         
-        self.stats = {'total_scheduling_attempts':
-                          sum([s.scheduler.scheduling_attempts for s in self.props.sff.allSFFs.values()]),
-                      'success_rate': self.props.packet.statsPacketsSuccessfulProcessed /
-                                      self.props.packet.statsPacketsTotalCount,
-                      'reject_rate': self.props.packet.statsPacketsRejectedSchedule /
-                                     self.props.packet.statsPacketsTotalCount,
-                      'service_quality': 0.0 if successfully_delivered == 0 else
-                      1 - self.props.packet.statsRatiosQos / successfully_delivered,
-                      'server_idle_time': idle_time,
-                      'server_idle_time_ratio': idle_time_ratio
-                      }
+        return {'scheduling_attempts': sum([s.scheduler.scheduling_attempts for s in sffs]),
+                'packets_total': packet_props.statsPacketsTotalCount,
+                'packets_successful': packet_props.statsPacketsSuccessfulProcessed,
+                'packets_rejected_schedule': packet_props.statsPacketsRejectedSchedule,
+                'packets_timeout': packet_props.statsPacketsRejectedProcessingDelay,
+                'packets_in_system': packet_props.counter_packet_in_system,
+                'packets_after_workload_end_no_timeout':
+                    packet_props.counter_packet_after_workload_end_in_system_no_timeout,
+                'ratios_qos': packet_props.statsRatiosQos,
+                'server_idle_time': idle_time,
+                'servers': len(servers),
+                'time': end_time}
+    
+    @staticmethod
+    def calculate_statistics_from_counters(counters: dict) -> dict:
+        successfully_delivered = counters['packets_successful'] - counters['packets_after_workload_end_no_timeout']
+        idle_time_ratio = 0 if counters['time'] == 0 else round(
+            100 * (counters['server_idle_time'] / counters['servers']) / counters['time'], 4)
+        
+        return {'total_scheduling_attempts': counters['scheduling_attempts'],
+                'success_rate': counters['packets_successful'] / counters['packets_total'],
+                'reject_rate': counters['packets_rejected_schedule'] / counters['packets_total'],
+                'service_quality': 0.0 if successfully_delivered == 0 else
+                1 - counters['ratios_qos'] / successfully_delivered,
+                'server_idle_time': counters['server_idle_time'],
+                'server_idle_time_ratio': idle_time_ratio
+                }
+    
+    def calculate_simple_statistics(self):
+        self.stats = Sim.calculate_statistics_from_counters(self.get_statistics_counters())
     
     def print_sim_snapshot(self, per_sfi_stats: bool = False):
         from sfctss import sanity
@@ -163,6 +246,7 @@ class Sim(object):
     def run_one_step(self, print_status=False, do_not_stop=False):
         if not self.run:
             self.run = True
+            self.bind_handlers()
         
         if self.event_list.len() > 0:
             e = self.event_list.pop_next()
@@ -175,123 +259,158 @@ class Sim(object):
             self.currentTime = e.time  # update time to the time of the current event
             if print_status:
                 print(f'-- @{self.currentTime}')
-            e.process_event()
+            if self.PROFILE_EVENTS:
+                self.get_profiler().process_event(e)
+            else:
+                e.process_event()
+            if self.RECYCLE_EVENTS:
+                e.release()
             return True
         else:
             return False
     
-    def run_sim(self, max_sim_time: int = -1, show_progress: bool = True,
-                interactive=False, ui=False,
-                stop_simulation_when_workload_is_over=False):  # method to run the simulator
-        assert not self.run
-        assert not (ui and show_progress)
+    def get_profiler(self):
+        if self.profiler is None:
+            from .profiling import EventProfiler
+            self.profiler = EventProfiler(self)
+        self.profiler.start()
+        return self.profiler
+    
+    def start_simulation(self):
         if self.packet_generator is None:
             self.packed_generator_is_done = True
         self.run = True
+        self.bind_handlers()
         # we need to check this, in case we have only one SFF, so there is no
         # link setup
         for f in self.simulation_start_hooks:
             f(self)
-        ticks = 0
-        self.start_time = time.time()
         peek_last = self.event_list.peek_last()
         if self.workload_end_time == 0:
             self.workload_end_time = peek_last.time
+    
+    # runs the simulation till the given time and pauses it, e.g., to store a checkpoint of the warm state.
+    # run_sim continues the simulation exactly as if it was never paused
+    def run_warm_up(self, till_time: int):
+        if not self.paused:
+            assert not self.run
+            self.start_simulation()
+            self.paused = True
+        
+        while (self.event_list.get_number_of_relevant_events() > 0 and
+               self.event_list.peek_next().time <= till_time):
+            e = self.event_list.pop_next()
+            self.current_event = e
+            self.currentTime = e.time
+            if not e.ignoreWhenFinished:
+                self.lastRelevantTime = self.currentTime
+            
+            if self.DEBUG:
+                print(f"Simulation tick @time {self.currentTime} with event {e}")
+            
+            e.process_event()
+            if self.RECYCLE_EVENTS:
+                e.release()
+        print(f"simulation is paused @{self.currentTime}µs after warm up till {till_time}µs")
+    
+    def get_checkpoint(self) -> bytes:
+        if self.run and not self.paused:
+            raise NameError("a checkpoint can only be taken before the simulation runs, or after its warm up")
+        # the whole simulation is pickled, i.e., the event list, all props, the random states, and the packet generator.
+        # the global random states are part of the checkpoint, since models might use them
+        checkpoint = {'version': __version__,
+                      'sim': self,
+                      'random_state_python': random.getstate(),
+                      'random_state_numpy': np.random.get_state()}
+        recursion_limit = sys.getrecursionlimit()
+        try:
+            # packets, paths, and SFFs reference each other, so pickling goes deep
+            sys.setrecursionlimit(max(recursion_limit, 10000))
+            return pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            raise NameError(f"cannot create a checkpoint, all parts of the simulation (e.g., the packet generator and "
+                            f"all hooks) have to be picklable: {e}")
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+    
+    @staticmethod
+    def from_checkpoint(data: bytes) -> 'Sim':
+        recursion_limit = sys.getrecursionlimit()
+        try:
+            sys.setrecursionlimit(max(recursion_limit, 10000))
+            checkpoint = pickle.loads(data)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        if checkpoint['version'] != __version__:
+            raise NameError(f"checkpoint was created with version {checkpoint['version']}, "
+                            f"but this is version {__version__}")
+        random.setstate(checkpoint['random_state_python'])
+        np.random.set_state(checkpoint['random_state_numpy'])
+        return checkpoint['sim']
+    
+    def save_checkpoint(self, path: str):
+        data = self.get_checkpoint()
+        with open(path, 'wb') as f:
+            f.write(data)
+        print(f"stored checkpoint @{self.currentTime}µs with {self.event_list.len()} events in {path}")
+    
+    @staticmethod
+    def load_checkpoint(path: str) -> 'Sim':
+        with open(path, 'rb') as f:
+            return Sim.from_checkpoint(f.read())
+    
+    # runs a continuation of this (warmed up) simulation for each variant. apply_variant(sim, variant) changes the copy
+    # of the simulation, e.g., the scheduler parameters, before it runs. with more than one worker, the continuations
+    # run in parallel processes, so apply_variant has to be picklable. returns the statistics of each continuation
+    def fork(self, variants: list, apply_variant: Callable[['Sim', Any], None], max_sim_time: int = -1,
+             stop_simulation_when_workload_is_over: bool = False, workers: int = 1) -> List[dict]:
+        checkpoint = self.get_checkpoint()
+        print(f"fork simulation @{self.currentTime}µs into {len(variants)} continuations "
+              f"(checkpoint of {len(checkpoint)} bytes)")
+        arguments = [(checkpoint, variant, apply_variant, max_sim_time, stop_simulation_when_workload_is_over)
+                     for variant in variants]
+        if workers == 1:
+            return [run_fork_of_checkpoint(*a) for a in arguments]
+        
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run_fork_of_checkpoint, *zip(*arguments)))
+    
+    def run_sim(self, max_sim_time: int = -1, show_progress: bool = True,
+                interactive=False, ui=False,
+                stop_simulation_when_workload_is_over=False):  # method to run the simulator
+        assert not (ui and show_progress)
+        # a simulation which was paused after its warm up (see run_warm_up) continues where it stopped
+        resume = self.paused
+        if resume:
+            self.paused = False
+            # a fork might change the debug settings
+            self.bind_handlers()
+        else:
+            assert not self.run
+            self.start_simulation()
+        self.start_time = time.time()
         self.event_list.print_snapshot()
         print("start simulation @{0}µs till max SimTime:{1}".format(
             str(self.start_time), str(max_sim_time)))
         
-        still_during_workload = True
-        
-        if self.currentTime != 0:
-            raise NameError("this Implementation uses many class instances, \
-            hence, your cannot run multiple simulations w/o restarting python")
+        if self.currentTime != 0 and not resume:
+            raise NameError("a simulation can only run once, create a new Sim instance for the next simulation")
         
         if ui:
             from . import ui
         
+        profiler = self.get_profiler() if self.PROFILE_EVENTS else None
+        ticks = 0
+        
         try:
-            # main loop
-            
-            while self.event_list.get_number_of_relevant_events() > 0 and (
-                    max_sim_time == -1 or max_sim_time >= self.currentTime):
-                ticks += 1  # count ticks for statistics
-                if show_progress:
-                    if ticks % 4096 == 0:
-                        self.update_sim_status_oneliner(ticks=ticks)
-                if ui:
-                    if ticks % 4096 == 0:
-                        self.update_ui(ticks)
-                        if interactive:
-                            input("#" * 40 + "\nPress Enter to continue...")
-                
-                e = self.event_list.pop_next()
-                assert e != self.current_event
-                
-                if e.time > self.workload_end_time and still_during_workload and stop_simulation_when_workload_is_over:
-                    # put the event back
-                    self.event_list.enqueue_event(e)
-                    
-                    # we are now done with the workload
-                    # inform all statistic writer that workload is over
-                    self.ignore_all_future_schedule_event_attempts = True
-                    
-                    # check all packets which are still in the system,
-                    # and for each, check the current time in system,
-                    # if higher than deadline, consider as drop,
-                    #   drop, we fire p.drop, so that we get all statistics
-                    # if lower, consider as successful delivery
-                    #   no drop, but we cannot account into the detailed statistics.
-                    #   so we simply decrease the number of packets in system,
-                    #   increase successful by 1, but we do not fire
-                    #   p.done, so that the avg counter are not affected
-                    
-                    def check_remaining_packets():
-                        for callback in self.stop_sim_catch_all_packets_hooks:
-                            for packet in callback(self):
-                                yield packet
-                        
-                        while self.event_list.len() > 0:
-                            event = self.event_list.pop_next()
-                            if isinstance(event, PacketHoldingEvent):
-                                event.update_packet_time_tracking()
-                                yield event.inner_packet
-                    
-                    p_finder = check_remaining_packets()
-                    for p in p_finder:
-                        p.handle_stop_simulation()
-                    
-                    for f in self.workload_over_hooks:
-                        f(self)
-                    
-                    self.update_sim_status_oneliner(ticks, newline=True)
-                    print(
-                        "simulator reaches end of workload @{0}µs stop simulation ".format(
-                            self.currentTime))
-                    
-                    break
-                
-                self.current_event = e
-                self.currentTime = e.time  # update time to the time of the current event
-                if not e.ignoreWhenFinished:
-                    self.lastRelevantTime = self.currentTime
-                
-                if self.DEBUG:
-                    print(f"Simulation tick @time {self.currentTime} with event {e}")
-                
-                e.process_event()  # process this event, regardless of which event it is
-                
-                if self.event_list.get_number_of_relevant_events() == 0:
-                    self.update_sim_status_oneliner(ticks, newline=True)
-                    print(
-                        "simulator is done @{0}µs because of empty event stack of relevant events ".format(
-                            self.currentTime))
-                    
-                    break
-                
-                if interactive and not ui:
-                    self.print_sim_snapshot()
-                    input("#" * 40 + "\nPress Enter to continue...")
+            # the main loop is chosen once, the lean loop does not check for progress output, ui, debugging, and
+            # profiling on every tick
+            if show_progress or ui or interactive or self.DEBUG or profiler is not None:
+                ticks = self.run_instrumented_main_loop(max_sim_time, show_progress, interactive, ui,
+                                                        stop_simulation_when_workload_is_over, profiler)
+            else:
+                ticks = self.run_lean_main_loop(max_sim_time, stop_simulation_when_workload_is_over)
             
             self.ignore_all_future_schedule_event_attempts = True
             
@@ -319,9 +438,13 @@ class Sim(object):
                 f"\nsomething went wrong @{self.currentTime}, {self.event_list.len()} events "
                 f"try to write all statistics to disk\n")
             self.print_sim_snapshot()
+            # stops a background workload producer
+            if getattr(self.packet_generator, 'runs_in_background', False):
+                self.packet_generator.close()
             raise e
         finally:
-            pass
+            if profiler is not None:
+                profiler.stop()
         
         end_time = time.time()
         time_passed = (end_time - self.start_time)
@@ -333,6 +456,8 @@ class Sim(object):
         
         self.calculate_simple_statistics()
         print(self.stats)
+        if profiler is not None:
+            profiler.print_report()
         
         # clear events that are not important anymore
         # e.g., a statistic event might still be scheduled
@@ -348,6 +473,140 @@ class Sim(object):
                 print("simulation has still {0} enqueued events".format(
                     str(len(remaining_events))))
     
+    def run_lean_main_loop(self, max_sim_time: int, stop_simulation_when_workload_is_over: bool) -> int:
+        event_list = self.event_list
+        pop_next = event_list.pop_next
+        get_number_of_relevant_events = event_list.get_number_of_relevant_events
+        recycle_events = self.RECYCLE_EVENTS
+        if max_sim_time == -1:
+            max_sim_time = float('inf')
+        ticks = 0
+        
+        while get_number_of_relevant_events() > 0 and max_sim_time >= self.currentTime:
+            ticks += 1
+            e = pop_next()
+            
+            # the workload end time is updated when new workload is loaded, so it is not cached
+            if stop_simulation_when_workload_is_over and e.time > self.workload_end_time:
+                self.stop_at_end_of_workload(e, ticks)
+                break
+            
+            self.current_event = e
+            self.currentTime = e.time
+            if not e.ignoreWhenFinished:
+                self.lastRelevantTime = self.currentTime
+            
+            e.process_event()
+            if recycle_events:
+                e.release()
+        else:
+            if ticks > 0 and get_number_of_relevant_events() == 0:
+                self.update_sim_status_oneliner(ticks, newline=True)
+                print(f"simulator is done @{self.currentTime}µs because of empty event stack of relevant events ")
+        return ticks
+    
+    def run_instrumented_main_loop(self, max_sim_time: int, show_progress: bool, interactive, ui,
+                                   stop_simulation_when_workload_is_over: bool, profiler) -> int:
+        ticks = 0
+        while self.event_list.get_number_of_relevant_events() > 0 and (
+                max_sim_time == -1 or max_sim_time >= self.currentTime):
+            ticks += 1  # count ticks for statistics
+            if show_progress:
+                if ticks % 4096 == 0:
+                    self.update_sim_status_oneliner(ticks=ticks)
+            if ui:
+                if ticks % 4096 == 0:
+                    self.update_ui(ticks)
+                    if interactive:
+                        input("#" * 40 + "\nPress Enter to continue...")
+            
+            e = self.event_list.pop_next()
+            assert e != self.current_event
+            
+            if e.time > self.workload_end_time and stop_simulation_when_workload_is_over:
+                self.stop_at_end_of_workload(e, ticks)
+                break
+            
+            self.current_event = e
+            self.currentTime = e.time  # update time to the time of the current event
+            if not e.ignoreWhenFinished:
+                self.lastRelevantTime = self.currentTime
+            
+            if self.DEBUG:
+                print(f"Simulation tick @time {self.currentTime} with event {e}")
+            
+            if profiler is None:
+                e.process_event()  # process this event, regardless of which event it is
+            else:
+                profiler.process_event(e)
+            if self.RECYCLE_EVENTS:
+                e.release()
+            
+            if self.event_list.get_number_of_relevant_events() == 0:
+                self.update_sim_status_oneliner(ticks, newline=True)
+                print(
+                    "simulator is done @{0}µs because of empty event stack of relevant events ".format(
+                        self.currentTime))
+                
+                break
+            
+            if interactive and not ui:
+                self.print_sim_snapshot()
+                input("#" * 40 + "\nPress Enter to continue...")
+        return ticks
+    
+    def stop_at_end_of_workload(self, e: BaseEvent, ticks: int):
+        # put the event back
+        self.event_list.enqueue_event(e)
+        
+        # we are now done with the workload
+        # inform all statistic writer that workload is over
+        self.ignore_all_future_schedule_event_attempts = True
+        
+        # check all packets which are still in the system,
+        # and for each, check the current time in system,
+        # if higher than deadline, consider as drop,
+        #   drop, we fire p.drop, so that we get all statistics
+        # if lower, consider as successful delivery
+        #   no drop, but we cannot account into the detailed statistics.
+        #   so we simply decrease the number of packets in system,
+        #   increase successful by 1, but we do not fire
+        #   p.done, so that the avg counter are not affected
+        
+        def check_remaining_packets():
+            if self.KEEP_LIST_OF_ALL_PACKETS:
+                # the packets in the network are known, so only the packets of the workload which did not enter the
+                # network are taken from the events
+                for event in self.event_list.clear():
+                    if isinstance(event, PacketHoldingEvent) and event.inner_packet is None:
+                        event.update_packet_time_tracking()
+                for packet in list(self.props.packet.live):
+                    packet.account_time_mark()
+                    yield packet
+                return
+            
+            for callback in self.stop_sim_catch_all_packets_hooks:
+                for packet in callback(self):
+                    yield packet
+            
+            while self.event_list.len() > 0:
+                event = self.event_list.pop_next()
+                if isinstance(event, PacketHoldingEvent):
+                    event.update_packet_time_tracking()
+                    yield event.inner_packet
+        
+        p_finder = check_remaining_packets()
+        for p in p_finder:
+            p.handle_stop_simulation()
+        
+        for f in self.workload_over_hooks:
+            f(self)
+        
+        self.update_sim_status_oneliner(ticks, newline=True)
+        print(
+            "simulator reaches end of workload @{0}µs stop simulation ".format(
+                self.currentTime))
+    
     def update_sim_status_oneliner(self, ticks, newline=False):
         progress = 100 * self.currentTime // self.workload_end_time \
             if self.currentTime <= self.workload_end_time else -1
@@ -371,42 +630,53 @@ class Sim(object):
     def update_ui(self, ticks, split_server_table=True):
         if self.currentTime == 0:
             return
-        Sim.ui_update_hook(self, ticks, split_server_table)
+        # the ui module registers its hook not before the first simulation runs with ui
+        ui_update_hook = Sim.ui_update_hook if self.ui_update_hook is None else self.ui_update_hook
+        ui_update_hook(self, ticks, split_server_table)
     
     def register_packet_generator(self, packet_generator, fetch_all=False):
         assert self.packet_generator is None
         self.packet_generator = packet_generator
         
         self.workload_end_time = packet_generator.get_expected_workload_time()
+        initial_events = self.refill_policy.get_initial_events()
+        events_before = self.event_list.len()
+        time_before = self.event_list.last_time_of_relevant_event or 0
         try:
-            print(f"Ask packet generator for a slice of up to {EventList.length_of_a_slice} packets")
-            for _ in range(EventList.length_of_a_slice):
+            print(f"Ask packet generator for a slice of up to {initial_events} packets")
+            for _ in range(initial_events):
                 self.event_list.add_event_from_the_back(self.packet_generator.__next__())
             
             while fetch_all:
                 self.event_list.add_event_from_the_back(self.packet_generator.__next__())
-            
-            # freezing random states when done
-            self.random_state_workload_python = random.getstate()
-            self.random_state_workload_numpy = np.random.get_state()
         except StopIteration:
             self.packed_generator_is_done = True
             print("packet gen is done")
         self.workload_end_time = max(self.workload_end_time, self.event_list.last_time_of_relevant_event)
+        self.refill_policy.refill_done(self.event_list, self.event_list.len() - events_before, time_before,
+                                       self.event_list.last_time_of_relevant_event or 0)
+        self.event_list.refill_margin = self.refill_policy.refill_margin
+    
+    def refill_workload(self):
+        minimum_number_of_new_events, minimum_future_time = self.refill_policy.get_refill(self.event_list)
+        self.ask_packet_generator_for_more_events(minimum_number_of_new_events, minimum_future_time)
     
     def ask_packet_generator_for_more_events(self, minimum_number_of_new_events: int,
                                              minimum_future_time: int):
         
         if not self.packed_generator_is_done and self.packet_generator is not None:
+            events_before = self.event_list.len()
+            time_before = self.event_list.last_time_of_relevant_event
             try:
-                random.setstate(self.random_state_workload_python)
-                np.random.set_state(self.random_state_workload_numpy)
-                
-                print(f"\rloading @{self.currentTime} ", end="\r")
+                report = self.refill_policy.get_report(self.event_list)
+                print(f"\rloading @{self.currentTime}, {report['buffered_events']} events buffered "
+                      f"({report['buffered_bytes'] / 1e6:.1f} MB) ", end="\r")
                 
-                gc.collect()
+                # a full collection stalls the main loop, a background producer creates the workload in its own
+                # process
+                if not getattr(self.packet_generator, 'runs_in_background', False):
+                    gc.collect()
                 
-                time_before = self.event_list.last_time_of_relevant_event
                 for _ in range(minimum_number_of_new_events):
                     self.event_list.add_event_from_the_back(self.packet_generator.__next__())
                 expected_time = time_before + minimum_future_time
@@ -417,7 +687,27 @@ class Sim(object):
                 self.packed_generator_is_done = True
                 # print("packet gen is done")
             finally:
-                self.random_state_workload_python = random.getstate()
-                self.random_state_workload_numpy = np.random.get_state()
-                
                 self.workload_end_time = max(self.workload_end_time, self.event_list.last_time_of_relevant_event)
+                
+                self.refill_policy.refill_done(self.event_list, self.event_list.len() - events_before,
+                                               time_before or 0, self.event_list.last_time_of_relevant_event or 0)
+                self.event_list.refill_margin = self.refill_policy.refill_margin
+
+
+def apply_scheduler_parameters(sim: Sim, parameters: dict):
+    # variant of a fork, sets the given attributes of all schedulers, e.g., {"admission_control_threshold_high": 1.5}
+    for sff in sim.props.sff.allSFFs.values():
+        for key, value in parameters.items():
+            if not hasattr(sff.scheduler, key):
+                raise NameError(f"scheduler {sff.scheduler.__class__.__name__} has no parameter {key}")
+            setattr(sff.scheduler, key, value)
+
+
+def run_fork_of_checkpoint(checkpoint: bytes, variant, apply_variant: Callable[[Sim, Any], None],
+                           max_sim_time: int, stop_simulation_when_workload_is_over: bool) -> dict:
+    sim = Sim.from_checkpoint(checkpoint)
+    apply_variant(sim, variant)
+    sim.run_sim(max_sim_time=max_sim_time, show_progress=False,
+                stop_simulation_when_workload_is_over=stop_simulation_when_workload_is_over)
+    return sim.stats
+
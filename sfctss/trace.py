@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import json
+import os
+import random
+import weakref
+from typing import Dict, List
+
+import numpy as np
+
+from .model.core import Flow, Packet
+from .simulator import Sim
+from .workload import WorkloadGenerator
+
+
+class WorkloadTrace(object):
+    """A workload trace is a directory with one binary file per column (little endian, one entry per ingress packet)
+    and a json file with the metadata, i.e., the number of packets, the chains referred by the chain id column, and
+    the sfc classes of the recorded simulation."""
+    
+    VERSION = 1
+    META_FILENAME = 'meta.json'
+    
+    columns = {'time': '<i8',
+               'flow_id': '<i8',
+               'chain_id': '<i4',
+               'ingress': '<i4',
+               'egress': '<i4',
+               'qos_delay': '<i8',
+               'size': '<i4'}
+    
+    @staticmethod
+    def get_column_path(directory: str, column: str) -> str:
+        return os.path.join(directory, f"{column}.bin")
+    
+    @staticmethod
+    def read_meta(directory: str) -> Dict:
+        with open(os.path.join(directory, WorkloadTrace.META_FILENAME), 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != WorkloadTrace.VERSION:
+            raise NameError(f"unsupported workload trace version {meta['version']} in {directory}")
+        return meta
+    
+    @staticmethod
+    def open_columns(directory: str, meta: Dict) -> Dict[str, np.ndarray]:
+        # the columns are mapped, not read, so that the trace can be larger than the memory
+        if meta['count'] == 0:
+            return {c: np.zeros(0, dtype=dtype) for c, dtype in meta['columns'].items()}
+        return {c: np.memmap(WorkloadTrace.get_column_path(directory, c), dtype=dtype, mode='r',
+                             shape=(meta['count'],))
+                for c, dtype in meta['columns'].items()}
+
+
+class WorkloadTraceWriter(object):
+    """Records the ingress stream of a simulation as workload trace, see SimStats.activate_workload_trace. The entries
+    are buffered and appended to the column files every buffer_size packets."""
+    
+    def __init__(self, sim: Sim, directory: str, buffer_size: int = 65536):
+        self.sim = sim
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.last_time = 0
+        # chain -> chain id, and the chain id of each sfc class
+        self.chain_ids: Dict[tuple, int] = {}
+        self.chain_id_of_sfc_class: Dict[int, int] = {}
+        self.buffer: Dict[str, list] = {c: [] for c in WorkloadTrace.columns}
+        
+        os.makedirs(directory, exist_ok=True)
+        for c in WorkloadTrace.columns:
+            # truncate an older trace
+            open(WorkloadTrace.get_column_path(directory, c), 'wb').close()
+        self.write_meta()
+    
+    def get_chain_id(self, flow: Flow) -> int:
+        chain_id = self.chain_id_of_sfc_class.get(flow.sfc_class)
+        if chain_id is None:
+            chain = tuple(flow.sfTypeChain)
+            if chain not in self.chain_ids:
+                self.chain_ids[chain] = len(self.chain_ids)
+            chain_id = self.chain_id_of_sfc_class[flow.sfc_class] = self.chain_ids[chain]
+        return chain_id
+    
+    def add_entry(self, time: int, flow: Flow, ingress: int, size: int):
+        buffer = self.buffer
+        buffer['time'].append(time)
+        buffer['flow_id'].append(flow.id)
+        buffer['chain_id'].append(self.get_chain_id(flow))
+        buffer['ingress'].append(ingress)
+        buffer['egress'].append(flow.desiredEgressSSFid)
+        buffer['qos_delay'].append(flow.qosMaxDelay)
+        buffer['size'].append(size)
+        self.last_time = time
+        if len(buffer['time']) >= self.buffer_size:
+            self.flush()
+    
+    def flush(self):
+        entries = len(self.buffer['time'])
+        if entries == 0:
+            return
+        for c, dtype in WorkloadTrace.columns.items():
+            with open(WorkloadTrace.get_column_path(self.directory, c), 'ab') as f:
+                np.array(self.buffer[c], dtype=dtype).tofile(f)
+            self.buffer[c] = []
+        self.count += entries
+    
+    def get_sfc_classes(self) -> List[Dict]:
+        # all sfc classes of the simulation, in the order of their registration, so that a replay uses the same classes
+        flow_props: Flow.Props = self.sim.props.flow
+        sfc_classes = []
+        for sfc_identifier, sfc_class in sorted(flow_props.sfc_classes.items(), key=lambda x: x[1]):
+            chain = []
+            eoc = False
+            while not eoc:
+                sf, eoc = flow_props.sfc_class_to_sf[sfc_class + len(chain)]
+                chain.append(sf)
+            sfc_classes.append({'chain': chain,
+                                'qos_delay': flow_props.sfc_class_to_deadline[sfc_class],
+                                'egress': flow_props.sfc_class_to_egress.get(sfc_class)})
+        return sfc_classes
+    
+    def write_meta(self):
+        meta = {'version': WorkloadTrace.VERSION,
+                'count': self.count,
+                'last_time': self.last_time,
+                'columns': WorkloadTrace.columns,
+                'chains': [list(chain) for chain in self.chain_ids],
+                'individual_class_per_egress': self.sim.props.flow.individual_class_per_egress,
+                'sfc_classes': self.get_sfc_classes()}
+        with open(os.path.join(self.directory, WorkloadTrace.META_FILENAME), 'w') as f:
+            json.dump(meta, f, indent=1)
+    
+    def close(self):
+        self.flush()
+        self.write_meta()
+
+
+class TraceWorkloadGenerator(WorkloadGenerator):
+    """Replays a workload trace of the directory config['workload_trace']. The columns are read through np.memmap in
+    chunks of config['workload_chunk_size'] packets, and the flows are created when their first packet is replayed,
+    with the flow id of the trace."""
+    
+    @staticmethod
+    def get_default_config():
+        return {'workload_trace': None,
+                'workload_chunk_size': 65536}
+    
+    def __init__(self, sim: Sim, workload_rand: random.Random, config: Dict):
+        super().__init__(sim, workload_rand, config)
+        self.directory = config['workload_trace']
+        self.chunk_size = config.get('workload_chunk_size', 65536)
+        self.meta = WorkloadTrace.read_meta(self.directory)
+        self.columns: Dict[str, np.ndarray] = None
+        # trace flow id -> flow, as long as the simulation holds a packet or an event of the flow
+        self.flows: Dict[int, Flow] = weakref.WeakValueDictionary()
+        self.next_packet = 0
+        self.chunk: List[tuple] = []
+        self.chunk_position = 0
+    
+    def __getstate__(self):
+        # a checkpoint stores the position in the trace, but not the mapped columns
+        state = self.__dict__.copy()
+        state['columns'] = None
+        state['flows'] = dict(self.flows)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.flows = weakref.WeakValueDictionary(state['flows'])
+    
+    def get_columns(self) -> Dict[str, np.ndarray]:
+        if self.columns is None:
+            self.columns = WorkloadTrace.open_columns(self.directory, self.meta)
+        return self.columns
+    
+    def get_traffic_classes(self) -> List[List[int]]:
+        return self.meta['chains']
+    
+    def get_expected_workload_time(self) -> int:
+        return self.meta['last_time']
+    
+    def prepare_before_simulation_starts(self):
+        flow_props: Flow.Props = self.sim.props.flow
+        if flow_props.individual_class_per_egress != self.meta['individual_class_per_egress']:
+            raise NameError(f"the workload trace {self.directory} was recorded with individual_class_per_egress="
+                            f"{self.meta['individual_class_per_egress']}")
+        
+        # flows are created while the simulation runs, so we register the sfc classes in advance
+        for sfc in self.meta['sfc_classes']:
+            if Flow.get_sfc_id(self.sim, sfc['chain'], sfc['egress']) is None:
+                Flow.register_sfc_for_packet_classes(self.sim, sfc['chain'], sfc['qos_delay'], sfc['egress'])
+            if flow_props.max_deadline is None or flow_props.max_deadline < sfc['qos_delay']:
+                flow_props.max_deadline = sfc['qos_delay']
+        self.get_columns()
+    
+    def get_packets_per_sff_and_sf(self) -> np.ndarray:
+        sff_ids = sorted(self.sim.props.sff.allSFFs)
+        chains = self.meta['chains']
+        # sff id -> row
+        rows = np.zeros(max(sff_ids) + 1, dtype=np.int64)
+        rows[sff_ids] = np.arange(len(sff_ids))
+        packets_per_sff_and_chain = np.zeros(len(sff_ids) * len(chains), dtype=np.int64)
+        columns = self.get_columns()
+        for start in range(0, self.meta['count'], self.chunk_size):
+            ingress = columns['ingress'][start:start + self.chunk_size]
+            chain_ids = columns['chain_id'][start:start + self.chunk_size]
+            packets_per_sff_and_chain += np.bincount(rows[ingress] * len(chains) + chain_ids,
+                                                     minlength=len(packets_per_sff_and_chain))
+        return packets_per_sff_and_chain.reshape(len(sff_ids), len(chains)) @ self.get_sfs_of_chains(self.sim, chains)
+    
+    def get_expected_packets_per_sff_and_sf(self) -> np.ndarray:
+        # the trace is counted in chunks, without reading more than a chunk at once
+        return self.get_packets_per_sff_and_sf()
+    
+    def read_next_chunk(self):
+        columns = self.get_columns()
+        end = min(self.next_packet + self.chunk_size, self.meta['count'])
+        self.chunk = list(zip(*[columns[c][self.next_packet:end].tolist() for c in WorkloadTrace.columns]))
+        self.chunk_position = 0
+        self.next_packet = end
+    
+    def get_flow(self, flow_id: int, chain_id: int, ingress: int, egress: int, qos_delay: int, time: int) -> Flow:
+        flow = self.flows.get(flow_id)
+        if flow is None:
+            # a flow is created again when the simulation dropped it before its last packet, so the flow ids are
+            # taken from the trace
+            flow_props: Flow.Props = self.sim.props.flow
+            last_id = flow_props.lastId
+            flow = Flow(self.sim, self.meta['chains'][chain_id], qos_delay, egress, ingress, start_time=time)
+            flow.id = flow_id
+            flow_props.lastId = max(last_id, flow_id)
+            self.flows[flow_id] = flow
+        return flow
+    
+    def __next__(self):  # -> "IngressEvent"
+        if self.chunk_position == len(self.chunk):
+            if self.next_packet == self.meta['count']:
+                raise StopIteration
+            self.read_next_chunk()
+        
+        time, flow_id, chain_id, ingress, egress, qos_delay, size = self.chunk[self.chunk_position]
+        self.chunk_position += 1
+        return Packet.create_wrap_in_event(time_ingress=time,
+                                           flow=self.get_flow(flow_id, chain_id, ingress, egress, qos_delay, time),
+                                           transmission_size=size)
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 # coding=utf-8
+import contextlib
+import hashlib
+import json
+import os
 import random
 from collections import deque
-from typing import Dict, Generator, Deque, List
+from typing import Dict, Deque, List
 
 import numpy as np
 
 from .model.core import Flow, Packet
-from .model.sfi import SFI
 from .simulator import Sim
+from .workload_models import FlowArrivalModel, FlowSizeModel, MarkovArrival, PoissonFlowSize
 
 
 class WorkloadGenerator(object):
@@ -27,13 +31,123 @@ class WorkloadGenerator(object):
     def prepare_before_simulation_starts(self):
         raise NotImplementedError()
     
+    def get_packets_per_sff_and_sf(self) -> np.ndarray:
+        # packets of the prepared workload which enter at each sff (rows in the order of sorted sff ids) and ask for
+        # each sf type (columns)
+        raise NotImplementedError()
+    
+    def get_expected_packets_per_sff_and_sf(self) -> np.ndarray:
+        # the same as get_packets_per_sff_and_sf, but expected by the workload model, without preparing the workload
+        raise NotImplementedError()
+    
     def get_workload_statistics(self):
+        # number of packets, p/s, req. processing time per second at with 1 server capacity (so this is also the req. capacity)
+        packets = self.get_packets_per_sff_and_sf().sum(axis=0)
+        exp_time = max(1, self.get_expected_workload_time()) / 1000000  # in seconds
+        processing_rates = self.sim.props.sfi.processingRateOfSfType
+        return {sf: [int(packets[sf]), packets[sf] / exp_time, packets[sf] / exp_time / processing_rates[sf]]
+                for sf in range(len(processing_rates))}
+    
+    @staticmethod
+    def get_sfs_of_chains(sim: Sim, chains: List[List[int]]) -> np.ndarray:
+        # how often each chain (rows) asks for each sf type (columns)
+        sfs_of_chains = np.zeros((len(chains), len(sim.props.sfi.processingRateOfSfType)), dtype=np.int64)
+        for i, chain in enumerate(chains):
+            np.add.at(sfs_of_chains[i], chain, 1)
+        return sfs_of_chains
+    
+    def get_cache_key(self) -> Dict:
+        # everything the prepared workload depends on, see WorkloadCache
+        raise NotImplementedError()
+    
+    def get_prepared_state(self) -> Dict[str, np.ndarray]:
+        raise NotImplementedError()
+    
+    def set_prepared_state(self, state: Dict[str, np.ndarray]):
         raise NotImplementedError()
     
     def __next__(self):
         raise NotImplementedError()
 
 
+class WorkloadCache(object):
+    """Content addressed cache of prepared workloads. An entry is a npz file of the flows and random states of a generator
+    after prepare_before_simulation_starts, named by the hash of its get_cache_key(). When the directory holds more
+    than max_bytes, the least recently used entries are removed."""
+    
+    # config keys which are written by the generators or do not change the prepared workload
+    ignored_config = ['workload_effective_deadline_per_packet', 'workload_cache', 'workload_cache_max_bytes']
+    
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def get_key(generator: WorkloadGenerator) -> str:
+        description = json.dumps(generator.get_cache_key(), sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+    
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"workload-{key}.npz")
+    
+    def load(self, path: str) -> Dict[str, np.ndarray]:
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                state = dict(entry)
+        except (OSError, ValueError):
+            # missing, or broken by a crash while writing
+            return None
+        # mark the entry as recently used
+        os.utime(path)
+        return state
+    
+    def store(self, path: str, state: Dict[str, np.ndarray]):
+        # write to a temporary file first, so that a parallel run never loads a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+    
+    def evict(self, keep: str = None):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+    
+    def prepare_before_simulation_starts(self, generator: WorkloadGenerator):
+        try:
+            key = WorkloadCache.get_key(generator)
+        except NotImplementedError:
+            generator.prepare_before_simulation_starts()
+            return
+        
+        path = self.get_path(key)
+        state = self.load(path)
+        if state is not None:
+            self.hits += 1
+            print(f"Use cached workload {key[:16]}")
+            generator.set_prepared_state(state)
+            return
+        
+        self.misses += 1
+        generator.prepare_before_simulation_starts()
+        self.store(path, generator.get_prepared_state())
+        self.evict(keep=path)
+
+
 class SyntheticWorkloadGenerator(WorkloadGenerator):
     
     @staticmethod
@@ -84,48 +198,125 @@ class SyntheticWorkloadGenerator(WorkloadGenerator):
     
     def __init__(self, sim: 'Sim', workload_rand: random.Random, config: Dict):
         super().__init__(sim, workload_rand, config)
-        self.packet_generator = None
         self.flows = None
+        # the position of the generator is kept explicitly (instead of using a python generator), so that it can be
+        # stored in a checkpoint of the simulation
+        self.flow_sizes: List[int] = None
+        self.current_flow: Flow = None
+        self.packet_start_times: List[int] = []
+        # the workload is drawn from its own stream of sim.random_streams, see get_random_state_description
+        self.random_stream_name = 'workload'
+        self.np_random: np.random.Generator = sim.random_streams.get_generator(self.random_stream_name)
     
     def __next__(self):  # -> "IngressEvent"
-        return self.packet_generator.__next__()
+        while len(self.packet_start_times) == 0:
+            if self.flow_sizes is None:
+                raise NameError("call prepare_before_simulation_starts first")
+            if len(self.flows) == 0:
+                raise StopIteration
+            self.current_flow = self.flows.popleft()
+            single_flow_size = self.flow_sizes.pop()
+            self.packet_start_times = list(
+                self.np_random.poisson(self.config['workload_packet_inter_arrival_expected_time'], single_flow_size))
+        
+        return Packet.create_wrap_in_event(time_ingress=int(self.current_flow.start_time + self.packet_start_times.pop()),
+                                           flow=self.current_flow,
+                                           transmission_size=1)
     
     def prepare_before_simulation_starts(self):
-        self.packet_generator = self.create_packet_generator()
-        
-        if next(self.packet_generator) is not None:
-            raise NameError("the very first call must be None")
+        self.create_flows()
     
-    def get_workload_statistics(self):
-        # what is the packets to be processed for each sf type
-        flow_pros: Flow.Props = self.sim.props.flow
-        flow_size = self.config['workload_packets_per_flow']
-        # number of packets, p/s, req. processing time per second at with 1 server capacity (so this is also the req. capacity)
-        per_sf_demand = {sf: [0, 0, 0] for sf in range(len(self.sim.props.sfi.processingRateOfSfType))}
-        for flow in self.flows:
-            index = 0
-            eoc = None
-            while eoc is None or not eoc:
-                sf, eoc = flow_pros.sfc_class_to_sf[flow.sfc_class + index]
-                per_sf_demand[sf][0] += flow_size
-                index += 1
-        
-        exp_time = self.get_expected_workload_time() / 1000000  # in seconds
-        sfi_props: SFI.Props = self.sim.props.sfi
-        
-        for sf in per_sf_demand:
-            # per second, how many packets to serve
-            per_sf_demand[sf][1] = per_sf_demand[sf][0] / exp_time
-            # how much processing time does it take with one server capacity
-            per_sf_demand[sf][2] = per_sf_demand[sf][1] / sfi_props.processingRateOfSfType[sf]
-        
-        return per_sf_demand
-    
-    def create_packet_generator(self) -> Generator:
+    def get_cache_key(self) -> Dict:
+        return {'generator': self.__class__.__qualname__,
+                'config': {k: v for k, v in self.config.items()
+                           if (k.startswith('workload_') or k == 'tClasses') and k not in WorkloadCache.ignored_config},
+                'sffs': sorted(self.sim.props.sff.allSFFs),
+                'random': self.get_random_state_description()}
+    
+    def get_random_state_description(self) -> str:
+        # the flows are drawn from a new generator of the workload stream, given by the seed and the name of the stream
+        return self.sim.random_streams.get_seed_description(self.random_stream_name)
+    
+    def get_random_state(self) -> Dict[str, np.ndarray]:
+        return {'np_random_state': np.array(json.dumps(self.np_random.bit_generator.state))}
+    
+    def set_random_state(self, state: Dict[str, np.ndarray]):
+        self.np_random.bit_generator.state = json.loads(str(state['np_random_state']))
+    
+    def get_prepared_state(self) -> Dict[str, np.ndarray]:
+        traffic_class = self.get_traffic_classes()
+        # the flows are stored in the order of their creation, which gives the flow ids and sfc classes
+        flows = sorted(self.flows, key=lambda f: f.id)
+        return {'flow_start_time': np.array([f.start_time for f in flows], dtype=np.int64),
+                'flow_ingress': np.array([f.ingress_sff_id for f in flows], dtype=np.int64),
+                'flow_egress': np.array([f.desiredEgressSSFid for f in flows], dtype=np.int64),
+                'flow_qos': np.array([f.qosMaxDelay for f in flows], dtype=np.int64),
+                'flow_traffic_class': np.array([traffic_class.index(f.sfTypeChain) for f in flows], dtype=np.int64),
+                'flow_sizes': np.array(self.flow_sizes, dtype=np.int64),
+                'effective_deadline_per_packet':
+                    np.array(self.config['workload_effective_deadline_per_packet'], dtype=np.int64),
+                **self.get_random_state()}
+    
+    def create_flows_of_prepared_state(self, state: Dict[str, np.ndarray]) -> List[Flow]:
+        traffic_class = self.get_traffic_classes()
+        self.config['workload_effective_deadline_per_packet'] = state['effective_deadline_per_packet'].tolist()
+        flows = [Flow(sim=self.sim, sf_type_chain=traffic_class[tc],
+                     qos_max_delay=qos,
+                     desired_egress_ssf_id=e,
+                     ingress_sff_id=i,
+                     start_time=t)
+                for t, i, e, qos, tc in zip(state['flow_start_time'].tolist(), state['flow_ingress'].tolist(),
+                                            state['flow_egress'].tolist(), state['flow_qos'].tolist(),
+                                            state['flow_traffic_class'].tolist())]
+        return sorted(flows, key=lambda f: f.start_time)
+    
+    def set_prepared_state(self, state: Dict[str, np.ndarray]):
+        self.flows = deque(self.create_flows_of_prepared_state(state))
+        self.flow_sizes = state['flow_sizes'].tolist()
+        self.set_random_state(state)
+    
+    def get_flow_arrival_model(self) -> FlowArrivalModel:
+        # the two level markov model
+        return MarkovArrival(gap_l=int(self.config['workload_lambda'] * self.config['workload_flow_arrival_l']),
+                             gap_h=int(self.config['workload_lambda'] * self.config['workload_flow_arrival_h']),
+                             stay_l=self.config['workload_probability_stay_in_l'] * self.config[
+                                 'workload_probability_factor'],
+                             stay_h=self.config['workload_probability_stay_in_h'] * self.config[
+                                 'workload_probability_factor'])
+    
+    def get_flow_size_model(self) -> FlowSizeModel:
+        return PoissonFlowSize(self.config['workload_packets_per_flow'])
+    
+    def get_sizes_of_flows(self) -> np.ndarray:
+        # the flows take their sizes from the back of flow_sizes
+        return np.array(self.flow_sizes[::-1], dtype=np.int64)
+    
+    def get_packets_per_sff_and_sf(self) -> np.ndarray:
+        if self.flow_sizes is None:
+            raise NameError("call prepare_before_simulation_starts first")
+        sff_ids = sorted(self.sim.props.sff.allSFFs)
+        traffic_class = self.get_traffic_classes()
+        flows = list(self.flows)
+        sff_of_flows = np.searchsorted(sff_ids, [f.ingress_sff_id for f in flows])
+        class_of_flows = np.array([traffic_class.index(f.sfTypeChain) for f in flows], dtype=np.int64)
+        packets_per_sff_and_class = np.bincount(sff_of_flows * len(traffic_class) + class_of_flows,
+                                                weights=self.get_sizes_of_flows(),
+                                                minlength=len(sff_ids) * len(traffic_class))
+        return packets_per_sff_and_class.reshape(len(sff_ids), len(traffic_class)) @ self.get_sfs_of_chains(
+            self.sim, traffic_class)
+    
+    def get_expected_packets_per_sff_and_sf(self) -> np.ndarray:
+        # each ingress starts flows by the arrival model, each flow takes any of the traffic classes
+        traffic_class = self.get_traffic_classes()
+        flows = self.config['workload_start_new_flows_till'] / self.get_flow_arrival_model().get_mean_gap()
+        packets_per_class = flows * self.get_flow_size_model().get_mean() / len(traffic_class)
+        packets_per_sf = packets_per_class * self.get_sfs_of_chains(self.sim, traffic_class).sum(axis=0)
+        return np.tile(packets_per_sf, (len(self.sim.props.sff.allSFFs), 1))
+    
+    def create_flows(self):
         traffic_class = self.get_traffic_classes()
         workload_flow_arrival_l = int(self.config['workload_lambda'] * self.config['workload_flow_arrival_l'])
         workload_flow_arrival_h = int(self.config['workload_lambda'] * self.config['workload_flow_arrival_h'])
-        workload_packet_inter_arrival_expected_time = self.config['workload_packet_inter_arrival_expected_time']
         workload_packets_per_flow = self.config['workload_packets_per_flow']
         workload_probability_stay_in_l = self.config['workload_probability_stay_in_l'] * self.config[
             'workload_probability_factor']
@@ -159,19 +350,19 @@ class SyntheticWorkloadGenerator(WorkloadGenerator):
                 # switch state of flow arrival times?
                 if flow_arrival_state_high:
                     # transition to low state?
-                    if np.random.rand() > workload_probability_stay_in_h:
+                    if self.np_random.random() > workload_probability_stay_in_h:
                         flow_arrival_state_high = False
                 else:
-                    if np.random.rand() > workload_probability_stay_in_l:
+                    if self.np_random.random() > workload_probability_stay_in_l:
                         flow_arrival_state_high = True
                 
-                next_inter_flow_time = np.random.poisson(workload_flow_arrival_h if flow_arrival_state_high
-                                                         else workload_flow_arrival_l)
+                next_inter_flow_time = self.np_random.poisson(workload_flow_arrival_h if flow_arrival_state_high
+                                                              else workload_flow_arrival_l)
                 flow_start_time += next_inter_flow_time
                 
-                egress = np.random.choice(all_sff)
+                egress = all_sff[self.np_random.integers(len(all_sff))]
                 
-                random_traffic_class_index = np.random.choice(range(len(traffic_class)))
+                random_traffic_class_index = self.np_random.integers(len(traffic_class))
                 random_traffic_class = traffic_class[random_traffic_class_index]
                 
                 self.flows.append(Flow(sim=self.sim, sf_type_chain=random_traffic_class,
@@ -185,19 +376,133 @@ class SyntheticWorkloadGenerator(WorkloadGenerator):
         # sort flows based on start_time
         self.flows = deque(sorted(self.flows, key=lambda f: f.start_time))
         
-        flow_sizes = np.random.poisson(workload_packets_per_flow, len(self.flows)).tolist()
+        self.flow_sizes = self.np_random.poisson(workload_packets_per_flow, len(self.flows)).tolist()
         print(f"All flows have in total {number_of_all_flows_hops} "
               f"hops, i.e., a scheduler has to take at least that many decisions")
+
+
+class VectorizedSyntheticWorkloadGenerator(SyntheticWorkloadGenerator):
+    """Same workload model as SyntheticWorkloadGenerator, but all random values are drawn as numpy arrays from its own
+    random generator (seeded by workload_rand). The flows are created upfront; the packets are created in chunks of
+    workload_chunk_size flows, each chunk is sorted by time. The state of the two level markov model is not carried
+    over from one ingress to the next one, each ingress starts in the low state.
+    
+    Instead of the two level markov model and the poisson flow sizes, the flows can be drawn by any model of
+    sfctss.workload_models, see workload_flow_arrival_model and workload_flow_size_model."""
+    
+    @staticmethod
+    def get_default_config():
+        config = SyntheticWorkloadGenerator.get_default_config()
+        # number of flows, whose packets are created and sorted at once
+        config['workload_chunk_size'] = 4096
+        # configs of the models of sfctss.workload_models, e.g., {'model': 'pareto', 'alpha': 1.5, 'minimum': 20};
+        # None takes the two level markov model and the poisson flow sizes of SyntheticWorkloadGenerator
+        config['workload_flow_arrival_model'] = None
+        config['workload_flow_size_model'] = None
+        return config
+    
+    def __init__(self, sim: 'Sim', workload_rand: random.Random, config: Dict):
+        super().__init__(sim, workload_rand, config)
+        self.rng: np.random.Generator = np.random.default_rng(workload_rand.getrandbits(64))
+        self.flows: List[Flow] = None
+        self.flow_start_times: np.ndarray = None
+        self.next_flow_of_chunk = 0
+        # packets of the current chunk, sorted by time
+        self.packet_times: List[int] = None
+        self.packet_flows: List[int] = None
+        self.next_packet = 0
+    
+    def get_flow_arrival_model(self) -> FlowArrivalModel:
+        if self.config.get('workload_flow_arrival_model') is not None:
+            return FlowArrivalModel.create(self.config['workload_flow_arrival_model'])
+        return super().get_flow_arrival_model()
+    
+    def get_flow_size_model(self) -> FlowSizeModel:
+        if self.config.get('workload_flow_size_model') is not None:
+            return FlowSizeModel.create(self.config['workload_flow_size_model'])
+        return super().get_flow_size_model()
+    
+    def get_sizes_of_flows(self) -> np.ndarray:
+        return np.asarray(self.flow_sizes, dtype=np.int64)
+    
+    def create_flows(self):
+        traffic_class = self.get_traffic_classes()
+        workload_deadline_per_packet = [int(self.config['workload_deadline_scaling'] * d)
+                                        for d
+                                        in self.config['workload_deadline_per_packet']]
+        assert len(workload_deadline_per_packet) == len(traffic_class)
         
-        yield None
+        self.config['workload_effective_deadline_per_packet'] = workload_deadline_per_packet
+        print(f"Deadlines randomized: {workload_deadline_per_packet}")
         
-        while len(self.flows) > 0:
-            f = self.flows.popleft()
-            single_flow_size = flow_sizes.pop()
-            packet_start_times = list(
-                np.random.poisson(workload_packet_inter_arrival_expected_time, single_flow_size))
-            
-            for packet in range(single_flow_size):
-                yield Packet.create_wrap_in_event(time_ingress=int(f.start_time + packet_start_times.pop()),
-                                                  flow=f,
-                                                  transmission_size=1)
+        all_sff = list(self.sim.props.sff.allSFFs.values())
+        arrival_model = self.get_flow_arrival_model()
+        start_times = []
+        ingress = []
+        for sff in all_sff:
+            start_times.append(arrival_model.draw_start_times(self.rng, self.config['workload_start_new_flows_till']))
+            ingress.append(np.full(len(start_times[-1]), sff.id))
+        start_times = np.concatenate(start_times)
+        ingress = np.concatenate(ingress)
+        egress = self.rng.integers(len(all_sff), size=len(start_times))
+        traffic_class_index = self.rng.integers(len(traffic_class), size=len(start_times))
+        
+        print(f"Created {len(start_times)} flows.. start sorting now")
+        order = np.argsort(start_times, kind='stable')
+        self.flow_start_times = start_times[order]
+        
+        self.flows = [Flow(sim=self.sim, sf_type_chain=traffic_class[tc],
+                           qos_max_delay=workload_deadline_per_packet[tc],
+                           desired_egress_ssf_id=all_sff[e].id,
+                           ingress_sff_id=int(i),
+                           start_time=int(t))
+                      for t, i, e, tc in zip(self.flow_start_times.tolist(), ingress[order].tolist(),
+                                             egress[order].tolist(), traffic_class_index[order].tolist())]
+        
+        self.flow_sizes = self.get_flow_size_model().draw(self.rng, len(self.flows))
+        number_of_all_flows_hops = int(np.array([len(c) for c in traffic_class])[traffic_class_index].sum())
+        print(f"All flows have in total {number_of_all_flows_hops} "
+              f"hops, i.e., a scheduler has to take at least that many decisions")
+    
+    def get_random_state_description(self) -> str:
+        return json.dumps(self.rng.bit_generator.state, sort_keys=True)
+    
+    def get_random_state(self) -> Dict[str, np.ndarray]:
+        return {'rng_state': np.array(json.dumps(self.rng.bit_generator.state))}
+    
+    def set_random_state(self, state: Dict[str, np.ndarray]):
+        self.rng.bit_generator.state = json.loads(str(state['rng_state']))
+    
+    def set_prepared_state(self, state: Dict[str, np.ndarray]):
+        self.flows = self.create_flows_of_prepared_state(state)
+        self.flow_start_times = state['flow_start_time']
+        self.flow_sizes = state['flow_sizes']
+        self.set_random_state(state)
+    
+    def create_packets_of_next_chunk(self):
+        first = self.next_flow_of_chunk
+        last = min(len(self.flows), first + self.config.get('workload_chunk_size', 4096))
+        self.next_flow_of_chunk = last
+        
+        sizes = self.flow_sizes[first:last]
+        flows = np.repeat(np.arange(first, last), sizes)
+        times = self.flow_start_times[flows] + self.rng.poisson(
+            self.config['workload_packet_inter_arrival_expected_time'], len(flows))
+        order = np.argsort(times, kind='stable')
+        self.packet_times = times[order].tolist()
+        self.packet_flows = flows[order].tolist()
+        self.next_packet = 0
+    
+    def __next__(self):  # -> "IngressEvent"
+        while self.packet_times is None or self.next_packet == len(self.packet_times):
+            if self.flows is None:
+                raise NameError("call prepare_before_simulation_starts first")
+            if self.next_flow_of_chunk == len(self.flows):
+                raise StopIteration
+            self.create_packets_of_next_chunk()
+        
+        i = self.next_packet
+        self.next_packet += 1
+        return Packet.create_wrap_in_event(time_ingress=self.packet_times[i],
+                                           flow=self.flows[self.packet_flows[i]],
+                                           transmission_size=1)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import math
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class EmpiricalCDF(object):
+    """Piecewise linear cdf, given by values and their cumulative probabilities (both non decreasing, from 0 to 1).
+    Samples are drawn in bulk by inverse transform; EmpiricalCDF.fit takes the quantiles of measured samples."""
+    
+    def __init__(self, values: List[float], probabilities: List[float]):
+        self.values = np.array(values, dtype=np.float64)
+        self.probabilities = np.array(probabilities, dtype=np.float64)
+        if len(self.values) < 2 or len(self.values) != len(self.probabilities):
+            raise NameError(f"an empirical cdf requires at least 2 values and one probability per value")
+        if np.any(np.diff(self.values) < 0) or np.any(np.diff(self.probabilities) < 0):
+            raise NameError(f"the values and probabilities of an empirical cdf have to be non decreasing")
+        if self.probabilities[0] != 0 or self.probabilities[-1] != 1:
+            raise NameError(f"the probabilities of an empirical cdf have to start at 0 and end at 1")
+    
+    @staticmethod
+    def fit(samples, points: int = 101) -> 'EmpiricalCDF':
+        probabilities = np.linspace(0, 1, points)
+        return EmpiricalCDF(np.quantile(np.asarray(samples, dtype=np.float64), probabilities), probabilities)
+    
+    def sample(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        return np.interp(rng.random(number), self.probabilities, self.values)
+    
+    def get_mean(self) -> float:
+        return float(np.sum((self.values[1:] + self.values[:-1]) / 2 * np.diff(self.probabilities)))
+    
+    def get_config(self) -> Dict:
+        return {'values': self.values.tolist(), 'probabilities': self.probabilities.tolist()}
+
+
+class FlowSizeModel(object):
+    """Draws the number of packets of flows, in bulk. A model is configured by a dict with the name of the model and
+    its parameters, e.g., {'model': 'pareto', 'alpha': 1.5, 'minimum': 20}, see FlowSizeModel.create."""
+    
+    def draw(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        raise NotImplementedError()
+    
+    def get_mean(self) -> float:
+        raise NotImplementedError()
+    
+    @staticmethod
+    def create(config: Dict) -> 'FlowSizeModel':
+        parameters = dict(config)
+        model = parameters.pop('model', None)
+        if model not in flow_size_models:
+            raise NameError(f"unknown flow size model {model}, use one of {list(flow_size_models)}")
+        return flow_size_models[model](**parameters)
+
+
+class PoissonFlowSize(FlowSizeModel):
+    """Poisson distributed flow sizes, the model of SyntheticWorkloadGenerator."""
+    
+    def __init__(self, mean: float):
+        self.mean = mean
+    
+    def draw(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        return rng.poisson(self.mean, number)
+    
+    def get_mean(self) -> float:
+        return self.mean
+
+
+class ParetoFlowSize(FlowSizeModel):
+    """Pareto distributed flow sizes with shape alpha and scale minimum, capped at maximum. With alpha <= 2 the variance
+    is infinite, i.e., a few elephant flows carry a large share of the packets."""
+    
+    def __init__(self, alpha: float, minimum: int = 1, maximum: int = None):
+        if alpha <= 0 or minimum < 1:
+            raise NameError(f"the pareto flow size model requires alpha > 0 and minimum >= 1")
+        self.alpha = alpha
+        self.minimum = minimum
+        self.maximum = maximum
+    
+    def draw(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        sizes = self.minimum * (1 + rng.pareto(self.alpha, number))
+        if self.maximum is not None:
+            sizes = np.minimum(sizes, self.maximum)
+        return np.floor(sizes).astype(np.int64)
+    
+    def get_mean(self) -> float:
+        # mean of min(X, maximum), i.e., minimum + the integral of P(X > x) from minimum to maximum
+        if self.maximum is None:
+            return self.alpha * self.minimum / (self.alpha - 1) if self.alpha > 1 else math.inf
+        if self.alpha == 1:
+            return self.minimum + self.minimum * math.log(self.maximum / self.minimum)
+        return self.minimum + self.minimum ** self.alpha * (
+                self.maximum ** (1 - self.alpha) - self.minimum ** (1 - self.alpha)) / (1 - self.alpha)
+
+
+class LognormalFlowSize(FlowSizeModel):
+    """Lognormal distributed flow sizes of the given mean, sigma is the standard deviation of the underlying normal
+    distribution. The sizes are rounded, at least 1, and capped at maximum."""
+    
+    def __init__(self, mean: float, sigma: float, maximum: int = None):
+        self.mean = mean
+        self.sigma = sigma
+        self.maximum = maximum
+    
+    def draw(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        sizes = rng.lognormal(math.log(self.mean) - self.sigma ** 2 / 2, self.sigma, number)
+        if self.maximum is not None:
+            sizes = np.minimum(sizes, self.maximum)
+        return np.maximum(1, np.rint(sizes)).astype(np.int64)
+    
+    def get_mean(self) -> float:
+        return self.mean
+
+
+class EmpiricalFlowSize(FlowSizeModel):
+    """Flow sizes drawn from an empirical cdf, e.g., fitted to the flow sizes of a measured trace with
+    EmpiricalFlowSize.fit(sizes).get_config()."""
+    
+    def __init__(self, values: List[float], probabilities: List[float]):
+        self.cdf = EmpiricalCDF(values, probabilities)
+    
+    @staticmethod
+    def fit(sizes, points: int = 101) -> 'EmpiricalFlowSize':
+        cdf = EmpiricalCDF.fit(sizes, points)
+        return EmpiricalFlowSize(cdf.values, cdf.probabilities)
+    
+    def draw(self, rng: np.random.Generator, number: int) -> np.ndarray:
+        return np.maximum(1, np.rint(self.cdf.sample(rng, number))).astype(np.int64)
+    
+    def get_mean(self) -> float:
+        return self.cdf.get_mean()
+    
+    def get_config(self) -> Dict:
+        return {'model': 'empirical', **self.cdf.get_config()}
+
+
+flow_size_models = {
+    'poisson': PoissonFlowSize,
+    'pareto': ParetoFlowSize,
+    'lognormal': LognormalFlowSize,
+    'empirical': EmpiricalFlowSize,
+}
+
+
+class FlowArrivalModel(object):
+    """Draws the start times (in µs) of the flows of one ingress, in bulk. As with the synthetic workload generators,
+    the start times are sorted and end with the first flow which starts at or after till. A model is configured by a
+    dict with the name of the model and its parameters, see FlowArrivalModel.create."""
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        raise NotImplementedError()
+    
+    def get_mean_gap(self) -> float:
+        # the mean time between two flows
+        raise NotImplementedError()
+    
+    @staticmethod
+    def create(config: Dict) -> 'FlowArrivalModel':
+        parameters = dict(config)
+        model = parameters.pop('model', None)
+        if model not in flow_arrival_models:
+            raise NameError(f"unknown flow arrival model {model}, use one of {list(flow_arrival_models)}")
+        return flow_arrival_models[model](**parameters)
+    
+    @staticmethod
+    def cut_at(start_times: np.ndarray, till: int) -> np.ndarray:
+        return start_times[:np.searchsorted(start_times, till, side='left') + 1]
+    
+    @staticmethod
+    def draw_renewal_start_times(draw_gaps: Callable[[int], np.ndarray], mean_gap: float, till: int) -> np.ndarray:
+        # start times of flows with independent gaps, drawn in batches of the expected number of flows
+        batch = int(till / max(1.0, mean_gap)) + 16
+        start_times = []
+        last = 0.0
+        while last < till:
+            times = last + np.cumsum(draw_gaps(batch))
+            start_times.append(times)
+            last = times[-1]
+        return FlowArrivalModel.cut_at(np.floor(np.concatenate(start_times)).astype(np.int64), till)
+
+
+class PoissonArrival(FlowArrivalModel):
+    """Flows arrive as Poisson process, with exponential distributed gaps of mean_gap µs."""
+    
+    def __init__(self, mean_gap: float):
+        self.mean_gap = mean_gap
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        return self.draw_renewal_start_times(lambda n: rng.exponential(self.mean_gap, n), self.mean_gap, till)
+    
+    def get_mean_gap(self) -> float:
+        return self.mean_gap
+
+
+class MarkovArrival(FlowArrivalModel):
+    """The two level markov model of SyntheticWorkloadGenerator: in the low (high) state the gap to the next flow is
+    Poisson distributed with mean gap_l (gap_h), after each flow the model stays in its state with probability
+    stay_l (stay_h). Each ingress starts in the low state."""
+    
+    def __init__(self, gap_l: int, gap_h: int, stay_l: float, stay_h: float):
+        self.gaps = np.array([gap_l, gap_h])
+        self.stay = [stay_l, stay_h]
+    
+    def draw_markov_states(self, rng: np.random.Generator, number: int, high: bool) -> np.ndarray:
+        # returns the state (True for high) of the next number of steps of the two level markov model. the time spent
+        # in a state is geometric distributed, so we draw the lengths of alternating runs of both states
+        runs = number // 2 + 1
+        lengths = []
+        for state in [high, not high]:
+            if self.stay[state] >= 1:
+                lengths.append(np.full(runs, number))
+            else:
+                lengths.append(rng.geometric(1 - self.stay[state], runs))
+        # the first step might already leave the current state
+        lengths[0][0] -= 1
+        states = np.repeat(np.tile([high, not high], runs), np.stack(lengths, axis=1).reshape(-1))
+        while len(states) < number:
+            states = np.concatenate([states, self.draw_markov_states(rng, number - len(states), bool(states[-1]))])
+        return states[:number]
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        start_times = np.zeros(0, dtype=np.int64)
+        high = False
+        # the flow arrival is at least the mean of the high state, which gives the expected number of flows
+        batch = till // max(1, self.gaps.min()) + 16
+        while len(start_times) == 0 or start_times[-1] < till:
+            states = self.draw_markov_states(rng, batch, high)
+            high = bool(states[-1])
+            inter_flow_times = rng.poisson(self.gaps[states.astype(np.int64)])
+            last = start_times[-1] if len(start_times) > 0 else 0
+            start_times = np.concatenate([start_times, last + np.cumsum(inter_flow_times)])
+        return self.cut_at(start_times, till)
+    
+    def get_mean_gap(self) -> float:
+        # share of the flows in each state, by the mean length of the runs of the states
+        runs = [1 / (1 - s) if s < 1 else math.inf for s in self.stay]
+        if math.isinf(runs[0]):
+            return float(self.gaps[0])
+        if math.isinf(runs[1]):
+            return float(self.gaps[1])
+        return float((runs[0] * self.gaps[0] + runs[1] * self.gaps[1]) / (runs[0] + runs[1]))
+
+
+class OnOffArrival(FlowArrivalModel):
+    """An ON/OFF source: flows arrive as Poisson process with mean_gap µs during ON periods, and not at all during OFF
+    periods. The periods are exponential distributed with mean on_mean and off_mean µs, or Pareto distributed (of the
+    same means) with shape alpha > 1, which gives heavy tailed bursts. Each ingress starts with an ON period."""
+    
+    def __init__(self, mean_gap: float, on_mean: float, off_mean: float, alpha: float = None):
+        if alpha is not None and alpha <= 1:
+            raise NameError(f"the on-off arrival model requires alpha > 1")
+        self.mean_gap = mean_gap
+        self.on_mean = on_mean
+        self.off_mean = off_mean
+        self.alpha = alpha
+    
+    def draw_periods(self, rng: np.random.Generator, mean: float, number: int) -> np.ndarray:
+        if self.alpha is None:
+            return rng.exponential(mean, number)
+        return mean * (self.alpha - 1) / self.alpha * (1 + rng.pareto(self.alpha, number))
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        batch = int(till / max(1.0, self.on_mean + self.off_mean)) + 16
+        start_times = []
+        last_period_end = 0.0
+        last_start_time = -1.0
+        while last_start_time < till:
+            on = self.draw_periods(rng, self.on_mean, batch)
+            off = self.draw_periods(rng, self.off_mean, batch)
+            ends = last_period_end + np.cumsum(on + off)
+            on_starts = ends - on - off
+            last_period_end = ends[-1]
+            
+            flows = rng.poisson(on / self.mean_gap)
+            times = np.sort(np.repeat(on_starts, flows) + rng.random(flows.sum()) * np.repeat(on, flows))
+            if len(times) > 0:
+                start_times.append(times)
+                last_start_time = times[-1]
+        return self.cut_at(np.floor(np.concatenate(start_times)).astype(np.int64), till)
+    
+    def get_mean_gap(self) -> float:
+        return self.mean_gap * (self.on_mean + self.off_mean) / self.on_mean
+
+
+class DiurnalArrival(FlowArrivalModel):
+    """Modulates the rate of the base model (a config of another arrival model) by
+    1 + amplitude * sin(2 pi t / period + phase), with 0 <= amplitude <= 1. The start times of the base model are taken
+    as the integrated rate, so the bursts of the base model and its mean rate (over whole periods) are kept."""
+    
+    def __init__(self, base: Dict, period: float = 24 * 3600 * 1000000, amplitude: float = 0.5, phase: float = 0):
+        if not 0 <= amplitude <= 1:
+            raise NameError(f"the diurnal arrival model requires 0 <= amplitude <= 1")
+        self.base = FlowArrivalModel.create(base)
+        self.period = period
+        self.amplitude = amplitude
+        self.phase = phase
+    
+    def get_integrated_rate(self, times: np.ndarray) -> np.ndarray:
+        omega = 2 * math.pi / self.period
+        return times - self.amplitude / omega * (np.cos(omega * times + self.phase) - math.cos(self.phase))
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        integrated_start_times = self.base.draw_start_times(rng, int(math.ceil(self.get_integrated_rate(till))))
+        # the integrated rate falls behind the time by at most amplitude * period / pi, so the grid covers all start
+        # times; within a step of the grid the integrated rate is taken as linear
+        step = self.period / 256
+        end = float(integrated_start_times[-1]) + self.amplitude * self.period / math.pi + step
+        grid = np.linspace(0, end, int(end / step) + 2)
+        start_times = np.interp(integrated_start_times, self.get_integrated_rate(grid), grid)
+        return np.floor(start_times).astype(np.int64)
+    
+    def get_mean_gap(self) -> float:
+        return self.base.get_mean_gap()
+
+
+class EmpiricalArrival(FlowArrivalModel):
+    """Flows with independent gaps drawn from an empirical cdf, e.g., fitted to the gaps of a measured trace with
+    EmpiricalArrival.fit(gaps).get_config()."""
+    
+    def __init__(self, values: List[float], probabilities: List[float]):
+        self.cdf = EmpiricalCDF(values, probabilities)
+        if self.cdf.get_mean() <= 0:
+            raise NameError(f"the gaps of the empirical arrival model have to be positive on average")
+    
+    @staticmethod
+    def fit(gaps, points: int = 101) -> 'EmpiricalArrival':
+        cdf = EmpiricalCDF.fit(gaps, points)
+        return EmpiricalArrival(cdf.values, cdf.probabilities)
+    
+    def draw_start_times(self, rng: np.random.Generator, till: int) -> np.ndarray:
+        return self.draw_renewal_start_times(lambda n: self.cdf.sample(rng, n), self.get_mean_gap(), till)
+    
+    def get_mean_gap(self) -> float:
+        return self.cdf.get_mean()
+    
+    def get_config(self) -> Dict:
+        return {'model': 'empirical', **self.cdf.get_config()}
+
+
+flow_arrival_models = {
+    'poisson': PoissonArrival,
+    'markov': MarkovArrival,
+    'on-off': OnOffArrival,
+    'diurnal': DiurnalArrival,
+    'empirical': EmpiricalArrival,
+}